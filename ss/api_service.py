@@ -2,22 +2,57 @@
 FastAPI服务核心模块
 提供统一的API封装和数据处理
 """
-from fastapi import FastAPI, HTTPException, UploadFile, File, Request
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse, PlainTextResponse, Response
 from pydantic import BaseModel, create_model
 from typing import Dict, List, Optional, Any, Union
 from PIL import Image
+import asyncio
+import copy
+import hashlib
 import io
+import json
 import base64
-import pandas as pd
+import string
+import time
+from html import escape
 import inspect
 import os
+import mimetypes
 import zipfile
 import tempfile
 from datetime import datetime
 from functools import wraps
 import uuid
+from urllib.parse import quote
 import fastapi
+from fastapi.concurrency import run_in_threadpool
+
+from config import settings
+from artifact_store import ArtifactStore, collect_digests
+from zip_stream import iter_zip_stream, zip_compress_type
+from http_range import etag_matches, make_etag, ranged_file_response
+from session_store import BACKEND_MEMORY, BACKEND_SQLITE, SessionStore, SqliteSessionStore
+from result_cache import ResultCache, make_cache_key
+from single_flight import SingleFlight
+from serialization import (
+    FORMAT_JSON, FORMAT_MULTIPART, FORMAT_MSGPACK, ModelJSONResponse,
+    available_formats, dump_json, iter_multipart, negotiate_format, new_boundary, pack_msgpack
+)
+from metrics import APIMetrics, PhaseTimer
+from progress import PROGRESS_PARAM, ProgressCallback, progress_hub
+from scratch import WORKDIR_PARAM, ScratchQuotaError, ScratchSpace
+from function_manifest import LazyFunction, SignatureCache, add_injected_params, load_manifest, parse_params
+from jobs import JOB_FAILED, JOB_SUCCEEDED, JobManager, JobQueueFullError
+from image_encoding import (
+    IMAGE_FORMATS, ImageEncoding, EncodedImage, encode_image, encode_images,
+    configure_encode_pool, shutdown_encode_pool,
+    THUMBNAIL_ENCODING, snap_thumbnail_size, make_thumbnail
+)
+from executors import (
+    FunctionExecutor, ExecutorBusyError, EXECUTOR_PROCESS,
+    configure_pools, warm_up_process_pool, shutdown_pools
+)
 
 
 app = FastAPI(
@@ -29,12 +64,27 @@ app = FastAPI(
 
 # ==================== 数据模型定义 ====================
 
+# 响应交付模式
+DELIVERY_INLINE = "inline"  # base64内嵌在JSON中
+DELIVERY_URL = "url"  # 只返回下载URL和元数据
+
+# 批量调用的输出方式
+BATCH_OUTPUT_JSON = "json"  # 合并的JSON响应
+BATCH_OUTPUT_ARCHIVE = "archive"  # 直接下载包含全部产物和 results.json 的压缩包
+
+# 执行模式
+MODE_SYNC = "sync"  # 在请求内执行并返回结果
+MODE_ASYNC = "async"  # 立即返回任务ID，函数在后台工作池中执行
+
+
 class Base64Image(BaseModel):
     """图片的base64编码模型"""
     filename: str
     format: str
     size: str
-    data: str  # base64编码的图片数据
+    data: str = ""  # base64编码的图片数据（url模式下为空）
+    digest: Optional[str] = None  # 内容的SHA-256摘要
+    url: Optional[str] = None  # 下载地址
 
 
 class Base64File(BaseModel):
@@ -42,7 +92,9 @@ class Base64File(BaseModel):
     filename: str
     content_type: str
     size: int
-    data: str  # base64编码的文件内容
+    data: str = ""  # base64编码的文件内容（url模式下为空）
+    digest: Optional[str] = None  # 内容的SHA-256摘要
+    url: Optional[str] = None  # 下载地址
 
 
 class APIResponse(BaseModel):
@@ -52,31 +104,173 @@ class APIResponse(BaseModel):
     data: Optional[Dict[str, Any]] = None
     files: List[Base64File] = []
     images: List[Base64Image] = []
-    archive: Optional[Base64File] = None  # 压缩包文件
+    archive: Optional[Base64File] = None  # 压缩包文件（仅在 include_archive=true 时内嵌）
+    archive_url: Optional[str] = None  # 流式压缩包下载URL
     files_url: Optional[str] = None  # 文件列表展示页面URL
+    job_id: Optional[str] = None  # 异步任务ID（仅 mode=async）
+    job_status: Optional[str] = None  # 异步任务状态 queued / running / succeeded / failed
+    status_url: Optional[str] = None  # 异步任务状态查询URL
+    progress_url: Optional[str] = None  # 异步任务进度推送URL（SSE，仅声明了progress参数的函数）
+    error: Optional[str] = None
+
+
+class BatchAPIResponse(BaseModel):
+    """批量调用响应格式，results 与请求中的参数组一一对应"""
+    success: bool  # 全部参数组都执行成功
+    message: str
+    total: int
+    succeeded: int
+    failed: int
+    results: List[APIResponse] = []
+    archive_url: Optional[str] = None  # 所有参数组产物的流式压缩包下载URL
+    files_url: Optional[str] = None
+    job_id: Optional[str] = None
+    job_status: Optional[str] = None
+    status_url: Optional[str] = None
     error: Optional[str] = None
 
 
 # ==================== 工具函数 ====================
 
-def image_to_base64(image: Image.Image, filename: str = "image.png") -> Base64Image:
-    """将PIL图片转换为base64编码"""
-    img_buffer = io.BytesIO()
-    image.save(img_buffer, format='PNG')
-    img_buffer.seek(0)
+def error_response(status_code: int, message: str, error: str,
+                   headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """构造错误响应"""
+    return ModelJSONResponse(
+        APIResponse(success=False, message=message, error=error),
+        status_code=status_code,
+        headers=headers
+    )
+
+
+def binary_output_items(response: APIResponse) -> List[tuple]:
+    """
+    收集响应中已入库的产物，返回 (部分名称, 条目, 磁盘路径) 列表
+
+    部分名称为 files / images / archive，对应APIResponse中的字段。
+    """
+    items = [("files", f) for f in response.files] + [("images", img) for img in response.images]
+    if response.archive:
+        items.append(("archive", response.archive))
+
+    result = []
+    for name, item in items:
+        path = artifact_store.path(item.digest) if item.digest else None
+        if path:
+            result.append((name, item, path))
+    return result
+
+
+def item_content_type(item: Any) -> str:
+    """产物的MIME类型"""
+    if isinstance(item, Base64File):
+        return item.content_type
+    if item.format in IMAGE_FORMATS:
+        return IMAGE_FORMATS[item.format][1]
+    return mimetypes.guess_type(item.filename)[0] or "application/octet-stream"
+
 
-    img_base64 = base64.b64encode(img_buffer.read()).decode('utf-8')
+def multipart_response(response: APIResponse, status_code: int = 200,
+                       headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """
+    构造 multipart/mixed 响应
+
+    第一部分是JSON元数据（产物只有摘要和URL），之后每个产物一部分，
+    原始字节直接从产物存储流式读取，不经过base64。
+    """
+    parts = []
+    for name, item, path in binary_output_items(response):
+        parts.append(({
+            "Content-Type": item_content_type(item),
+            "Content-Disposition": f"attachment; name=\"{name}\"; filename*=UTF-8''{quote(item.filename)}",
+            "Content-Length": str(os.path.getsize(path)),
+            "Content-ID": f"<{item.digest}>"
+        }, path))
+
+    boundary = new_boundary()
+    return StreamingResponse(
+        iter_multipart(boundary, dump_json(response), parts),
+        status_code=status_code,
+        headers=headers,
+        media_type=f"{FORMAT_MULTIPART}; boundary={boundary}"
+    )
+
+
+def msgpack_response(response: APIResponse, status_code: int = 200,
+                     headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    构造 MessagePack 响应
+
+    结构与JSON响应相同，但已入库产物的 data 字段是原始字节（bin类型）而不是base64字符串。
+    """
+    content = response.model_dump()
+    entries = content["files"] + content["images"] + ([content["archive"]] if content["archive"] else [])
+    for entry in entries:
+        path = artifact_store.path(entry["digest"]) if entry.get("digest") else None
+        if path:
+            with open(path, 'rb') as f:
+                entry["data"] = f.read()
+    return Response(pack_msgpack(content), status_code=status_code, headers=headers, media_type=FORMAT_MSGPACK)
+
+
+def artifact_url(base_url: str, digest: str, filename: str) -> str:
+    """生成产物的下载URL"""
+    return f"{base_url}artifacts/{digest}?filename={quote(filename)}"
+
+
+def attach_artifact_urls(items: List[Any], base_url: str):
+    """为已入库的文件/图片/压缩包填充下载URL"""
+    for item in items:
+        if isinstance(item, (Base64File, Base64Image)) and item.digest:
+            item.url = artifact_url(base_url, item.digest, item.filename)
+
+
+def default_image_encoding() -> ImageEncoding:
+    """全局默认的图片编码配置"""
+    return ImageEncoding(settings.IMAGE_FORMAT, {"compress_level": settings.PNG_COMPRESS_LEVEL}
+                         if settings.IMAGE_FORMAT.upper() == "PNG" else {})
+
+
+def encoded_image_to_base64(encoded: EncodedImage, filename: str, inline: bool = True) -> Base64Image:
+    """
+    将已编码的图片存入产物存储，并按需转换为base64编码
+
+    编码后的字节只生成一次，响应、压缩包和会话都引用同一份产物。
+    """
+    info = artifact_store.put_bytes(encoded.data)
+    img_base64 = base64.b64encode(encoded.data).decode('utf-8') if inline else ""
 
     return Base64Image(
         filename=filename,
-        format=image.format or 'PNG',
-        size=f"{image.width}x{image.height}",
-        data=img_base64
+        format=encoded.format,
+        size=f"{encoded.width}x{encoded.height}",
+        data=img_base64,
+        digest=info.digest
     )
 
 
-def file_to_base64(filepath: str) -> Base64File:
-    """将文件转换为base64编码"""
+def image_to_base64(image: Image.Image, filename: str = "image.png", inline: bool = True,
+                    encoding: Optional[ImageEncoding] = None) -> Base64Image:
+    """
+    将PIL图片编码（默认PNG）并存入产物存储
+
+    Args:
+        image: PIL图片对象
+        filename: 图片文件名
+        inline: 是否在响应中内嵌base64数据
+        encoding: 图片编码配置（默认使用全局配置）
+    """
+    encoded = encode_image(image, encoding or default_image_encoding())
+    return encoded_image_to_base64(encoded, filename, inline=inline)
+
+
+def file_to_base64(filepath: str, inline: bool = True) -> Base64File:
+    """
+    将文件存入产物存储，并按需转换为base64编码
+
+    Args:
+        filepath: 文件路径
+        inline: 是否在响应中内嵌base64数据
+    """
     if not os.path.exists(filepath):
         # 如果文件不存在，返回空的base64
         return Base64File(
@@ -86,39 +280,72 @@ def file_to_base64(filepath: str) -> Base64File:
             data=""
         )
 
-    with open(filepath, 'rb') as f:
-        file_content = f.read()
-        file_base64 = base64.b64encode(file_content).decode('utf-8')
+    # 流式入库，不把整个文件读入内存
+    info = artifact_store.put_file(filepath)
+
+    file_base64 = ""
+    if inline:
+        with open(info.path, 'rb') as f:
+            file_base64 = base64.b64encode(f.read()).decode('utf-8')
 
     return Base64File(
         filename=os.path.basename(filepath),
         content_type="application/octet-stream",
-        size=len(file_content),
-        data=file_base64
+        size=info.size,
+        data=file_base64,
+        digest=info.digest
     )
 
 
-def process_function_result(result: Dict) -> Dict:
+def process_function_result(result: Dict, delivery: str = DELIVERY_INLINE,
+                            image_encoding: Optional[ImageEncoding] = None,
+                            timer: Optional[PhaseTimer] = None) -> Dict:
     """
     处理函数返回结果，统一转换为API响应格式
+
+    Args:
+        result: 函数返回结果
+        delivery: 交付模式，inline内嵌base64，url只返回元数据
+        image_encoding: 图片编码配置（默认使用全局配置）
+        timer: 请求的计时器，记录图片编码（encode）和入库/base64（base64）的耗时
     """
+    timer = timer or PhaseTimer()
+    inline = delivery != DELIVERY_URL
+    encoding = image_encoding or default_image_encoding()
     message = result.get("message", "Processing completed!")
     result_data = result.get("result", {})
     file_paths = result_data.get("files", [])
     images = result_data.get("images", [])
 
+    # 所有PIL图片在线程池中并行编码，每张只编码一次
+    pil_images = [img for img in images if isinstance(img, Image.Image)]
+    with timer.span("encode"):
+        encoded_images = iter(encode_images(pil_images, encoding))
+
     # 处理图片 - 支持PIL图片对象和已经是base64字典的图片
     base64_images = []
+    base64_started = time.perf_counter()
     for i, img in enumerate(images):
         if isinstance(img, Image.Image):
-            # 如果是PIL图片对象，转换为base64
+            # 如果是PIL图片对象，使用编码结果
             base64_images.append(
-                image_to_base64(img, f"image_{i+1}.png")
+                encoded_image_to_base64(next(encoded_images), f"image_{i+1}{encoding.extension}", inline=inline)
             )
         elif isinstance(img, dict):
-            # 如果已经是字典格式（包含data字段），直接使用
-            if 'data' in img:
-                base64_images.append(img)
+            # 如果已经是base64字典格式（包含data字段），解码后入库，与PIL图片统一处理
+            if img.get('data'):
+                try:
+                    img_bytes = base64.b64decode(img['data'])
+                    info = artifact_store.put_bytes(img_bytes)
+                    base64_images.append(Base64Image(
+                        filename=img.get('filename', f"image_{i+1}.png"),
+                        format=img.get('format', 'PNG'),
+                        size=str(img.get('size', 'N/A')),
+                        data=img['data'] if inline else "",
+                        digest=info.digest
+                    ))
+                except Exception:
+                    pass
             else:
                 # 如果是其他格式的字典，尝试转换
                 try:
@@ -132,17 +359,27 @@ def process_function_result(result: Dict) -> Dict:
         # 跳过空字符串或None
         if not filepath or not isinstance(filepath, str) or filepath.strip() == "":
             continue
-        base64_files.append(file_to_base64(filepath))
+        base64_files.append(file_to_base64(filepath, inline=inline))
+    timer.add("base64", time.perf_counter() - base64_started)
+
+    # PIL图片对象无法JSON序列化，原始数据中替换为对应的图片文件名
+    raw_data = dict(result_data)
+    if images:
+        raw_data["images"] = [
+            f"image_{i+1}{encoding.extension}" if isinstance(img, Image.Image) else img
+            for i, img in enumerate(images)
+        ]
 
     return {
         "message": message,
         "files": base64_files,
         "images": base64_images,
-        "raw_data": result_data
+        "raw_data": raw_data
     }
 
 
-def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_name: str = None) -> Base64File:
+def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_name: str = None,
+                       inline: bool = True) -> Base64File:
     """
     将所有文件和图片打包成ZIP压缩包
 
@@ -150,9 +387,10 @@ def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_nam
         file_paths: 文件路径列表
         images: Base64Image对象列表
         zip_name: 压缩包名称（可选）
+        inline: 是否在返回结果中内嵌base64数据
 
     Returns:
-        Base64File对象，包含压缩包的base64编码
+        Base64File对象，压缩包同时存入产物存储
     """
     # 创建临时文件
     temp_fd, temp_path = tempfile.mkstemp(suffix='.zip')
@@ -166,17 +404,23 @@ def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_nam
                     continue
 
                 filename = os.path.basename(filepath)
-                zipf.write(filepath, filename)
+                zipf.write(filepath, filename, compress_type=zip_compress_type(filename))
 
-            # 添加图片
+            # 添加图片（已入库的图片直接从磁盘读取，无需再解码base64；PNG等已压缩格式直接存储）
             for img in images:
-                img_bytes = base64.b64decode(img.data)
-                zipf.writestr(img.filename, img_bytes)
+                stored_path = artifact_store.path(img.digest) if img.digest else None
+                compress_type = zip_compress_type(img.filename)
+                if stored_path:
+                    zipf.write(stored_path, img.filename, compress_type=compress_type)
+                else:
+                    zipf.writestr(img.filename, base64.b64decode(img.data), compress_type=compress_type)
+
+        info = artifact_store.put_file(temp_path)
 
-        # 读取压缩包并转换为base64
-        with open(temp_path, 'rb') as f:
-            zip_content = f.read()
-            zip_base64 = base64.b64encode(zip_content).decode('utf-8')
+        zip_base64 = ""
+        if inline:
+            with open(info.path, 'rb') as f:
+                zip_base64 = base64.b64encode(f.read()).decode('utf-8')
 
         # 生成压缩包文件名
         if not zip_name:
@@ -186,8 +430,9 @@ def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_nam
         return Base64File(
             filename=zip_name,
             content_type="application/zip",
-            size=len(zip_content),
-            data=zip_base64
+            size=info.size,
+            data=zip_base64,
+            digest=info.digest
         )
 
     finally:
@@ -198,22 +443,256 @@ def create_zip_archive(file_paths: List[str], images: List[Base64Image], zip_nam
 
 # ==================== 函数注册装饰器 ====================
 
-def register_api_endpoint(route_path: str, func_name: str):
+def session_item(item: Any) -> Dict:
+    """
+    转换为会话中保存的条目
+
+    已入库的条目可以通过URL下载，会话里不再重复保存base64数据。
+    """
+    if isinstance(item, (Base64File, Base64Image)):
+        return item.model_dump(exclude={'data'}) if item.digest else item.model_dump()
+    return item
+
+
+def build_function_outputs(result: Dict, func_name: str, delivery: str, include_archive: bool = False,
+                           image_encoding: Optional[ImageEncoding] = None,
+                           timer: Optional[PhaseTimer] = None):
+    """
+    将函数返回结果转换为响应所需的文件、图片和压缩包
+
+    包含图片编码、文件读取和ZIP压缩等阻塞操作，由端点放到线程池中执行。
+    压缩包默认通过 /archive/{session_id} 流式下载，只有 include_archive 为True时才在这里生成。
+
+    Returns:
+        (processed_result, archive)
+    """
+    timer = timer or PhaseTimer()
+    processed_result = process_function_result(
+        result, delivery=delivery, image_encoding=image_encoding, timer=timer
+    )
+
+    # 收集有效的文件路径（用于压缩包）
+    valid_file_paths = []
+    result_data = result.get("result", {})
+    file_paths = result_data.get("files", [])
+
+    for filepath in file_paths:
+        if filepath and isinstance(filepath, str) and filepath.strip() and os.path.exists(filepath):
+            valid_file_paths.append(filepath)
+
+    # 创建压缩包（仅在请求内嵌压缩包且有文件或图片时）
+    archive = None
+    if include_archive and (valid_file_paths or processed_result["images"]):
+        try:
+            with timer.span("zip"):
+                archive = create_zip_archive(
+                    valid_file_paths,
+                    processed_result["images"],
+                    zip_name=f"{func_name}_output.zip",
+                    inline=delivery != DELIVERY_URL
+                )
+        except Exception as zip_error:
+            # 压缩失败不影响主流程，只记录错误
+            print(f"Warning: Failed to create archive: {zip_error}")
+
+    return processed_result, archive
+
+
+def read_artifact_base64(digest: str) -> str:
+    """读取已入库产物并转换为base64编码，产物不存在时抛出LookupError"""
+    path = artifact_store.path(digest)
+    if path is None:
+        raise LookupError(f"Artifact {digest} is missing")
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+def build_archive_from_artifacts(items: List[Any], zip_name: str, inline: bool = True) -> Optional[Base64File]:
+    """用已入库的文件和图片生成压缩包（不依赖函数的原始输出文件）"""
+    entries = [
+        (item.filename, artifact_store.path(item.digest))
+        for item in items
+        if isinstance(item, (Base64File, Base64Image)) and item.digest
+    ]
+    if not entries:
+        return None
+
+    temp_fd, temp_path = tempfile.mkstemp(suffix='.zip')
+    try:
+        with os.fdopen(temp_fd, 'wb') as f:
+            for chunk in iter_zip_stream(entries):
+                f.write(chunk)
+        info = artifact_store.put_file(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return Base64File(
+        filename=zip_name,
+        content_type="application/zip",
+        size=info.size,
+        data=read_artifact_base64(info.digest) if inline else "",
+        digest=info.digest
+    )
+
+
+def make_cache_entry(processed_result: Dict, archive: Optional[Base64File]) -> Dict:
+    """
+    生成结果缓存条目
+
+    只保存元数据和产物摘要，不保存base64内容和与请求地址相关的URL。
+    """
+    def strip(item):
+        if isinstance(item, (Base64File, Base64Image)):
+            return item.model_dump(exclude={'data', 'url'}) if item.digest else item.model_dump(exclude={'url'})
+        return item
+
+    return {
+        'message': processed_result["message"],
+        'raw_data': processed_result.get("raw_data", {}),
+        'files': [strip(f) for f in processed_result["files"]],
+        'images': [strip(img) for img in processed_result["images"]],
+        'archive': strip(archive) if archive else None
+    }
+
+
+def restore_cached_outputs(entry: Dict, func_name: str, delivery: str, include_archive: bool = False):
+    """
+    从缓存条目恢复响应所需的文件、图片和压缩包
+
+    inline模式下从产物存储读取内容重新生成base64；引用的产物丢失时抛出LookupError。
+
+    Returns:
+        (processed_result, archive)
+    """
+    inline = delivery != DELIVERY_URL
+
+    def restore(model_cls, item):
+        if not isinstance(item, dict):
+            return item
+        data = read_artifact_base64(item['digest']) if inline and item.get('digest') else item.get('data', "")
+        return model_cls(**{**item, 'data': data})
+
+    processed_result = {
+        "message": entry['message'],
+        "files": [restore(Base64File, f) for f in entry['files']],
+        "images": [restore(Base64Image, img) for img in entry['images']],
+        "raw_data": entry['raw_data']
+    }
+
+    archive = None
+    if include_archive:
+        if entry.get('archive'):
+            archive = restore(Base64File, entry['archive'])
+        else:
+            archive = build_archive_from_artifacts(
+                processed_result["files"] + processed_result["images"],
+                f"{func_name}_output.zip",
+                inline=inline
+            )
+
+    return processed_result, archive
+
+
+def iter_output_items(content: Dict):
+    """遍历响应字典（APIResponse 或 BatchAPIResponse）中的文件、图片和压缩包条目"""
+    yield from content.get('files') or []
+    yield from content.get('images') or []
+    if content.get('archive'):
+        yield content['archive']
+    for result in content.get('results') or []:
+        yield from iter_output_items(result)
+
+
+def make_job_entry(response: BaseModel) -> Dict:
+    """
+    生成异步任务的结果条目
+
+    已入库产物的base64内容不保存，查询时从产物存储恢复（与结果缓存条目相同），
+    任务结果存储只保存元数据，大结果不会被立即淘汰或挤出其他任务的结果。
+    """
+    content = response.model_dump()
+    for item in iter_output_items(content):
+        if item.get('digest'):
+            item['data'] = ""
+    return content
+
+
+def restore_job_response(content: Dict) -> Dict:
+    """从产物存储恢复任务结果中的base64内容（inline交付），产物丢失时抛出LookupError"""
+    content = copy.deepcopy(content)
+    for item in iter_output_items(content):
+        if item.get('digest') and not item.get('data'):
+            item['data'] = read_artifact_base64(item['digest'])
+    return content
+
+
+def register_api_endpoint(route_path: str, func_name: str, executor: str = None,
+                          max_concurrency: Optional[int] = None, queue_timeout: Optional[float] = None,
+                          image_format: Optional[str] = None, image_options: Optional[Dict] = None,
+                          cache_ttl: Optional[float] = None, cache_max_entries: Optional[int] = None,
+                          coalesce: bool = False):
     """
     装饰器：自动将函数注册为API端点
 
     Args:
         route_path: API路由路径
         func_name: 函数名称（用于日志）
+        executor: 执行方式 inline / thread / process，默认使用 settings.DEFAULT_EXECUTOR
+        max_concurrency: 该函数的最大并发执行数（None表示不限制）
+        queue_timeout: 等待执行槽位的最长秒数，超时返回503（None表示一直等待）
+        image_format: 输出图片的编码格式 PNG / WEBP / JPEG（默认 settings.IMAGE_FORMAT）
+        image_options: 传给 PIL.Image.save 的编码参数，如 {"compress_level": 1}、{"quality": 90}
+        cache_ttl: 结果缓存有效期（秒），None表示不缓存；请求头 X-Cache-Bypass: 1 或
+                   Cache-Control: no-cache 可跳过缓存重新执行
+        cache_max_entries: 结果缓存最大条目数（默认 settings.RESULT_CACHE_MAX_ENTRIES）
+        coalesce: 是否合并相同参数的在途请求（执行期间到达的相同请求共享同一次执行的结果）
     """
+    # 图片编码配置（注册时校验，格式错误直接报错）
+    if image_format or image_options:
+        image_encoding = ImageEncoding(image_format or settings.IMAGE_FORMAT, image_options or {})
+    else:
+        image_encoding = default_image_encoding()
+
     def decorator(func):
+        # 创建函数执行器
+        function_executor = FunctionExecutor(
+            func,
+            mode=executor or settings.DEFAULT_EXECUTOR,
+            max_concurrency=max_concurrency,
+            queue_timeout=queue_timeout
+        )
+        function_executors[func_name] = function_executor
+
+        # 创建结果缓存（按需开启）
+        result_cache = None
+        if cache_ttl:
+            result_cache = ResultCache(
+                ttl=cache_ttl,
+                max_entries=cache_max_entries or settings.RESULT_CACHE_MAX_ENTRIES,
+                max_bytes=settings.RESULT_CACHE_MAX_BYTES
+            )
+            function_caches[func_name] = result_cache
+
+        # 创建在途请求合并表（按需开启）
+        single_flight = None
+        if coalesce:
+            single_flight = SingleFlight()
+            function_single_flights[func_name] = single_flight
+
         # 获取函数签名
         sig = inspect.signature(func)
         parameters = sig.parameters
 
+        # 声明了 progress / workdir 参数的函数由框架注入进度回调和临时目录，这些参数不出现在请求模型中
+        accepts_progress = PROGRESS_PARAM in parameters
+        accepts_workdir = WORKDIR_PARAM in parameters
+
         # 动态创建请求模型
         request_fields = {}
         for param_name, param in parameters.items():
+            if param_name in (PROGRESS_PARAM, WORKDIR_PARAM):
+                continue
             param_type = param.annotation
 
             # 处理类型注解
@@ -232,55 +711,124 @@ def register_api_endpoint(route_path: str, func_name: str):
             **request_fields
         )
 
-        # 创建API端点
-        @app.post(route_path, name=func_name, summary=f"Execute {func_name}")
-        async def api_endpoint(api_request: RequestModel, request: fastapi.Request) -> JSONResponse:
+        async def run_function(api_request, delivery: str, include_archive: bool,
+                               base_url: str, bypass_cache: bool, timer: PhaseTimer,
+                               progress_id: Optional[str] = None):
+            """
+            执行函数并构造响应（同步请求、批量调用和异步任务共用），各阶段耗时记录到timer
+
+            progress_id 为异步任务ID时，函数上报的进度推送到 /progress/{job_id}。
+
+            Returns:
+                (HTTP状态码, APIResponse, 响应头)
+            """
             try:
-                # 提取参数
-                kwargs = api_request.model_dump()
-
-                # 调用原始函数
-                result = func(**kwargs)
-
-                # 处理结果
-                processed_result = process_function_result(result)
-
-                # 收集有效的文件路径（用于压缩包）
-                valid_file_paths = []
-                result_data = result.get("result", {})
-                file_paths = result_data.get("files", [])
-
-                for filepath in file_paths:
-                    if filepath and isinstance(filepath, str) and filepath.strip() and os.path.exists(filepath):
-                        valid_file_paths.append(filepath)
-
-                # 创建压缩包（如果有文件或图片）
-                archive = None
-                if valid_file_paths or processed_result["images"]:
-                    try:
-                        archive = create_zip_archive(
-                            valid_file_paths,
-                            processed_result["images"],
-                            zip_name=f"{func_name}_output.zip"
+                # 请求去重键（结果缓存和请求合并共用）
+                request_key = None
+                if result_cache is not None or single_flight is not None:
+                    request_key = make_cache_key(func_name, api_request.model_dump_json())
+
+                # 查询结果缓存
+                processed_result = archive = None
+                cache_status = None
+                if result_cache is not None:
+                    if bypass_cache:
+                        result_cache.record_bypass()
+                        cache_status = "BYPASS"
+                    else:
+                        cached = result_cache.get(request_key)
+                        if cached is not None:
+                            try:
+                                with timer.span("cache"):
+                                    processed_result, archive = await run_in_threadpool(
+                                        restore_cached_outputs, cached, func_name, delivery, include_archive
+                                    )
+                                cache_status = "HIT"
+                            except LookupError:
+                                # 缓存引用的产物已丢失，重新执行
+                                result_cache.invalidate(request_key)
+                        if cache_status is None:
+                            cache_status = "MISS"
+
+                coalesced = False
+                if processed_result is None:
+                    async def execute():
+                        # 提取参数
+                        kwargs = api_request.model_dump()
+                        if accepts_progress:
+                            kwargs[PROGRESS_PARAM] = ProgressCallback(progress_id)
+
+                        # 每次调用独立的临时目录，输出文件存入产物存储后在后台删除
+                        workdir = (
+                            await run_in_threadpool(scratch_space.create, func_name)
+                            if accepts_workdir else None
                         )
-                    except Exception as zip_error:
-                        # 压缩失败不影响主流程，只记录错误
-                        print(f"Warning: Failed to create archive: {zip_error}")
+                        try:
+                            if workdir is not None:
+                                kwargs[WORKDIR_PARAM] = workdir
+
+                            # 通过执行器调用原始函数（不阻塞事件循环）
+                            result = await function_executor.execute(kwargs, timer)
+
+                            # 处理结果（图片编码、文件读取、压缩）
+                            outputs = await run_in_threadpool(
+                                build_function_outputs, result, func_name, delivery, include_archive,
+                                image_encoding, timer
+                            )
+                        finally:
+                            if workdir is not None:
+                                scratch_space.release(workdir)
+
+                        # 与交付模式无关的结果条目，供缓存和合并的请求使用
+                        entry = make_cache_entry(*outputs)
+                        if result_cache is not None:
+                            result_cache.put(request_key, entry)
+                        return outputs, entry
+
+                    if single_flight is not None:
+                        wait_started = time.perf_counter()
+                        (outputs, entry), coalesced = await single_flight.do(request_key, execute)
+                        if coalesced:
+                            # 合并的请求不执行函数，记录等待leader的时间
+                            timer.add("coalesced", time.perf_counter() - wait_started)
+                    else:
+                        outputs, entry = await execute()
+
+                    if coalesced:
+                        # 合并的请求按自己的交付模式从共享结果恢复
+                        with timer.span("cache"):
+                            processed_result, archive = await run_in_threadpool(
+                                restore_cached_outputs, entry, func_name, delivery, include_archive
+                            )
+                    else:
+                        processed_result, archive = outputs
+
+                # 填充产物下载URL
+                attach_artifact_urls(
+                    processed_result["files"] + processed_result["images"] + ([archive] if archive else []),
+                    base_url
+                )
 
                 # 生成会话ID并存储会话数据
                 session_id = str(uuid.uuid4())
-                session_storage[session_id] = {
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'function_name': func_name,
-                    'message': processed_result["message"],
-                    'files': [f.model_dump() for f in processed_result["files"]],
-                    'images': [img.model_dump() for img in processed_result["images"]],
-                    'archive': archive.model_dump() if archive else None
-                }
-
-                # 生成文件列表页面URL
-                base_url = str(request.base_url)
+                with timer.span("session"):
+                    await run_in_threadpool(session_storage.__setitem__, session_id, {
+                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        'function_name': func_name,
+                        'message': processed_result["message"],
+                        'files': [session_item(f) for f in processed_result["files"]],
+                        'images': [session_item(img) for img in processed_result["images"]],
+                        'archive': session_item(archive) if archive else None,
+                        'archive_name': f"{func_name}_output.zip"
+                    })
+
+                # 生成文件列表页面URL和流式压缩包URL
                 files_url = f"{base_url}files/{session_id}"
+                has_outputs = any(
+                    isinstance(item, (Base64File, Base64Image)) and item.digest
+                    for item in processed_result["files"] + processed_result["images"]
+                )
+                archive_url = f"{base_url}archive/{session_id}" if has_outputs else None
 
                 # 构造响应
                 response = APIResponse(
@@ -290,21 +838,293 @@ def register_api_endpoint(route_path: str, func_name: str):
                     files=processed_result["files"],
                     images=processed_result["images"],
                     archive=archive,
+                    archive_url=archive_url,
                     files_url=files_url
                 )
 
-                return JSONResponse(content=response.model_dump())
+                headers = {}
+                if cache_status:
+                    headers["X-Cache"] = cache_status
+                if coalesced:
+                    headers["X-Coalesced"] = "true"
+                return 200, response, headers
+
+            except ExecutorBusyError as e:
+                return 503, APIResponse(
+                    success=False,
+                    message=f"{func_name} is busy",
+                    error=str(e)
+                ), {"Retry-After": str(int(function_executor.queue_timeout or 1))}
+
+            except ScratchQuotaError as e:
+                return 503, APIResponse(
+                    success=False,
+                    message=f"{func_name} is busy",
+                    error=str(e)
+                ), {"Retry-After": "1"}
 
             except Exception as e:
-                return JSONResponse(
-                    status_code=500,
-                    content=APIResponse(
-                        success=False,
-                        message=f"Error in {func_name}",
-                        error=str(e)
-                    ).model_dump()
+                return 500, APIResponse(
+                    success=False,
+                    message=f"Error in {func_name}",
+                    error=str(e)
+                ), {}
+
+        # 创建API端点
+        @app.post(route_path, name=func_name, summary=f"Execute {func_name}")
+        async def api_endpoint(
+            api_request: RequestModel,
+            request: fastapi.Request,
+            delivery: Optional[str] = Query(
+                None, description="响应交付模式: inline（内嵌base64）或 url（只返回下载URL）"
+            ),
+            include_archive: bool = Query(
+                False, description="是否在响应中内嵌压缩包（默认只返回archive_url）"
+            ),
+            mode: Optional[str] = Query(
+                None, description="执行模式: sync（默认）或 async（立即返回任务ID，通过 /jobs/{job_id} 查询结果）"
+            )
+        ) -> Response:
+            timer = PhaseTimer()
+
+            # 交付模式：查询参数优先，其次是请求头，最后是全局配置
+            delivery = delivery or request.headers.get("X-Delivery-Mode") or settings.DELIVERY_MODE
+            if delivery not in (DELIVERY_INLINE, DELIVERY_URL):
+                return error_response(400, f"Error in {func_name}", f"Unsupported delivery mode: {delivery}")
+
+            mode = get_execution_mode(request, mode)
+            if mode not in (MODE_SYNC, MODE_ASYNC):
+                return error_response(400, f"Error in {func_name}", f"Unsupported execution mode: {mode}")
+
+            # 响应格式：按 Accept 协商，默认JSON（异步任务的响应始终是JSON）
+            response_format = FORMAT_JSON
+            if mode == MODE_SYNC:
+                response_format = negotiate_format(request.headers.get("Accept"))
+                if response_format is None:
+                    return error_response(
+                        406, f"Error in {func_name}",
+                        f"Not acceptable: {request.headers.get('Accept')}, "
+                        f"available: {', '.join(available_formats())}"
+                    )
+                if response_format != FORMAT_JSON:
+                    # 二进制格式直接发送产物的原始字节，不需要生成base64
+                    delivery = DELIVERY_URL
+
+            base_url = str(request.base_url)
+            bypass_cache = is_cache_bypass(request)
+
+            if mode == MODE_ASYNC:
+                async def run_job(job_id: str):
+                    job_timer = PhaseTimer()
+                    status_code, response, _ = await run_function(
+                        api_request, delivery, include_archive, base_url, bypass_cache, job_timer,
+                        progress_id=job_id
+                    )
+                    api_metrics.observe_request(route_path, status_code, job_timer)
+                    return status_code, make_job_entry(response)
+
+                try:
+                    job = await job_manager.submit(func_name, run_job, {'delivery': delivery})
+                except JobQueueFullError as e:
+                    return error_response(503, f"{func_name} is busy", str(e), {"Retry-After": "1"})
+
+                status_url = f"{base_url}jobs/{job['job_id']}"
+                return ModelJSONResponse(
+                    APIResponse(
+                        success=True,
+                        message=f"Job accepted: {func_name}",
+                        job_id=job['job_id'],
+                        job_status=job['status'],
+                        status_url=status_url,
+                        progress_url=f"{base_url}progress/{job['job_id']}" if accepts_progress else None
+                    ),
+                    status_code=202,
+                    headers={"Location": status_url}
+                )
+
+            status_code, response, headers = await run_function(
+                api_request, delivery, include_archive, base_url, bypass_cache, timer
+            )
+            with timer.span("serialize"):
+                if status_code == 200 and response_format == FORMAT_MULTIPART:
+                    http_response = multipart_response(response, status_code, headers)
+                elif status_code == 200 and response_format == FORMAT_MSGPACK:
+                    http_response = await run_in_threadpool(msgpack_response, response, status_code, headers)
+                else:
+                    # 直接把模型序列化为JSON字节，大的base64字符串不再经过中间字典
+                    http_response = ModelJSONResponse(response, status_code=status_code, headers=headers)
+            api_metrics.observe_request(route_path, status_code, timer)
+            http_response.headers["Server-Timing"] = timer.server_timing()
+            return http_response
+
+        async def run_batch(api_requests: List[BaseModel], delivery: str, parallel: int,
+                            base_url: str, bypass_cache: bool):
+            """
+            并行执行多组参数，并把所有产物合并到一个会话中
+
+            Returns:
+                (BatchAPIResponse, 合并会话ID)
+            """
+            semaphore = asyncio.Semaphore(parallel)
+
+            async def run_item(api_request):
+                async with semaphore:
+                    # 每组参数单独计时，计入函数路由的阶段耗时
+                    item_timer = PhaseTimer()
+                    status_code, response, _ = await run_function(
+                        api_request, delivery, False, base_url, bypass_cache, item_timer
+                    )
+                    api_metrics.observe_request(route_path, status_code, item_timer)
+                    return response
+
+            results = await asyncio.gather(*(run_item(r) for r in api_requests))
+
+            # 合并会话：各参数组的产物放在 item_0001/ 等子目录下，供 /files 和 /archive 使用
+            files, images = [], []
+            for index, response in enumerate(results, 1):
+                prefix = f"item_{index:04d}/"
+                files += [{**session_item(f), 'filename': prefix + f.filename} for f in response.files]
+                images += [{**session_item(img), 'filename': prefix + img.filename} for img in response.images]
+
+            succeeded = sum(1 for r in results if r.success)
+            message = f"{succeeded}/{len(results)} items succeeded"
+            session_id = str(uuid.uuid4())
+            await run_in_threadpool(session_storage.__setitem__, session_id, {
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'function_name': func_name,
+                'message': message,
+                'files': files,
+                'images': images,
+                'archive': None,
+                'archive_name': f"{func_name}_batch_output.zip"
+            })
+
+            has_outputs = any(item.get('digest') for item in files + images)
+            batch = BatchAPIResponse(
+                success=succeeded == len(results),
+                message=message,
+                total=len(results),
+                succeeded=succeeded,
+                failed=len(results) - succeeded,
+                results=results,
+                archive_url=f"{base_url}archive/{session_id}" if has_outputs else None,
+                files_url=f"{base_url}files/{session_id}"
+            )
+            return batch, session_id
+
+        # 创建批量调用端点
+        batch_route = f"{route_path}/batch"
+
+        @app.post(batch_route, name=f"{func_name}_batch", summary=f"Batch execute {func_name}")
+        async def api_batch_endpoint(
+            api_requests: List[RequestModel],
+            request: fastapi.Request,
+            delivery: Optional[str] = Query(
+                None, description="响应交付模式: inline（内嵌base64）或 url（只返回下载URL）"
+            ),
+            max_parallel: Optional[int] = Query(
+                None, ge=1, description="同时执行的参数组数（默认 settings.BATCH_DEFAULT_PARALLEL）"
+            ),
+            output: str = Query(
+                BATCH_OUTPUT_JSON, description="输出方式: json（合并的JSON响应）或 archive（直接下载压缩包）"
+            ),
+            mode: Optional[str] = Query(
+                None, description="执行模式: sync（默认）或 async（立即返回任务ID）"
+            )
+        ):
+            """
+            批量执行函数
+
+            请求体为参数组列表，每组参数按与单次调用相同的模型校验；
+            每组的成功或错误分别记录在 results 中，不会因为某一组失败而中断整个批次。
+            """
+            delivery = delivery or request.headers.get("X-Delivery-Mode") or settings.DELIVERY_MODE
+            if delivery not in (DELIVERY_INLINE, DELIVERY_URL):
+                return error_response(400, f"Error in {func_name}", f"Unsupported delivery mode: {delivery}")
+
+            mode = get_execution_mode(request, mode)
+            if mode not in (MODE_SYNC, MODE_ASYNC):
+                return error_response(400, f"Error in {func_name}", f"Unsupported execution mode: {mode}")
+
+            if output not in (BATCH_OUTPUT_JSON, BATCH_OUTPUT_ARCHIVE):
+                return error_response(400, f"Error in {func_name}", f"Unsupported batch output: {output}")
+            if output == BATCH_OUTPUT_ARCHIVE and mode == MODE_ASYNC:
+                return error_response(
+                    400, f"Error in {func_name}",
+                    "Archive output is not available in async mode, use archive_url from the job result"
                 )
 
+            if not api_requests:
+                return error_response(400, f"Error in {func_name}", "Batch request is empty")
+            if len(api_requests) > settings.BATCH_MAX_ITEMS:
+                return error_response(
+                    413, f"Error in {func_name}",
+                    f"Batch too large: {len(api_requests)} items, limit is {settings.BATCH_MAX_ITEMS}"
+                )
+
+            parallel = min(max_parallel or settings.BATCH_DEFAULT_PARALLEL, settings.BATCH_MAX_PARALLEL)
+            timer = PhaseTimer()
+            base_url = str(request.base_url)
+            bypass_cache = is_cache_bypass(request)
+
+            if mode == MODE_ASYNC:
+                async def run_job(job_id: str):
+                    batch, _ = await run_batch(api_requests, delivery, parallel, base_url, bypass_cache)
+                    return 200, make_job_entry(batch)
+
+                try:
+                    job = await job_manager.submit(f"{func_name}_batch", run_job, {'delivery': delivery})
+                except JobQueueFullError as e:
+                    return error_response(503, f"{func_name} is busy", str(e), {"Retry-After": "1"})
+
+                status_url = f"{base_url}jobs/{job['job_id']}"
+                return ModelJSONResponse(
+                    APIResponse(
+                        success=True,
+                        message=f"Job accepted: {func_name} batch of {len(api_requests)}",
+                        job_id=job['job_id'],
+                        job_status=job['status'],
+                        status_url=status_url
+                    ),
+                    status_code=202,
+                    headers={"Location": status_url}
+                )
+
+            with timer.span("batch"):
+                batch, session_id = await run_batch(api_requests, delivery, parallel, base_url, bypass_cache)
+
+            if output == BATCH_OUTPUT_ARCHIVE:
+                # 压缩包内附带不含base64数据的 results.json，记录每组参数的结果
+                manifest = batch.model_dump(exclude={'results': {'__all__': {
+                    'files': {'__all__': {'data'}},
+                    'images': {'__all__': {'data'}},
+                    'archive': {'data'}
+                }}})
+                manifest_info = await run_in_threadpool(
+                    artifact_store.put_bytes,
+                    json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+                )
+                entries = [("results.json", manifest_info.path)]
+                session_data = await run_in_threadpool(session_storage.get, session_id)
+                entries += session_archive_entries(session_data or {})
+                archive_name = f"{func_name}_batch_output.zip"
+                # 压缩包边压缩边发送，这里只能记录到开始发送为止的耗时
+                api_metrics.observe_request(batch_route, 200, timer)
+                return StreamingResponse(
+                    iter_zip_stream(entries),
+                    media_type="application/zip",
+                    headers={
+                        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(archive_name)}",
+                        "Server-Timing": timer.server_timing()
+                    }
+                )
+
+            with timer.span("serialize"):
+                json_response = ModelJSONResponse(batch)
+            api_metrics.observe_request(batch_route, 200, timer)
+            json_response.headers["Server-Timing"] = timer.server_timing()
+            return json_response
+
         # 添加函数的文档字符串
         api_endpoint.__doc__ = func.__doc__ or f"Execute {func_name}"
 
@@ -321,8 +1141,26 @@ class FunctionRegistry:
     def __init__(self):
         self.functions = {}
 
-    def register(self, route_path: str, func_name: str):
-        """注册单个函数"""
+    def register(self, route_path: str, func_name: str, executor: str = None,
+                 max_concurrency: Optional[int] = None, queue_timeout: Optional[float] = None,
+                 image_format: Optional[str] = None, image_options: Optional[Dict] = None,
+                 cache_ttl: Optional[float] = None, cache_max_entries: Optional[int] = None,
+                 coalesce: bool = False):
+        """
+        注册单个函数
+
+        Args:
+            route_path: API路由路径
+            func_name: 函数名称
+            executor: 执行方式 inline / thread / process（默认 settings.DEFAULT_EXECUTOR）
+            max_concurrency: 该函数的最大并发执行数
+            queue_timeout: 等待执行槽位的最长秒数
+            image_format: 输出图片的编码格式 PNG / WEBP / JPEG
+            image_options: 传给 PIL.Image.save 的编码参数
+            cache_ttl: 结果缓存有效期（秒），None表示不缓存
+            cache_max_entries: 结果缓存最大条目数
+            coalesce: 是否合并相同参数的在途请求
+        """
         def decorator(func):
             self.functions[func_name] = {
                 'func': func,
@@ -330,16 +1168,74 @@ class FunctionRegistry:
                 'name': func_name
             }
             # 应用装饰器
-            return register_api_endpoint(route_path, func_name)(func)
+            return register_api_endpoint(
+                route_path, func_name,
+                executor=executor,
+                max_concurrency=max_concurrency,
+                queue_timeout=queue_timeout,
+                image_format=image_format,
+                image_options=image_options,
+                cache_ttl=cache_ttl,
+                cache_max_entries=cache_max_entries,
+                coalesce=coalesce
+            )(func)
         return decorator
 
+    def register_lazy(self, route_path: str, func_name: str, target: str,
+                      params: Optional[Dict[str, Any]] = None, doc: Optional[str] = None,
+                      inject: Optional[List[str]] = None, **options):
+        """
+        注册延迟导入的函数
+
+        实现模块在第一次调用时才导入；params 省略时导入一次模块读取签名。
+
+        Args:
+            route_path: API路由路径
+            func_name: 函数名称
+            target: "模块:函数名"，如 "sample_functions:function_1"
+            params: 参数定义，如 {"param1": "str", "param3": {"type": "int", "default": 5}}
+            doc: 函数说明
+            inject: 函数接受的框架注入参数，如 ["workdir", "progress"]（不写在 params 中）
+            **options: 与 register 相同的可选参数（executor、cache_ttl 等）
+        """
+        if params is not None:
+            sig = parse_params(params)
+        else:
+            sig, module_doc = SignatureCache().resolve(target)
+            doc = doc or module_doc
+        sig = add_injected_params(sig, inject or ())
+        return self.register(route_path, func_name, **options)(LazyFunction(target, sig, doc))
+
+    def load_manifest(self, path: str, signature_cache_path: Optional[str] = None) -> int:
+        """
+        按函数清单批量注册延迟导入的函数（清单格式见 function_manifest.load_manifest）
+
+        Args:
+            path: 清单文件路径
+            signature_cache_path: 签名缓存文件路径（清单中省略 params 的函数使用）
+
+        Returns:
+            注册的函数数量
+        """
+        entries = load_manifest(path, SignatureCache(signature_cache_path))
+        for entry in entries:
+            self.register(entry["route"], entry["name"], **entry["options"])(entry["function"])
+        return len(entries)
+
     def list_functions(self) -> List[Dict]:
         """列出所有已注册的函数"""
         return [
             {
                 'name': info['name'],
                 'route': info['route'],
-                'doc': info['func'].__doc__
+                'doc': info['func'].__doc__,
+                'loaded': info['func'].loaded if isinstance(info['func'], LazyFunction) else True,
+                'executor': function_executors[info['name']].get_stats(),
+                'cache': function_caches[info['name']].get_stats() if info['name'] in function_caches else None,
+                'coalescing': (
+                    function_single_flights[info['name']].get_stats()
+                    if info['name'] in function_single_flights else None
+                )
             }
             for info in self.functions.values()
         ]
@@ -348,407 +1244,271 @@ class FunctionRegistry:
 # 全局注册器实例
 registry = FunctionRegistry()
 
-# 全局会话存储（用于存储文件元数据）
-session_storage: Dict[str, Dict] = {}
+# 各函数的执行器（函数名 -> FunctionExecutor）
+function_executors: Dict[str, FunctionExecutor] = {}
 
+# 开启了结果缓存的函数（函数名 -> ResultCache）
+function_caches: Dict[str, ResultCache] = {}
 
-# ==================== 文件列表展示功能 ====================
+# 开启了请求合并的函数（函数名 -> SingleFlight）
+function_single_flights: Dict[str, SingleFlight] = {}
+
+
+def is_cache_bypass(request: fastapi.Request) -> bool:
+    """请求是否要求跳过结果缓存"""
+    if request.headers.get("X-Cache-Bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("Cache-Control", "").lower()
 
-def generate_files_html(session_id: str) -> str:
+def get_execution_mode(request: fastapi.Request, mode: Optional[str]) -> str:
     """
-    生成文件列表展示页面的HTML
+    解析执行模式：查询参数优先，其次是 X-Execution-Mode 请求头，
+    最后是标准的 Prefer: respond-async 请求头
+    """
+    if mode:
+        return mode.lower()
+    header_mode = request.headers.get("X-Execution-Mode")
+    if header_mode:
+        return header_mode.lower()
+    if "respond-async" in request.headers.get("Prefer", "").lower():
+        return MODE_ASYNC
+    return MODE_SYNC
 
-    Args:
-        session_id: 会话ID
 
-    Returns:
-        HTML字符串
+def create_store(table: str, max_entries: int, ttl: float, **memory_options):
     """
-    session_data = session_storage.get(session_id, {})
-
-    # 生成HTML
-    html = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>API 输出文件列表 - {session_id}</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }}
-
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 10px 40px rgba(0, 0, 0, 0.1);
-            overflow: hidden;
-        }}
-
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 30px;
-            text-align: center;
-        }}
-
-        .header h1 {{
-            font-size: 28px;
-            margin-bottom: 10px;
-        }}
-
-        .header p {{
-            opacity: 0.9;
-            font-size: 14px;
-        }}
-
-        .info {{
-            background: #f8f9fa;
-            padding: 20px 30px;
-            border-bottom: 1px solid #e9ecef;
-        }}
-
-        .info-item {{
-            display: inline-block;
-            margin-right: 30px;
-            font-size: 14px;
-        }}
-
-        .info-label {{
-            font-weight: 600;
-            color: #495057;
-        }}
-
-        .info-value {{
-            color: #6c757d;
-            margin-left: 8px;
-        }}
-
-        .section {{
-            padding: 30px;
-        }}
-
-        .section-title {{
-            font-size: 20px;
-            font-weight: 600;
-            color: #212529;
-            margin-bottom: 20px;
-            padding-bottom: 10px;
-            border-bottom: 2px solid #667eea;
-        }}
-
-        .file-grid, .image-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-            gap: 20px;
-            margin-top: 20px;
-        }}
-
-        .file-card, .image-card {{
-            background: #f8f9fa;
-            border: 1px solid #dee2e6;
-            border-radius: 8px;
-            padding: 20px;
-            transition: all 0.3s ease;
-        }}
-
-        .file-card:hover, .image-card:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.1);
-        }}
-
-        .file-icon {{
-            font-size: 48px;
-            margin-bottom: 10px;
-        }}
-
-        .file-name {{
-            font-weight: 600;
-            color: #212529;
-            margin-bottom: 8px;
-            word-break: break-all;
-        }}
-
-        .file-meta {{
-            font-size: 12px;
-            color: #6c757d;
-            margin-bottom: 15px;
-        }}
-
-        .btn {{
-            display: inline-block;
-            padding: 8px 16px;
-            background: #667eea;
-            color: white;
-            text-decoration: none;
-            border-radius: 6px;
-            font-size: 14px;
-            transition: background 0.3s ease;
-            border: none;
-            cursor: pointer;
-        }}
-
-        .btn:hover {{
-            background: #5568d3;
-        }}
-
-        .btn-download {{
-            width: 100%;
-            text-align: center;
-        }}
-
-        .image-preview {{
-            width: 100%;
-            height: 200px;
-            object-fit: contain;
-            background: #f8f9fa;
-            border-radius: 4px;
-            margin-bottom: 10px;
-        }}
-
-        .archive-section {{
-            background: #e7f3ff;
-            border: 2px solid #667eea;
-            border-radius: 8px;
-            padding: 20px;
-            margin-bottom: 20px;
-        }}
-
-        .archive-title {{
-            font-size: 18px;
-            font-weight: 600;
-            color: #004085;
-            margin-bottom: 10px;
-        }}
-
-        .archive-info {{
-            font-size: 14px;
-            color: #004085;
-            margin-bottom: 15px;
-        }}
-
-        .empty-state {{
-            text-align: center;
-            padding: 60px 20px;
-            color: #6c757d;
-        }}
-
-        .empty-state-icon {{
-            font-size: 64px;
-            margin-bottom: 20px;
-        }}
-
-        .copy-btn {{
-            background: #28a745;
-            font-size: 12px;
-            padding: 4px 8px;
-            margin-left: 10px;
-        }}
-
-        .copy-btn:hover {{
-            background: #218838;
-        }}
-
-        .footer {{
-            text-align: center;
-            padding: 20px;
-            background: #f8f9fa;
-            color: #6c757d;
-            font-size: 12px;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📊 API 输出文件列表</h1>
-            <p>所有生成的文件和图片都在这里</p>
-        </div>
-
-        <div class="info">
-            <div class="info-item">
-                <span class="info-label">会话ID:</span>
-                <span class="info-value">{session_id}</span>
-                <button class="btn copy-btn" onclick="copySessionId()">复制</button>
-            </div>
-            <div class="info-item">
-                <span class="info-label">生成时间:</span>
-                <span class="info-value">{session_data.get('timestamp', 'N/A')}</span>
-            </div>
-            <div class="info-item">
-                <span class="info-label">函数名称:</span>
-                <span class="info-value">{session_data.get('function_name', 'N/A')}</span>
-            </div>
-        </div>
+    按 settings.SESSION_BACKEND 创建会话存储
 
-        <div class="section">
-"""
+    sqlite 后端的数据保存在 SESSION_DB_PATH 的 table 表中，多个服务进程共享；
+    memory_options 只用于内存后端（字节限制、磁盘溢出）。
+    """
+    if settings.SESSION_BACKEND == BACKEND_SQLITE:
+        return SqliteSessionStore(
+            settings.SESSION_DB_PATH,
+            max_entries=max_entries,
+            max_bytes=settings.SESSION_DB_MAX_BYTES,
+            ttl=ttl,
+            table=table
+        )
+    if settings.SESSION_BACKEND != BACKEND_MEMORY:
+        raise ValueError(
+            f"Invalid SESSION_BACKEND: {settings.SESSION_BACKEND}, expected {BACKEND_MEMORY} or {BACKEND_SQLITE}"
+        )
+    return SessionStore(max_entries=max_entries, ttl=ttl, **memory_options)
+
+
+# 全局会话存储（用于存储文件元数据，有界、按TTL过期、按LRU淘汰）
+session_storage = create_store(
+    "sessions",
+    max_entries=settings.SESSION_MAX_ENTRIES,
+    ttl=settings.SESSION_TTL,
+    max_bytes=settings.SESSION_MAX_BYTES,
+    spill_dir=settings.SESSION_SPILL_DIR,
+    spill_threshold=settings.SESSION_SPILL_THRESHOLD,
+    max_spill_bytes=settings.SESSION_MAX_SPILL_BYTES
+)
+
+# 全局产物存储（按内容摘要落盘的文件、图片和压缩包）
+artifact_store = ArtifactStore(settings.ARTIFACT_DIR)
 
-    # 压缩包部分
-    if session_data.get('archive'):
-        archive = session_data['archive']
-        html += f"""
+# 函数调用的临时工作目录（默认在 /dev/shm）
+scratch_space = ScratchSpace(
+    root=settings.SCRATCH_DIR or None,
+    max_bytes=settings.SCRATCH_MAX_BYTES,
+    min_free_bytes=settings.SCRATCH_MIN_FREE_BYTES,
+    usage_ttl=settings.SCRATCH_USAGE_TTL
+)
+
+# 注册函数的请求和阶段耗时指标（/metrics）
+api_metrics = APIMetrics()
+
+# 异步任务记录的存储（按TTL保留）
+job_store = create_store(
+    "jobs",
+    max_entries=settings.JOB_MAX_RESULTS,
+    ttl=settings.JOB_RESULT_TTL,
+    max_bytes=settings.JOB_RESULT_MAX_BYTES
+)
+
+# 全局异步任务管理器（任务记录在每次状态变化时写入存储；sqlite后端时任意服务进程都能查询排队、执行中和已结束的任务）
+job_manager = JobManager(
+    workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_MAX_PENDING,
+    result_store=job_store,
+    on_finish=progress_hub.finish
+)
+
+# 定期清理产物存储的后台任务
+_artifact_sweeper: Optional[asyncio.Task] = None
+
+
+def sweep_artifacts() -> Dict:
+    """按 ARTIFACT_MAX_BYTES / ARTIFACT_MAX_AGE 清理产物存储，保留仍被会话、结果缓存或任务结果引用的产物"""
+    keep = set()
+    for value in session_storage.values():
+        collect_digests(value, keep)
+    for value in job_store.values():
+        collect_digests(value, keep)
+    for cache in list(function_caches.values()):
+        for value in cache.values():
+            collect_digests(value, keep)
+    return artifact_store.sweep(
+        max_bytes=settings.ARTIFACT_MAX_BYTES,
+        max_age=settings.ARTIFACT_MAX_AGE,
+        keep=keep,
+        min_age=settings.ARTIFACT_MIN_AGE
+    )
+
+
+async def sweep_artifacts_periodically():
+    """每隔 ARTIFACT_SWEEP_INTERVAL 秒清理一次产物存储"""
+    while True:
+        await asyncio.sleep(settings.ARTIFACT_SWEEP_INTERVAL)
+        try:
+            await run_in_threadpool(sweep_artifacts)
+        except Exception as e:
+            print(f"Warning: Artifact sweep failed: {e}")
+
+
+# ==================== 文件列表展示功能 ====================
+
+# 页面模板在导入时读取并编译一次，渲染时只填充元数据
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+with open(os.path.join(_TEMPLATE_DIR, "files_page.html"), encoding="utf-8") as _f:
+    FILES_PAGE_TEMPLATE = string.Template(_f.read())
+
+ARCHIVE_SECTION_TEMPLATE = string.Template("""
             <div class="archive-section">
                 <div class="archive-title">📦 压缩包下载</div>
                 <div class="archive-info">
                     包含所有文件和图片，推荐一次性下载<br>
-                    文件名: <strong>{archive['filename']}</strong> |
-                    大小: {archive['size']} bytes
+                    文件名: <strong>$filename</strong> |
+                    条目数: $count
                 </div>
-                <button class="btn btn-download" onclick="downloadArchive()">
+                <a class="btn btn-download" href="$url" download>
                     ⬇️ 下载压缩包
-                </button>
+                </a>
             </div>
-"""
+""")
 
-    # 文件部分
-    html += """
-            <div class="section-title">📁 文件列表</div>
-    """
-
-    files = session_data.get('files', [])
-    if files:
-        html += '<div class="file-grid">'
-        for i, file_data in enumerate(files):
-            html += f"""
+FILE_CARD_TEMPLATE = string.Template("""
                 <div class="file-card">
                     <div class="file-icon">📄</div>
-                    <div class="file-name">{file_data.get('filename', f'file_{i+1}')}</div>
+                    <div class="file-name">$filename</div>
                     <div class="file-meta">
-                        大小: {file_data.get('size', 0)} bytes<br>
-                        类型: {file_data.get('content_type', 'unknown')}
+                        大小: $size bytes<br>
+                        类型: $content_type
                     </div>
-                    <button class="btn btn-download" onclick="downloadFile({i})">
-                        ⬇️ 下载文件
-                    </button>
+                    $download
                 </div>
-            """
-        html += '</div>'
-    else:
-        html += """
+""")
+
+IMAGE_CARD_TEMPLATE = string.Template("""
+                <div class="image-card">
+                    $preview
+                    <div class="file-name">$filename</div>
+                    <div class="file-meta">
+                        尺寸: $size<br>
+                        格式: $format
+                    </div>
+                    $download
+                </div>
+""")
+
+DOWNLOAD_LINK_TEMPLATE = string.Template(
+    '<a class="btn btn-download" href="$url" download="$filename">⬇️ $label</a>'
+)
+
+EMPTY_STATE_TEMPLATE = string.Template("""
             <div class="empty-state">
-                <div class="empty-state-icon">📭</div>
-                <p>没有生成文件</p>
+                <div class="empty-state-icon">$icon</div>
+                <p>$text</p>
             </div>
-        """
+""")
 
-    # 图片部分
-    html += """
-        </div>
 
-        <div class="section">
-            <div class="section-title">🖼️ 图片列表</div>
+def _download_link(item: Dict, label: str) -> str:
+    """生成单个条目的下载链接，未入库的条目没有下载链接"""
+    if not item.get('url'):
+        return ''
+    return DOWNLOAD_LINK_TEMPLATE.substitute(
+        url=escape(item['url']), filename=escape(item.get('filename', '')), label=label
+    )
+
+
+def generate_files_html(session_id: str, session_data: Optional[Dict] = None) -> str:
+    """
+    生成文件列表展示页面的HTML
+
+    页面只包含元数据和下载链接，图片通过懒加载的缩略图预览，不内嵌任何文件内容。
+
+    Args:
+        session_id: 会话ID
+        session_data: 会话数据（未传入时从session_storage读取）
+
+    Returns:
+        HTML字符串
     """
+    if session_data is None:
+        session_data = session_storage.get(session_id, {})
+
+    # 压缩包部分（通过 /archive/{session_id} 流式下载）
+    archive_section = ''
+    archive_entries = session_archive_entries(session_data)
+    if archive_entries:
+        archive_section = ARCHIVE_SECTION_TEMPLATE.substitute(
+            filename=escape(session_data.get('archive_name') or f"{session_id}.zip"),
+            count=len(archive_entries),
+            url=f"/archive/{quote(session_id)}"
+        )
 
+    # 文件部分
+    files = session_data.get('files', [])
+    if files:
+        files_section = '<div class="file-grid">' + ''.join(
+            FILE_CARD_TEMPLATE.substitute(
+                filename=escape(file_data.get('filename', f'file_{i+1}')),
+                size=file_data.get('size', 0),
+                content_type=escape(file_data.get('content_type', 'unknown')),
+                download=_download_link(file_data, '下载文件')
+            )
+            for i, file_data in enumerate(files)
+        ) + '</div>'
+    else:
+        files_section = EMPTY_STATE_TEMPLATE.substitute(icon='📭', text='没有生成文件')
+
+    # 图片部分（缩略图懒加载，点击查看原图）
     images = session_data.get('images', [])
     if images:
-        html += '<div class="image-grid">'
+        image_cards = []
         for i, img_data in enumerate(images):
-            html += f"""
-                <div class="image-card">
-                    <img class="image-preview" src="data:image/png;base64,{img_data.get('data', '')}" alt="{img_data.get('filename', f'image_{i+1}')}">
-                    <div class="file-name">{img_data.get('filename', f'image_{i+1}')}</div>
-                    <div class="file-meta">
-                        尺寸: {img_data.get('size', 'N/A')}<br>
-                        格式: {img_data.get('format', 'N/A')}
-                    </div>
-                    <button class="btn btn-download" onclick="downloadImage({i})">
-                        ⬇️ 下载图片
-                    </button>
-                </div>
-            """
-        html += '</div>'
+            filename = escape(img_data.get('filename', f'image_{i+1}'))
+            preview = ''
+            if img_data.get('digest') and img_data.get('url'):
+                preview = (
+                    f'<a href="{escape(img_data["url"])}" target="_blank">'
+                    f'<img class="image-preview" loading="lazy" '
+                    f'src="/thumbnails/{img_data["digest"]}?size=320" alt="{filename}"></a>'
+                )
+            image_cards.append(IMAGE_CARD_TEMPLATE.substitute(
+                preview=preview,
+                filename=filename,
+                size=escape(str(img_data.get('size', 'N/A'))),
+                format=escape(str(img_data.get('format', 'N/A'))),
+                download=_download_link(img_data, '下载图片')
+            ))
+        images_section = '<div class="image-grid">' + ''.join(image_cards) + '</div>'
     else:
-        html += """
-            <div class="empty-state">
-                <div class="empty-state-icon">🖼️</div>
-                <p>没有生成图片</p>
-            </div>
-        """
-
-    # 页面底部和JavaScript
-    html += f"""
-        </div>
-
-        <div class="footer">
-            <p>Generated by Data Processing API Service | Session ID: {session_id}</p>
-        </div>
-    </div>
-
-    <script>
-        // 会话数据
-        const sessionData = {session_data};
-
-        function downloadFile(index) {{
-            const file = sessionData.files[index];
-            const blob = base64ToBlob(file.data, file.content_type);
-            downloadBlob(blob, file.filename);
-        }}
-
-        function downloadImage(index) {{
-            const img = sessionData.images[index];
-            const blob = base64ToBlob(img.data, 'image/png');
-            downloadBlob(blob, img.filename);
-        }}
-
-        function downloadArchive() {{
-            const archive = sessionData.archive;
-            const blob = base64ToBlob(archive.data, 'application/zip');
-            downloadBlob(blob, archive.filename);
-        }}
-
-        function base64ToBlob(base64, contentType) {{
-            const byteCharacters = atob(base64);
-            const byteArrays = [];
-            const sliceSize = 512;
-
-            for (let offset = 0; offset < byteCharacters.length; offset += sliceSize) {{
-                const slice = byteCharacters.slice(offset, offset + sliceSize);
-                const byteNumbers = new Array(slice.length);
-                for (let i = 0; i < slice.length; i++) {{
-                    byteNumbers[i] = slice.charCodeAt(i);
-                }}
-                const byteArray = new Uint8Array(byteNumbers);
-                byteArrays.push(byteArray);
-            }}
-
-            return new Blob(byteArrays, {{ type: contentType }});
-        }}
-
-        function downloadBlob(blob, filename) {{
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = filename;
-            document.body.appendChild(a);
-            a.click();
-            window.URL.revokeObjectURL(url);
-            document.body.removeChild(a);
-        }}
-
-        function copySessionId() {{
-            navigator.clipboard.writeText('{session_id}').then(() => {{
-                alert('会话ID已复制到剪贴板');
-            }});
-        }}
-    </script>
-</body>
-</html>
-    """
-
-    return html
+        images_section = EMPTY_STATE_TEMPLATE.substitute(icon='🖼️', text='没有生成图片')
+
+    return FILES_PAGE_TEMPLATE.substitute(
+        session_id=escape(session_id),
+        timestamp=escape(session_data.get('timestamp', 'N/A')),
+        function_name=escape(session_data.get('function_name', 'N/A')),
+        archive_section=archive_section,
+        files_section=files_section,
+        images_section=images_section
+    )
 
 
 # ==================== 通用API端点 ====================
@@ -773,12 +1533,332 @@ async def list_functions():
     }
 
 
+@app.on_event("startup")
+async def start_executors():
+    """清理遗留的临时目录和过期产物，初始化执行池；有函数使用进程池时预先启动工作进程"""
+    progress_hub.bind(asyncio.get_running_loop())
+    await run_in_threadpool(scratch_space.purge_stale, settings.SCRATCH_STALE_SECONDS)
+    await run_in_threadpool(sweep_artifacts)
+    global _artifact_sweeper
+    if settings.ARTIFACT_SWEEP_INTERVAL > 0:
+        _artifact_sweeper = asyncio.create_task(sweep_artifacts_periodically())
+    configure_pools(settings.THREAD_POOL_WORKERS, settings.PROCESS_POOL_WORKERS)
+    configure_encode_pool(settings.IMAGE_ENCODE_WORKERS)
+    if any(e.mode == EXECUTOR_PROCESS for e in function_executors.values()):
+        await run_in_threadpool(warm_up_process_pool)
+
+
+@app.on_event("shutdown")
+async def stop_executors():
+    """取消未完成的异步任务和产物清理任务，关闭执行池"""
+    if _artifact_sweeper is not None:
+        _artifact_sweeper.cancel()
+    await job_manager.shutdown()
+    shutdown_pools()
+    shutdown_encode_pool()
+    scratch_space.shutdown()
+
+
 @app.get("/health", summary="健康检查")
 async def health_check():
     """健康检查端点"""
     return {"status": "healthy"}
 
 
+@app.get("/metrics", summary="Prometheus指标", response_class=PlainTextResponse)
+async def metrics():
+    """
+    以Prometheus文本格式导出各函数路由的请求耗时和分阶段耗时直方图
+
+    阶段: cache（缓存恢复）、queue（等待执行槽位）、function（函数执行）、encode（图片编码）、
+    base64（入库和base64）、zip（内嵌压缩包）、session（会话存储）、serialize（JSON序列化）、
+    coalesced（等待合并的请求）
+    """
+    return PlainTextResponse(api_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache/stats", summary="结果缓存统计")
+async def cache_stats():
+    """查看各函数结果缓存的命中、未命中和绕过次数"""
+    return {name: cache.get_stats() for name, cache in function_caches.items()}
+
+
+@app.get("/coalescing/stats", summary="请求合并统计")
+async def coalescing_stats():
+    """查看各函数的在途请求数、执行次数和被合并的请求数"""
+    return {name: flight.get_stats() for name, flight in function_single_flights.items()}
+
+
+@app.get("/jobs/stats", summary="异步任务统计")
+async def job_stats():
+    """查看排队、执行中的任务数和已结束任务的统计"""
+    return await job_manager.get_stats()
+
+
+@app.get("/jobs/{job_id}", summary="查询异步任务状态和结果")
+async def get_job(job_id: str, request: Request):
+    """
+    查询异步任务
+
+    任务未结束时返回当前状态；结束后返回与同步调用相同的APIResponse，
+    并附带 job_id 和 job_status。
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        return error_response(404, "Job not found", f"Job {job_id} does not exist or has expired")
+    return ModelJSONResponse(await job_content(job, str(request.base_url)))
+
+
+async def job_content(job: Dict, base_url: str) -> Union[Dict, APIResponse]:
+    """
+    任务记录转换为APIResponse格式（/jobs/{job_id} 和进度流的最终事件共用）
+
+    inline交付的任务在这里从产物存储恢复base64内容。
+    """
+    job_info = {
+        'job_id': job['job_id'],
+        'job_status': job['status'],
+        'status_url': f"{base_url}jobs/{job['job_id']}"
+    }
+    if job['response'] is not None:
+        response = job['response']
+        if job.get('delivery') == DELIVERY_INLINE:
+            try:
+                response = await run_in_threadpool(restore_job_response, response)
+            except LookupError as e:
+                return APIResponse(
+                    success=False,
+                    message=f"Error in {job['function_name']}",
+                    error=f"Job result is no longer available: {e}",
+                    **job_info
+                )
+        return {**response, **job_info}
+    if job['status'] == JOB_FAILED:
+        return APIResponse(
+            success=False,
+            message=f"Error in {job['function_name']}",
+            error="Job was cancelled",
+            **job_info
+        )
+    return APIResponse(
+        success=True,
+        message=f"Job {job['status']}: {job['function_name']}",
+        data={k: job[k] for k in ('function_name', 'created_at', 'started_at')},
+        **job_info
+    )
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """生成一条Server-Sent Events消息"""
+    return b"event: " + event.encode('utf-8') + b"\ndata: " + dump_json(data) + b"\n\n"
+
+
+@app.get("/progress/{job_id}", summary="异步任务进度推送（SSE）")
+async def progress_stream(job_id: str, request: Request):
+    """
+    以Server-Sent Events推送异步任务的进度
+
+    事件类型:
+        status: 订阅时的任务状态
+        progress: 函数上报的进度 {current, total, percent, message, timestamp}
+        result: 任务结束，数据与 /jobs/{job_id} 返回的APIResponse相同，之后连接关闭
+    """
+    if await job_manager.get(job_id) is None:
+        return error_response(404, "Job not found", f"Job {job_id} does not exist or has expired")
+
+    base_url = str(request.base_url)
+
+    async def events():
+        queue = progress_hub.subscribe(job_id)
+        try:
+            job = await job_manager.get(job_id)
+            yield sse_event("status", {'job_id': job_id, 'job_status': job['status'] if job else None})
+            latest = progress_hub.latest(job_id)
+            if latest is not None:
+                yield sse_event("progress", latest)
+
+            while True:
+                job = await job_manager.get(job_id)
+                if job is None or job['status'] in (JOB_SUCCEEDED, JOB_FAILED):
+                    if job is not None:
+                        yield sse_event("result", await job_content(job, base_url))
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # 注释行保持连接，避免被代理按空闲超时断开
+                    yield b": keepalive\n\n"
+                    continue
+                if isinstance(event, dict):
+                    yield sse_event("progress", event)
+        finally:
+            progress_hub.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/sessions/stats", summary="会话存储统计")
+async def session_stats():
+    """查看会话存储的条目数、占用字节数和淘汰统计"""
+    return await run_in_threadpool(session_storage.get_stats)
+
+
+@app.get("/scratch/stats", summary="临时工作目录统计")
+async def scratch_stats():
+    """查看临时目录的位置、占用字节数、使用中和待删除的目录数"""
+    return await run_in_threadpool(scratch_space.get_stats)
+
+
+@app.get("/artifacts/{digest}", summary="下载产物文件")
+async def download_artifact(digest: str, request: Request, filename: Optional[str] = None):
+    """
+    按内容摘要流式下载产物（文件、图片或压缩包）
+
+    支持 Range / If-Range 断点续传和分段下载，ETag即内容摘要。
+
+    Args:
+        digest: 内容的SHA-256摘要
+        filename: 下载时使用的文件名（可选）
+    """
+    path = artifact_store.path(digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    media_type = (mimetypes.guess_type(filename)[0] if filename else None) or "application/octet-stream"
+    # 内容寻址的产物永不变化，可以长期缓存
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return ranged_file_response(request.headers, path, make_etag(digest), media_type, headers)
+
+
+# 完整会话压缩包在产物存储中的派生产物名称
+ARCHIVE_VARIANT = "archive.zip"
+
+
+def session_archive_items(session_data: Dict) -> List[tuple]:
+    """收集会话中已入库的文件和图片，返回 (压缩包内文件名, 磁盘路径, 内容摘要) 列表"""
+    items = []
+    for item in session_data.get('files', []) + session_data.get('images', []):
+        path = artifact_store.path(item.get('digest')) if item.get('digest') else None
+        if path:
+            items.append((item['filename'], path, item['digest']))
+    return items
+
+
+def session_archive_entries(session_data: Dict) -> List[tuple]:
+    """收集会话中已入库的文件和图片，返回 (压缩包内文件名, 磁盘路径) 列表"""
+    return [(filename, path) for filename, path, _ in session_archive_items(session_data)]
+
+
+def archive_date_time(session_data: Dict) -> tuple:
+    """压缩包条目使用的修改时间（会话的创建时间）"""
+    try:
+        return datetime.strptime(session_data.get('timestamp', ''), "%Y-%m-%d %H:%M:%S").timetuple()[:6]
+    except ValueError:
+        return (1980, 1, 1, 0, 0, 0)
+
+
+def archive_digest(items: List[tuple], date_time: tuple) -> str:
+    """
+    会话压缩包的内容标识
+
+    条目名称、内容摘要和修改时间相同时，流式生成的压缩包逐字节相同，可以作为强ETag。
+    """
+    key = json.dumps({'entries': [[filename, digest] for filename, _, digest in items],
+                      'date_time': list(date_time)})
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def materialize_archive(digest: str, entries: List[tuple], date_time: tuple) -> str:
+    """将会话压缩包完整写入产物存储（范围请求需要按偏移读取），返回其路径"""
+    path = artifact_store.derived_path(digest, ARCHIVE_VARIANT)
+    if path is None:
+        path = artifact_store.put_derived_stream(
+            digest, ARCHIVE_VARIANT, iter_zip_stream(entries, date_time=date_time)
+        )
+    return path
+
+
+@app.get("/archive/{session_id}", summary="流式下载会话压缩包")
+async def download_archive(session_id: str, request: Request):
+    """
+    边压缩边发送会话的所有文件和图片
+
+    内存占用只与数据块大小有关；PNG等已压缩的条目直接存储，不再重复压缩。
+    支持 Range / If-Range 断点续传：第一次范围请求时把压缩包完整写入产物存储，
+    之后的请求（包括完整下载）直接从该文件发送。
+
+    Args:
+        session_id: 会话ID
+    """
+    session_data = await run_in_threadpool(session_storage.get, session_id)
+    if session_data is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    items = session_archive_items(session_data)
+    if not items:
+        raise HTTPException(status_code=404, detail="Session has no files to archive")
+
+    entries = [(filename, path) for filename, path, _ in items]
+    date_time = archive_date_time(session_data)
+    digest = archive_digest(items, date_time)
+    etag = make_etag(digest)
+    archive_name = session_data.get('archive_name') or f"{session_id}.zip"
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(archive_name)}"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag, "Accept-Ranges": "bytes"})
+
+    path = artifact_store.derived_path(digest, ARCHIVE_VARIANT)
+    if path is None and request.headers.get("range"):
+        path = await run_in_threadpool(materialize_archive, digest, entries, date_time)
+    if path is not None:
+        return ranged_file_response(request.headers, path, etag, "application/zip", headers)
+
+    return StreamingResponse(
+        iter_zip_stream(entries, date_time=date_time),
+        media_type="application/zip",
+        headers={**headers, "ETag": etag, "Accept-Ranges": "bytes"}
+    )
+
+
+@app.get("/thumbnails/{digest}", summary="获取图片缩略图")
+async def get_thumbnail(digest: str, size: int = 320):
+    """
+    获取图片的缩略图
+
+    缩略图第一次请求时生成并缓存到产物存储，之后直接返回缓存文件。
+
+    Args:
+        digest: 原图的SHA-256摘要
+        size: 缩略图最大边长（对齐到 160 / 320 / 640）
+    """
+    size = snap_thumbnail_size(size)
+    variant = f"thumb{size}{THUMBNAIL_ENCODING.extension}"
+
+    path = artifact_store.derived_path(digest, variant)
+    if path is None:
+        source_path = artifact_store.path(digest)
+        if source_path is None:
+            raise HTTPException(status_code=404, detail="Artifact not found")
+        try:
+            thumbnail = await run_in_threadpool(make_thumbnail, source_path, size)
+        except OSError:
+            raise HTTPException(status_code=415, detail="Artifact is not an image")
+        path = await run_in_threadpool(artifact_store.put_derived, digest, variant, thumbnail.data)
+
+    return FileResponse(
+        path,
+        media_type=THUMBNAIL_ENCODING.content_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
 @app.get("/files/{session_id}", summary="查看文件列表页面")
 async def view_files_page(session_id: str):
     """
@@ -790,7 +1870,9 @@ async def view_files_page(session_id: str):
     Returns:
         HTML页面，展示所有文件和图片
     """
-    if session_id not in session_storage:
+    # 只读取一次，避免检查和渲染之间会话恰好过期
+    session_data = await run_in_threadpool(session_storage.get, session_id)
+    if session_data is None:
         return HTMLResponse(
             content="""
             <html>
@@ -804,5 +1886,5 @@ async def view_files_page(session_id: str):
             status_code=404
         )
 
-    html = generate_files_html(session_id)
+    html = generate_files_html(session_id, session_data)
     return HTMLResponse(content=html)
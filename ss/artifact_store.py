@@ -0,0 +1,245 @@
+"""
+内容寻址产物存储模块
+按SHA-256摘要将函数输出的文件和图片落盘，供 /artifacts/{digest} 端点流式下载
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+# 流式读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 合法的摘要格式（64位小写十六进制）
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# 合法的派生产物名称（如缩略图 thumb320.webp）
+_VARIANT_RE = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+@dataclass
+class ArtifactInfo:
+    """已入库产物的元数据"""
+    digest: str
+    size: int
+    path: str
+
+
+def collect_digests(value: Any, into: Optional[Set[str]] = None) -> Set[str]:
+    """收集会话、缓存条目或任务记录中引用的所有产物摘要（递归查找 digest 字段）"""
+    if into is None:
+        into = set()
+    if isinstance(value, dict):
+        digest = value.get('digest')
+        if isinstance(digest, str) and _DIGEST_RE.match(digest):
+            into.add(digest)
+        for item in value.values():
+            if isinstance(item, (dict, list)):
+                collect_digests(item, into)
+    elif isinstance(value, list):
+        for item in value:
+            collect_digests(item, into)
+    return into
+
+
+class ArtifactStore:
+    """
+    内容寻址的产物存储
+
+    相同内容只保存一份，文件路径为 <root>/<digest前两位>/<digest>。
+    写入先落到临时文件再原子替换，多个进程共享同一目录也是安全的。
+    重复写入相同内容时刷新文件的修改时间，sweep 按修改时间淘汰最久未写入的产物。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+        # 统计信息
+        self.swept_files = 0
+        self.swept_bytes = 0
+
+    @staticmethod
+    def is_valid_digest(digest: str) -> bool:
+        """检查摘要格式，防止路径穿越"""
+        return bool(digest) and bool(_DIGEST_RE.match(digest))
+
+    def _path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """刷新已有文件的修改时间，文件不存在返回False"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def _commit(self, temp_path: str, digest: str, size: int) -> ArtifactInfo:
+        """将临时文件放到摘要对应的位置（内容已存在则丢弃临时文件）"""
+        final_path = self._path_for(digest)
+        if self._touch(final_path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+        return ArtifactInfo(digest=digest, size=size, path=final_path)
+
+    def put_bytes(self, data: bytes) -> ArtifactInfo:
+        """保存一段内存中的字节内容"""
+        digest = hashlib.sha256(data).hexdigest()
+        final_path = self._path_for(digest)
+        if self._touch(final_path):
+            return ArtifactInfo(digest=digest, size=len(data), path=final_path)
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with os.fdopen(temp_fd, 'wb') as f:
+                f.write(data)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return self._commit(temp_path, digest, len(data))
+
+    def put_file(self, filepath: str) -> ArtifactInfo:
+        """
+        保存磁盘上的文件
+
+        边读边计算摘要边写临时文件，内存占用只与CHUNK_SIZE有关。
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        temp_fd, temp_path = tempfile.mkstemp(dir=self.root, suffix='.part')
+        try:
+            with open(filepath, 'rb') as src, os.fdopen(temp_fd, 'wb') as dst:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        return self._commit(temp_path, hasher.hexdigest(), size)
+
+    def path(self, digest: str) -> Optional[str]:
+        """返回摘要对应的文件路径，不存在时返回None"""
+        if not self.is_valid_digest(digest):
+            return None
+        final_path = self._path_for(digest)
+        return final_path if os.path.exists(final_path) else None
+
+    def exists(self, digest: str) -> bool:
+        """检查产物是否存在"""
+        return self.path(digest) is not None
+
+    # ---------- 派生产物（缩略图等，由原始产物计算得到，可随时重新生成） ----------
+
+    def _derived_path_for(self, digest: str, variant: str) -> str:
+        if not self.is_valid_digest(digest) or not _VARIANT_RE.match(variant):
+            raise ValueError(f"Invalid derived artifact key: {digest}/{variant}")
+        return os.path.join(self.root, 'derived', digest[:2], f"{digest}.{variant}")
+
+    def derived_path(self, digest: str, variant: str) -> Optional[str]:
+        """返回派生产物的路径，不存在时返回None"""
+        try:
+            path = self._derived_path_for(digest, variant)
+        except ValueError:
+            return None
+        return path if os.path.exists(path) else None
+
+    def put_derived(self, digest: str, variant: str, data: bytes) -> str:
+        """保存派生产物，返回其路径（并发生成时后写入者原子覆盖，内容相同）"""
+        return self.put_derived_stream(digest, variant, (data,))
+
+    def put_derived_stream(self, digest: str, variant: str, chunks: Iterable[bytes]) -> str:
+        """边生成边保存派生产物（如完整的会话压缩包），内存占用只与数据块大小有关"""
+        final_path = self._derived_path_for(digest, variant)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), suffix='.part')
+        try:
+            with os.fdopen(temp_fd, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temp_path, final_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return final_path
+
+    # ---------- 保留策略 ----------
+
+    def _scan(self):
+        """遍历存储目录，返回 [(修改时间, 字节数, 路径, 原始产物摘要, 是否临时文件)]，派生产物的摘要为None"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            derived = os.path.relpath(dirpath, self.root).split(os.sep)[0] == 'derived'
+            for name in filenames:
+                temp = name.endswith('.part')
+                if not temp and not derived and not self.is_valid_digest(name):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                digest = name if not (temp or derived) else None
+                files.append((st.st_mtime, st.st_size, path, digest, temp))
+        return files
+
+    def sweep(self, max_bytes: int = 0, max_age: float = 0, keep: Iterable[str] = (),
+              min_age: float = 600) -> Dict:
+        """
+        按修改时间从旧到新淘汰产物，直到满足字节数和年龄限制
+
+        摘要在 keep 中（仍被会话、缓存条目或任务结果引用）的原始产物保留；派生产物可以重新生成，
+        不受 keep 保护。修改时间在 min_age 秒内的文件总是保留（刚写入、还未登记到会话中的产物），
+        超过 min_age 的临时文件是中断的写入，直接删除。
+
+        Args:
+            max_bytes: 所有产物的最大总字节数，0表示不限制
+            max_age: 产物的最长保留时间（秒），0表示不限制
+            keep: 需要保留的原始产物摘要
+            min_age: 最短保留时间（秒）
+
+        Returns:
+            本次清理的统计
+        """
+        keep = set(keep)
+        now = time.time()
+        files = sorted(self._scan())
+        total = sum(f[1] for f in files)
+        removed = removed_bytes = 0
+
+        for mtime, size, path, digest, temp in files:
+            age = now - mtime
+            if age < min_age or digest in keep:
+                continue
+            expired = max_age and age > max_age
+            over_limit = max_bytes and total > max_bytes
+            if not (temp or expired or over_limit):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+            removed_bytes += size
+
+        self.swept_files += removed
+        self.swept_bytes += removed_bytes
+        return {
+            'files': len(files) - removed,
+            'bytes': total,
+            'removed': removed,
+            'removed_bytes': removed_bytes
+        }
@@ -0,0 +1,117 @@
+"""
+序列化基准测试 - 对比响应的两种序列化路径
+
+    旧路径: JSONResponse(response.model_dump())   模型 -> 字典 -> json.dumps -> str -> bytes
+    新路径: ModelJSONResponse(response)           模型 -> bytes（pydantic-core 直接写出）
+
+使用4张随机噪声图片（压缩后体积接近原始大小，base64字符串约几MB）构造响应，
+分别统计峰值内存（tracemalloc）和平均耗时。
+
+运行: python bench_serialization.py [--size 1024] [--repeat 10]
+"""
+import argparse
+import base64
+import gc
+import hashlib
+import os
+import statistics
+import time
+import tracemalloc
+
+from PIL import Image
+from starlette.responses import JSONResponse
+
+from api_service import APIResponse, Base64Image
+from image_encoding import ImageEncoding, encode_image
+from serialization import ModelJSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def build_response(size: int, count: int = 4) -> APIResponse:
+    """构造包含 count 张内嵌图片的响应（不写入产物存储）"""
+    encoding = ImageEncoding("PNG", {"compress_level": 1})
+    images = []
+    for i in range(count):
+        encoded = encode_image(Image.frombytes("RGB", (size, size), os.urandom(size * size * 3)), encoding)
+        images.append(Base64Image(
+            filename=f"image_{i + 1}.png",
+            format=encoded.format,
+            size=f"{encoded.width}x{encoded.height}",
+            data=base64.b64encode(encoded.data).decode('utf-8'),
+            digest=hashlib.sha256(encoded.data).hexdigest()
+        ))
+    return APIResponse(
+        success=True,
+        message="benchmark",
+        data={"points": list(range(100))},
+        images=images
+    )
+
+
+def render_dict_path(response: APIResponse) -> bytes:
+    return JSONResponse(content=response.model_dump()).body
+
+
+def render_model_path(response: APIResponse) -> bytes:
+    return ModelJSONResponse(response).body
+
+
+def render_orjson_path(response: APIResponse) -> bytes:
+    return orjson.dumps(response.model_dump())
+
+
+def measure(render, response: APIResponse, repeat: int):
+    """返回 (输出字节数, 峰值额外内存, 平均耗时秒, 最短耗时秒)"""
+    gc.collect()
+    tracemalloc.start()
+    body = render(response)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(body)
+    del body
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        render(response)
+        timings.append(time.perf_counter() - start)
+    return size, peak, statistics.mean(timings), min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="APIResponse 序列化基准测试")
+    parser.add_argument("--size", type=int, default=1024, help="图片边长（像素）")
+    parser.add_argument("--repeat", type=int, default=10, help="计时重复次数")
+    args = parser.parse_args()
+
+    response = build_response(args.size)
+    payload = sum(len(img.data) for img in response.images)
+    print(f"4张 {args.size}x{args.size} 图片，base64总长度 {payload / 1024 / 1024:.1f} MB\n")
+
+    paths = [
+        ("model_dump + JSONResponse", render_dict_path),
+        ("ModelJSONResponse", render_model_path),
+    ]
+    if orjson is not None:
+        paths.append(("model_dump + orjson（参考）", render_orjson_path))
+
+    print(f"{'路径':<30}{'输出(MB)':>10}{'峰值内存(MB)':>14}{'平均(ms)':>10}{'最短(ms)':>10}")
+    results = {}
+    for name, render in paths:
+        size, peak, mean, best = measure(render, response, args.repeat)
+        results[name] = (peak, mean)
+        print(f"{name:<30}{size / 1024 / 1024:>10.1f}{peak / 1024 / 1024:>14.1f}"
+              f"{mean * 1000:>10.1f}{best * 1000:>10.1f}")
+
+    old_peak, old_mean = results["model_dump + JSONResponse"]
+    new_peak, new_mean = results["ModelJSONResponse"]
+    print(f"\n峰值内存减少 {(1 - new_peak / old_peak) * 100:.0f}%，平均耗时减少 {(1 - new_mean / old_mean) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+启动耗时基准测试 - 对比按清单延迟导入和启动时导入全部函数模块的耗时
+
+    延迟导入: import main（只读取 functions.json，不导入 sample_functions）
+    立即导入: import main 后再导入清单中的全部实现模块（相当于原来在 main.py 中直接 import）
+
+每种情况都在新的解释器进程中测量，取多次运行的中位数。
+
+运行: python bench_startup.py [--repeat 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from config import settings
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 在子进程中执行：测量导入耗时和加载的模块数
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+for module_name in {modules!r}:
+    __import__(module_name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "modules": len(sys.modules),
+    "pandas": "pandas" in sys.modules,
+    "numpy": "numpy" in sys.modules
+}}))
+"""
+
+
+def manifest_modules() -> list:
+    """清单中全部实现模块的名称"""
+    manifest_path = settings.FUNCTION_MANIFEST
+    if not os.path.isabs(manifest_path):
+        manifest_path = os.path.join(HERE, manifest_path)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    return sorted({item["target"].partition(":")[0] for item in manifest.get("functions", [])})
+
+
+def measure(modules: list, repeat: int) -> dict:
+    """在新进程中重复测量，返回中位数结果"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(modules=modules)],
+            cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    result = dict(runs[-1])
+    result["seconds"] = statistics.median(run["seconds"] for run in runs)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每种情况的运行次数")
+    args = parser.parse_args()
+
+    cases = [
+        ("延迟导入（清单）", []),
+        ("立即导入全部函数模块", manifest_modules()),
+    ]
+
+    print(f"{'方式':<24}{'耗时(ms)':>10}{'模块数':>8}{'pandas':>8}{'numpy':>8}")
+    results = []
+    for name, modules in cases:
+        result = measure(modules, args.repeat)
+        results.append(result)
+        print(f"{name:<24}{result['seconds'] * 1000:>10.1f}{result['modules']:>8}"
+              f"{str(result['pandas']):>8}{str(result['numpy']):>8}")
+
+    lazy, eager = results
+    print(f"\n启动耗时减少 {(1 - lazy['seconds'] / eager['seconds']) * 100:.0f}%"
+          f"（{(eager['seconds'] - lazy['seconds']) * 1000:.0f} ms），"
+          f"这部分开销推迟到各函数第一次被调用时")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,29 @@
 """
 import requests
 import base64
+import email.parser
+import email.policy
 import json
 from PIL import Image
 import io
 import os
+import time
 from typing import Dict, List, Any
 
+# MessagePack为可选依赖，只有使用 response_format="msgpack" 时需要
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# response_format -> Accept 请求头
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "multipart": "multipart/mixed",
+    "msgpack": "application/msgpack",
+}
+
 
 class APIClient:
     """API客户端封装"""
@@ -17,23 +34,31 @@ class APIClient:
     def __init__(self, base_url: str = "http://localhost:8000"):
         self.base_url = base_url.rstrip('/')
 
-    def call_function(self, endpoint: str, **kwargs) -> Dict[str, Any]:
+    def call_function(self, endpoint: str, delivery: str = None, response_format: str = "json",
+                      **kwargs) -> Dict[str, Any]:
         """
         调用API函数
 
         Args:
             endpoint: API端点路径，如 "/api/function1"
+            delivery: 交付模式，"inline"（默认，内嵌base64）或 "url"（只返回下载URL）
+            response_format: 响应格式，"json"（默认）、"multipart" 或 "msgpack"；
+                后两种直接传输文件和图片的原始字节，结果中对应条目的 content 字段为bytes
             **kwargs: 函数参数
 
         Returns:
             API响应字典
         """
         url = f"{self.base_url}{endpoint}"
+        params = {"delivery": delivery} if delivery else None
+        headers = {"Accept": RESPONSE_FORMATS[response_format]}
+        if response_format == "msgpack" and msgpack is None:
+            raise RuntimeError("response_format='msgpack' requires: pip install msgpack")
 
         try:
-            response = requests.post(url, json=kwargs, timeout=300)
+            response = requests.post(url, json=kwargs, params=params, headers=headers, timeout=300)
             response.raise_for_status()
-            return response.json()
+            return self.parse_response(response)
         except requests.exceptions.RequestException as e:
             return {
                 "success": False,
@@ -41,6 +66,167 @@ class APIClient:
                 "message": "请求失败"
             }
 
+    def parse_response(self, response: requests.Response) -> Dict[str, Any]:
+        """
+        按 Content-Type 解析响应
+
+        multipart 和 msgpack 响应中的原始字节放到对应条目的 content 字段，
+        data 字段保持为空，返回的字典结构与JSON响应相同。
+        """
+        content_type = response.headers.get("Content-Type", "")
+
+        if content_type.startswith("multipart/"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + response.content
+            )
+            parts = list(message.iter_parts())
+            result = json.loads(parts[0].get_payload(decode=True))
+
+            # 按 (字段名, 文件名) 对应元数据中的条目
+            entries = {}
+            for field in ("files", "images"):
+                for item in result.get(field) or []:
+                    entries[(field, item['filename'])] = item
+            if result.get('archive'):
+                entries[("archive", result['archive']['filename'])] = result['archive']
+
+            for part in parts[1:]:
+                name = part.get_param("name", header="content-disposition")
+                item = entries.get((name, part.get_filename()))
+                if item is not None:
+                    item['content'] = part.get_payload(decode=True)
+            return result
+
+        if content_type.startswith("application/msgpack"):
+            result = msgpack.unpackb(response.content, raw=False)
+            items = (result.get('files') or []) + (result.get('images') or [])
+            if result.get('archive'):
+                items.append(result['archive'])
+            for item in items:
+                if isinstance(item.get('data'), bytes):
+                    item['content'] = item['data']
+                    item['data'] = ""
+            return result
+
+        return response.json()
+
+    def call_batch(self, endpoint: str, items: List[Dict], delivery: str = None,
+                   max_parallel: int = None) -> Dict[str, Any]:
+        """
+        批量调用API函数
+
+        Args:
+            endpoint: API端点路径，如 "/api/function1"
+            items: 参数组列表
+            delivery: 交付模式
+            max_parallel: 服务端同时执行的参数组数
+
+        Returns:
+            批量响应字典，results 与 items 一一对应
+        """
+        url = f"{self.base_url}{endpoint}/batch"
+        params = {}
+        if delivery:
+            params["delivery"] = delivery
+        if max_parallel:
+            params["max_parallel"] = max_parallel
+
+        try:
+            response = requests.post(url, json=items, params=params, timeout=3600)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "message": "请求失败",
+                "results": []
+            }
+
+    def submit_job(self, endpoint: str, delivery: str = None, **kwargs) -> Dict[str, Any]:
+        """
+        以异步模式提交函数调用，立即返回任务信息（job_id、status_url）
+        """
+        url = f"{self.base_url}{endpoint}"
+        params = {"mode": "async"}
+        if delivery:
+            params["delivery"] = delivery
+
+        response = requests.post(url, json=kwargs, params=params, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def wait_for_job(self, job: Dict, poll_interval: float = 1.0, timeout: float = 3600) -> Dict[str, Any]:
+        """
+        轮询异步任务直到结束
+
+        Returns:
+            与同步调用相同格式的API响应字典
+        """
+        deadline = time.time() + timeout
+        while True:
+            response = requests.get(job["status_url"], timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            if result.get("job_status") in ("succeeded", "failed"):
+                return result
+            if time.time() > deadline:
+                raise TimeoutError(f"Job {job['job_id']} did not finish in {timeout}s")
+            time.sleep(poll_interval)
+
+    def stream_progress(self, job: Dict, on_progress=None) -> Dict[str, Any]:
+        """
+        订阅异步任务的进度推送（Server-Sent Events）直到任务结束
+
+        Args:
+            job: submit_job 返回的任务信息（需要包含 progress_url）
+            on_progress: 收到进度事件时调用，参数为进度字典
+
+        Returns:
+            与同步调用相同格式的API响应字典
+        """
+        event = None
+        with requests.get(job["progress_url"], stream=True, timeout=(10, None)) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data = json.loads(line[len("data:"):])
+                    if event == "progress" and on_progress:
+                        on_progress(data)
+                    elif event == "result":
+                        return data
+        # 连接提前断开时退回轮询
+        return self.wait_for_job(job)
+
+    def download_url(self, url: str, filepath: str, resume: bool = False) -> int:
+        """
+        流式下载URL指向的产物到本地文件
+
+        Args:
+            resume: 本地文件已存在时用Range请求只下载剩余部分（断点续传）
+
+        Returns:
+            本地文件的字节数
+        """
+        offset = os.path.getsize(filepath) if resume and os.path.exists(filepath) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with requests.get(url, stream=True, timeout=300, headers=headers) as response:
+            if response.status_code == 416:
+                # 本地文件已完整
+                return offset
+            response.raise_for_status()
+            if response.status_code != 206:
+                # 服务端返回完整内容，从头写入
+                offset = 0
+            with open(filepath, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+                    offset += len(chunk)
+        return offset
+
     def save_result_files(self, result: Dict, output_dir: str = "downloads"):
         """
         保存API返回的文件和图片
@@ -59,19 +245,41 @@ class APIClient:
         # 保存文件
         if result.get('files'):
             for file_data in result['files']:
-                if file_data.get('data'):  # 检查是否有数据
+                if file_data.get('content') or file_data.get('data'):  # 检查是否有数据
                     try:
-                        file_content = base64.b64decode(file_data['data'])
+                        # multipart / msgpack 响应直接是原始字节
+                        file_content = file_data.get('content') or base64.b64decode(file_data['data'])
                         filepath = os.path.join(output_dir, file_data['filename'])
                         with open(filepath, 'wb') as f:
                             f.write(file_content)
                         print(f"✓ 已保存文件: {file_data['filename']} ({file_data['size']} bytes)")
                     except Exception as e:
                         print(f"✗ 保存文件失败 {file_data['filename']}: {e}")
+                elif file_data.get('url'):  # url交付模式
+                    try:
+                        filepath = os.path.join(output_dir, file_data['filename'])
+                        size = self.download_url(file_data['url'], filepath)
+                        print(f"✓ 已下载文件: {file_data['filename']} ({size} bytes)")
+                    except Exception as e:
+                        print(f"✗ 下载文件失败 {file_data['filename']}: {e}")
 
         # 保存图片
         if result.get('images'):
             for img_data in result['images']:
+                if img_data.get('content'):  # multipart / msgpack 响应，原始字节直接写盘
+                    filepath = os.path.join(output_dir, img_data['filename'])
+                    with open(filepath, 'wb') as f:
+                        f.write(img_data['content'])
+                    print(f"✓ 已保存图片: {img_data['filename']} ({img_data['size']})")
+                    continue
+                if not img_data.get('data') and img_data.get('url'):  # url交付模式
+                    try:
+                        filepath = os.path.join(output_dir, img_data['filename'])
+                        self.download_url(img_data['url'], filepath)
+                        print(f"✓ 已下载图片: {img_data['filename']} ({img_data['size']})")
+                    except Exception as e:
+                        print(f"✗ 下载图片失败 {img_data['filename']}: {e}")
+                    continue
                 try:
                     img_bytes = base64.b64decode(img_data['data'])
                     img = Image.open(io.BytesIO(img_bytes))
@@ -85,14 +293,26 @@ class APIClient:
         if result.get('archive'):
             try:
                 archive_data = result['archive']
-                if archive_data.get('data'):
-                    archive_content = base64.b64decode(archive_data['data'])
+                if archive_data.get('content') or archive_data.get('data'):
+                    archive_content = archive_data.get('content') or base64.b64decode(archive_data['data'])
                     archive_path = os.path.join(output_dir, archive_data['filename'])
                     with open(archive_path, 'wb') as f:
                         f.write(archive_content)
                     print(f"✓ 已保存压缩包: {archive_data['filename']} ({archive_data['size']} bytes)")
+                elif archive_data.get('url'):  # url交付模式
+                    archive_path = os.path.join(output_dir, archive_data['filename'])
+                    size = self.download_url(archive_data['url'], archive_path)
+                    print(f"✓ 已下载压缩包: {archive_data['filename']} ({size} bytes)")
             except Exception as e:
                 print(f"✗ 保存压缩包失败: {e}")
+        elif result.get('archive_url'):
+            # 压缩包未内嵌时，从流式压缩包端点下载
+            try:
+                archive_path = os.path.join(output_dir, "output.zip")
+                size = self.download_url(result['archive_url'], archive_path)
+                print(f"✓ 已下载压缩包: output.zip ({size} bytes)")
+            except Exception as e:
+                print(f"✗ 下载压缩包失败: {e}")
 
     def get_functions_list(self) -> List[Dict]:
         """获取所有可用函数列表"""
@@ -383,6 +603,7 @@ def example_8_download_archive():
 
     result = client.call_function(
         "/api/function5",
+        delivery="url",
         title="Archive Test",
         x_label="Time",
         y_label="Value",
@@ -395,22 +616,15 @@ def example_8_download_archive():
         print(f"文件数量: {len(result.get('files', []))}")
         print(f"图片数量: {len(result.get('images', []))}")
 
-        if result.get('archive'):
-            print(f"\n✓ 压缩包已生成:")
-            print(f"  - 文件名: {result['archive']['filename']}")
-            print(f"  - 大小: {result['archive']['size']} bytes")
-            print(f"  - 类型: {result['archive']['content_type']}")
+        if result.get('archive_url'):
+            print(f"\n✓ 压缩包下载地址: {result['archive_url']}")
 
-            # 只保存压缩包
+            # 只保存压缩包（服务端边压缩边发送，客户端边接收边写盘）
             os.makedirs("downloads/example8", exist_ok=True)
-            archive_data = result['archive']
-            archive_content = base64.b64decode(archive_data['data'])
-            archive_path = os.path.join("downloads/example8", archive_data['filename'])
+            archive_path = os.path.join("downloads/example8", "function5_output.zip")
+            size = client.download_url(result['archive_url'], archive_path)
 
-            with open(archive_path, 'wb') as f:
-                f.write(archive_content)
-
-            print(f"\n✓ 压缩包已保存到: {archive_path}")
+            print(f"\n✓ 压缩包已保存到: {archive_path} ({size} bytes)")
             print("  你可以直接解压此文件来获取所有输出文件")
         else:
             print("\n✗ 未生成压缩包")
@@ -418,6 +632,65 @@ def example_8_download_archive():
         print(f"\n✗ 请求失败: {result.get('error')}")
 
 
+def example_9_batch():
+    """示例9: 批量调用（参数扫描）"""
+    print("\n" + "="*60)
+    print("示例9: 批量调用")
+    print("="*60)
+
+    client = APIClient()
+
+    # 一次请求提交多组参数，服务端并行执行
+    items = [
+        {
+            "param1": f"sweep_{i}",
+            "param2": "test_value",
+            "param3": i,
+            "param4": "option_a",
+            "param5": 10 * i
+        }
+        for i in range(1, 11)
+    ]
+    result = client.call_batch("/api/function1", items, delivery="url", max_parallel=4)
+
+    print(f"\n消息: {result.get('message')}")
+    for i, item in enumerate(result.get('results', []), 1):
+        status = "✓" if item.get('success') else f"✗ {item.get('error')}"
+        print(f"  参数组{i}: {status}")
+
+    if result.get('archive_url'):
+        os.makedirs("downloads/example9", exist_ok=True)
+        archive_path = os.path.join("downloads/example9", "function1_batch_output.zip")
+        size = client.download_url(result['archive_url'], archive_path)
+        print(f"\n✓ 所有参数组的产物已保存到: {archive_path} ({size} bytes)")
+
+
+def example_10_binary_formats():
+    """示例10: 二进制响应格式（multipart / MessagePack）"""
+    print("\n" + "="*60)
+    print("示例10: 二进制响应格式")
+    print("="*60)
+
+    client = APIClient()
+
+    formats = ["multipart"] + (["msgpack"] if msgpack is not None else [])
+    for response_format in formats:
+        result = client.call_function(
+            "/api/function5",
+            response_format=response_format,
+            title=f"Binary {response_format}",
+            x_label="Time",
+            y_label="Value",
+            data_points=20,
+            color="green"
+        )
+        if result.get('success'):
+            print(f"\n[{response_format}] 消息: {result.get('message')}")
+            client.save_result_files(result, f"downloads/example10/{response_format}")
+        else:
+            print(f"\n[{response_format}] ✗ 请求失败: {result.get('error')}")
+
+
 # ==================== 主程序 ====================
 
 def main():
@@ -440,6 +713,8 @@ def main():
         example_7_save_metadata()
         example_6_with_retry()
         example_8_download_archive()
+        example_9_batch()
+        example_10_binary_formats()
 
         # 运行所有函数（需要更多时间）
         choice = input("\n是否运行所有6个函数示例？(y/n): ")
@@ -455,6 +730,8 @@ def main():
         print("  - downloads/example6/")
         print("  - downloads/example7/")
         print("  - downloads/example8/ (压缩包示例)")
+        print("  - downloads/example9/ (批量调用示例)")
+        print("  - downloads/example10/ (二进制响应格式示例)")
 
     except KeyboardInterrupt:
         print("\n\n用户中断")
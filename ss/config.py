@@ -30,6 +30,68 @@ class Settings:
     OUTPUT_DIR: str = "outputs"
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
 
+    # 产物存储配置
+    ARTIFACT_DIR: str = os.getenv("ARTIFACT_DIR", os.path.join("outputs", "artifacts"))
+    # 产物保留策略：启动时和每隔 ARTIFACT_SWEEP_INTERVAL 秒按修改时间淘汰最旧的产物，
+    # 仍被会话、结果缓存或任务结果引用的产物保留；0表示不限制
+    ARTIFACT_MAX_BYTES: int = int(os.getenv("ARTIFACT_MAX_BYTES", str(10 * 1024 * 1024 * 1024)))  # 10GB
+    ARTIFACT_MAX_AGE: int = int(os.getenv("ARTIFACT_MAX_AGE", str(7 * 24 * 3600)))  # 7天
+    ARTIFACT_MIN_AGE: int = int(os.getenv("ARTIFACT_MIN_AGE", "600"))  # 刚写入的产物至少保留的秒数
+    ARTIFACT_SWEEP_INTERVAL: int = int(os.getenv("ARTIFACT_SWEEP_INTERVAL", "600"))  # 清理间隔（秒）
+    # 响应交付模式: inline（base64内嵌，默认）| url（只返回下载URL和元数据）
+    DELIVERY_MODE: str = os.getenv("API_DELIVERY_MODE", "inline")
+
+    # 函数执行配置
+    # 默认执行方式: inline | thread | process，可在 registry.register 中按函数覆盖
+    DEFAULT_EXECUTOR: str = os.getenv("API_DEFAULT_EXECUTOR", "thread")
+    THREAD_POOL_WORKERS: int = int(os.getenv("API_THREAD_POOL_WORKERS", "16"))
+    PROCESS_POOL_WORKERS: int = int(os.getenv("API_PROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+    # 图片编码配置（可在 registry.register 中按函数用 image_format / image_options 覆盖）
+    IMAGE_FORMAT: str = os.getenv("IMAGE_FORMAT", "PNG")  # PNG | WEBP | JPEG
+    PNG_COMPRESS_LEVEL: int = int(os.getenv("PNG_COMPRESS_LEVEL", "6"))  # 0-9，越小越快
+    IMAGE_ENCODE_WORKERS: int = int(os.getenv("IMAGE_ENCODE_WORKERS", str(os.cpu_count() or 1)))
+
+    # 结果缓存配置（在 registry.register 中用 cache_ttl 按函数开启）
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+    RESULT_CACHE_MAX_BYTES: int = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))  # 每个函数16MB
+
+    # 会话存储配置（/files/{session_id} 和 /archive/{session_id} 使用）
+    # memory: 进程内存（单进程）；sqlite: SQLite数据库（WAL），多个服务进程（--workers N）共享
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", os.path.join("outputs", "sessions.db"))
+    SESSION_DB_MAX_BYTES: int = int(os.getenv("SESSION_DB_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+    SESSION_TTL: int = int(os.getenv("SESSION_TTL", "3600"))  # 会话有效期（秒）
+    SESSION_MAX_ENTRIES: int = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+    SESSION_MAX_BYTES: int = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # 64MB
+    SESSION_SPILL_DIR: str = os.getenv("SESSION_SPILL_DIR", os.path.join("outputs", "sessions"))
+    SESSION_SPILL_THRESHOLD: int = int(os.getenv("SESSION_SPILL_THRESHOLD", str(256 * 1024)))  # 256KB
+    SESSION_MAX_SPILL_BYTES: int = int(os.getenv("SESSION_MAX_SPILL_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+
+    # 临时工作目录配置（每次函数调用独立的目录，为空时优先使用 /dev/shm）
+    SCRATCH_DIR: str = os.getenv("SCRATCH_DIR", "")
+    SCRATCH_MAX_BYTES: int = int(os.getenv("SCRATCH_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+    SCRATCH_MIN_FREE_BYTES: int = int(os.getenv("SCRATCH_MIN_FREE_BYTES", str(64 * 1024 * 1024)))  # 64MB
+    SCRATCH_USAGE_TTL: float = float(os.getenv("SCRATCH_USAGE_TTL", "1.0"))  # 占用统计的缓存秒数
+    SCRATCH_STALE_SECONDS: int = int(os.getenv("SCRATCH_STALE_SECONDS", "3600"))  # 启动时清理的遗留目录年龄
+
+    # 异步任务配置（?mode=async 调用，结果通过 /jobs/{job_id} 查询）
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))  # 同时执行的后台任务数
+    JOB_MAX_PENDING: int = int(os.getenv("JOB_MAX_PENDING", "100"))  # 排队和执行中的最大任务数
+    JOB_RESULT_TTL: int = int(os.getenv("JOB_RESULT_TTL", "3600"))  # 任务结果保留时间（秒）
+    JOB_MAX_RESULTS: int = int(os.getenv("JOB_MAX_RESULTS", "1000"))
+    JOB_RESULT_MAX_BYTES: int = int(os.getenv("JOB_RESULT_MAX_BYTES", str(64 * 1024 * 1024)))  # 任务结果的最大总字节数
+    PROGRESS_KEEPALIVE: float = float(os.getenv("PROGRESS_KEEPALIVE", "15"))  # 进度流无事件时的保活间隔（秒）
+
+    # 批量调用配置（{route}/batch）
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "1000"))  # 单次批量请求的最大参数组数
+    BATCH_DEFAULT_PARALLEL: int = int(os.getenv("BATCH_DEFAULT_PARALLEL", "4"))  # 默认并行度
+    BATCH_MAX_PARALLEL: int = int(os.getenv("BATCH_MAX_PARALLEL", "32"))  # max_parallel 的上限
+
+    # 函数清单配置（main.py 按清单注册函数，实现模块在第一次调用时才导入）
+    FUNCTION_MANIFEST: str = os.getenv("FUNCTION_MANIFEST", "functions.json")
+    SIGNATURE_CACHE: str = os.getenv("SIGNATURE_CACHE", os.path.join("outputs", "signature_cache.json"))
+
     # 日志配置
     LOG_LEVEL: str = "info"
 
@@ -0,0 +1,189 @@
+"""
+函数执行引擎模块
+将注册函数的调用移出事件循环，支持 inline / 线程池 / 预热进程池 三种执行方式，
+并为每个函数提供独立的最大并发数和排队超时控制
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+
+from metrics import PhaseTimer
+from progress import get_process_queue, init_worker
+
+
+# 执行方式
+EXECUTOR_INLINE = "inline"  # 直接在事件循环中调用（仅适合极快的函数）
+EXECUTOR_THREAD = "thread"  # 线程池（适合IO密集或释放GIL的函数）
+EXECUTOR_PROCESS = "process"  # 进程池（适合CPU密集的纯Python函数）
+
+EXECUTOR_MODES = (EXECUTOR_INLINE, EXECUTOR_THREAD, EXECUTOR_PROCESS)
+
+
+class ExecutorBusyError(Exception):
+    """排队等待执行槽位超时"""
+
+
+# 全局共享的执行池（按需创建）
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+# 执行池大小，由 configure_pools 设置
+_thread_workers: Optional[int] = None
+_process_workers: Optional[int] = None
+
+
+def configure_pools(thread_workers: Optional[int] = None, process_workers: Optional[int] = None):
+    """设置执行池大小（需在第一次调用前设置）"""
+    global _thread_workers, _process_workers
+    _thread_workers = thread_workers
+    _process_workers = process_workers
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """获取全局线程池"""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=_thread_workers,
+            thread_name_prefix="api-func"
+        )
+    return _thread_pool
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池（工作进程中的进度回调通过进度队列送回主进程）"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=_process_workers,
+            initializer=init_worker,
+            initargs=(get_process_queue(),)
+        )
+    return _process_pool
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def warm_up_process_pool():
+    """预先启动所有工作进程，避免第一个请求承担进程启动和模块导入的开销"""
+    pool = get_process_pool()
+    workers = _process_workers or os.cpu_count() or 1
+    futures = [pool.submit(_noop) for _ in range(workers)]
+    for future in futures:
+        future.result()
+
+
+def shutdown_pools():
+    """关闭所有执行池"""
+    global _thread_pool, _process_pool
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
+
+
+class FunctionExecutor:
+    """
+    单个注册函数的执行器
+
+    Args:
+        func: 要执行的函数（进程池模式下必须可被pickle，即模块级函数）
+        mode: 执行方式 inline / thread / process
+        max_concurrency: 该函数的最大并发执行数，None表示不限制
+        queue_timeout: 等待执行槽位的最长秒数，None表示一直等待
+    """
+
+    def __init__(self, func: Callable, mode: str = EXECUTOR_THREAD,
+                 max_concurrency: Optional[int] = None, queue_timeout: Optional[float] = None):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unsupported executor mode: {mode}, expected one of {EXECUTOR_MODES}")
+
+        self.func = func
+        self.mode = mode
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        # 统计信息
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def _acquire(self):
+        """获取执行槽位，超时则抛出ExecutorBusyError"""
+        if self._semaphore is None:
+            return
+        self.waiting += 1
+        try:
+            if self.queue_timeout is None:
+                await self._semaphore.acquire()
+                return
+            # Python 3.12 之前 wait_for 可能在 acquire() 已经拿到槽位后仍抛出超时或取消，
+            # 所以在独立的任务中获取，超时或调用方被取消时若槽位已经拿到就归还
+            acquire = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                await asyncio.wait_for(asyncio.shield(acquire), self.queue_timeout)
+            except BaseException as e:
+                if not acquire.cancel() and not acquire.cancelled() and acquire.exception() is None:
+                    self._semaphore.release()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.rejected += 1
+                    raise ExecutorBusyError(
+                        f"Timed out after {self.queue_timeout}s waiting for a free execution slot"
+                    ) from None
+                raise
+        finally:
+            self.waiting -= 1
+
+    def _release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    async def run(self, **kwargs):
+        """按配置的方式执行函数并返回结果"""
+        return await self.execute(kwargs)
+
+    async def execute(self, kwargs: Dict, timer: Optional[PhaseTimer] = None):
+        """
+        按配置的方式执行函数并返回结果
+
+        Args:
+            kwargs: 函数参数
+            timer: 请求的计时器，分别记录等待执行槽位（queue）和函数执行（function）的耗时
+        """
+        timer = timer or PhaseTimer()
+        with timer.span("queue"):
+            await self._acquire()
+        self.active += 1
+        try:
+            with timer.span("function"):
+                # 协程函数本身不阻塞事件循环，直接await
+                if asyncio.iscoroutinefunction(self.func):
+                    return await self.func(**kwargs)
+
+                if self.mode == EXECUTOR_INLINE:
+                    return self.func(**kwargs)
+
+                pool = get_process_pool() if self.mode == EXECUTOR_PROCESS else get_thread_pool()
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, functools.partial(self.func, **kwargs))
+        finally:
+            self.active -= 1
+            self._release()
+
+    def get_stats(self) -> Dict:
+        """获取执行器统计信息"""
+        return {
+            'mode': self.mode,
+            'max_concurrency': self.max_concurrency,
+            'queue_timeout': self.queue_timeout,
+            'active': self.active,
+            'waiting': self.waiting,
+            'rejected': self.rejected
+        }
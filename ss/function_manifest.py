@@ -0,0 +1,312 @@
+"""
+函数清单模块
+从轻量的JSON清单注册函数：路由和参数签名在启动时从清单（或签名缓存）读取，
+实现函数的模块在第一次调用时才导入，启动和 --reload 时不再加载 pandas / numpy 等重量级依赖
+"""
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import re
+import tempfile
+import threading
+import typing
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from progress import PROGRESS_PARAM
+from scratch import WORKDIR_PARAM
+
+
+# 由框架注入的参数（进度回调、临时工作目录），清单中在 "inject" 而不是 "params" 中声明
+INJECTED_PARAMS = (PROGRESS_PARAM, WORKDIR_PARAM)
+
+# 清单中可以使用的类型名称（如 "int"、"List[str]"、"Optional[float]"）
+_TYPE_NAMESPACE = {
+    "str": str, "int": int, "float": float, "bool": bool,
+    "list": list, "dict": dict, "bytes": bytes,
+    **{name: getattr(typing, name) for name in ("Any", "Callable", "Dict", "List", "Optional", "Tuple", "Union")}
+}
+
+
+# 类型名称的词法单元：名称、省略号、方括号和逗号
+_TYPE_TOKEN = re.compile(r"\s*([A-Za-z_][A-Za-z0-9_]*|\.\.\.|[\[\],]|\S)")
+
+# 类型参数中可以使用的常量（format_type 把 Optional 中的 None 写成 NoneType）
+_TYPE_CONSTANTS = {"None": None, "NoneType": type(None), "...": Ellipsis}
+
+
+def parse_type(name: str) -> Any:
+    """
+    将清单中的类型名称解析为类型注解
+
+    按方括号和逗号拆分，每个名称只在 _TYPE_NAMESPACE 中查找；清单是配置而不是代码，不执行 eval。
+    """
+    tokens = _TYPE_TOKEN.findall(name)
+    pos = 0
+
+    def error():
+        return ValueError(f"Unsupported parameter type in manifest: {name}")
+
+    def next_token() -> Optional[str]:
+        nonlocal pos
+        token = tokens[pos] if pos < len(tokens) else None
+        pos += 1
+        return token
+
+    def parse_args() -> List[Any]:
+        # 已读取 "["，解析到对应的 "]" 为止
+        args = []
+        while True:
+            if pos < len(tokens) and tokens[pos] == "[":
+                # Callable 的参数列表，如 Callable[[int, str], bool]
+                next_token()
+                args.append(parse_args())
+            else:
+                args.append(parse_expr())
+            token = next_token()
+            if token == "]":
+                return args
+            if token != ",":
+                raise error()
+
+    def parse_expr() -> Any:
+        token = next_token()
+        if token in _TYPE_CONSTANTS:
+            annotation = _TYPE_CONSTANTS[token]
+        elif token in _TYPE_NAMESPACE:
+            annotation = _TYPE_NAMESPACE[token]
+        else:
+            raise error()
+        if pos < len(tokens) and tokens[pos] == "[":
+            next_token()
+            args = parse_args()
+            try:
+                annotation = annotation[tuple(args) if len(args) > 1 else args[0]]
+            except TypeError:
+                raise error()
+        return annotation
+
+    annotation = parse_expr()
+    if pos != len(tokens) or annotation is Ellipsis:
+        raise error()
+    return annotation
+
+
+def format_type(annotation: Any) -> str:
+    """将类型注解转换为清单中的类型名称（parse_type 的逆操作）"""
+    if annotation is inspect.Parameter.empty:
+        return "str"
+    if isinstance(annotation, type):
+        return annotation.__name__
+    return repr(annotation).replace("typing.", "")
+
+
+def parse_params(params: Dict[str, Any]) -> inspect.Signature:
+    """
+    根据清单中的参数定义生成函数签名
+
+    Args:
+        params: 参数名 -> 类型名称，或 {"type": 类型名称, "default": 默认值}
+    """
+    parameters = []
+    for name, spec in params.items():
+        if isinstance(spec, str):
+            spec = {"type": spec}
+        parameters.append(inspect.Parameter(
+            name,
+            inspect.Parameter.KEYWORD_ONLY,
+            annotation=parse_type(spec.get("type", "str")),
+            default=spec["default"] if "default" in spec else inspect.Parameter.empty
+        ))
+    return inspect.Signature(parameters)
+
+
+def add_injected_params(sig: inspect.Signature, names: Iterable[str]) -> inspect.Signature:
+    """
+    在签名末尾加上框架注入的参数（只用于判断函数是否接受注入，不出现在请求模型中）
+
+    Args:
+        sig: 清单 params 生成的签名
+        names: 注入的参数名，只能是 INJECTED_PARAMS 中的名称；签名中已有的参数跳过
+    """
+    parameters = list(sig.parameters.values())
+    for name in names:
+        if name not in INJECTED_PARAMS:
+            raise ValueError(f"Unknown injected parameter: {name}, expected one of {INJECTED_PARAMS}")
+        if name not in sig.parameters:
+            parameters.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=Any, default=None))
+    return sig.replace(parameters=parameters)
+
+
+def signature_to_params(sig: inspect.Signature) -> Dict[str, Any]:
+    """将函数签名转换为清单格式的参数定义（用于签名缓存）"""
+    params = {}
+    for name, param in sig.parameters.items():
+        spec = {"type": format_type(param.annotation)}
+        if param.default is not inspect.Parameter.empty:
+            spec["default"] = param.default
+        params[name] = spec
+    return params
+
+
+class LazyFunction:
+    """
+    延迟导入的函数
+
+    对外暴露清单中记录的签名和文档（inspect.signature 可直接读取，用于生成请求模型和OpenAPI文档），
+    第一次调用时才导入实现模块。只按目标字符串pickle，进程池的工作进程中同样按需导入。
+
+    Args:
+        target: "模块:函数名"，如 "sample_functions:function_1"
+        signature: 函数签名
+        doc: 函数说明
+    """
+
+    def __init__(self, target: str, signature: inspect.Signature, doc: Optional[str] = None):
+        module_name, _, attr = target.partition(":")
+        if not module_name or not attr:
+            raise ValueError(f"Invalid function target: {target}, expected 'module:function'")
+
+        self.target = target
+        self.__signature__ = signature
+        self.__doc__ = doc
+        self.__name__ = attr
+        self._func = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """实现模块是否已导入"""
+        return self._func is not None
+
+    def load(self):
+        """导入并返回实际的函数"""
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    module_name, _, attr = self.target.partition(":")
+                    self._func = getattr(importlib.import_module(module_name), attr)
+        return self._func
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __reduce__(self):
+        return (LazyFunction, (self.target, self.__signature__, self.__doc__))
+
+    def __repr__(self) -> str:
+        return f"<LazyFunction {self.target}{' (loaded)' if self.loaded else ''}>"
+
+
+class SignatureCache:
+    """
+    签名缓存
+
+    清单中没有写 params 的函数，第一次启动时导入模块读取签名并写入缓存文件；
+    之后只要模块文件的修改时间不变，就直接使用缓存，不再导入。
+
+    Args:
+        path: 缓存文件路径，None表示不缓存（每次启动都导入）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def _module_mtime(module_name: str) -> Optional[float]:
+        """查找模块文件的修改时间（只定位文件，不执行模块）"""
+        spec = importlib.util.find_spec(module_name)
+        if spec is None or not spec.origin or not os.path.exists(spec.origin):
+            return None
+        return os.path.getmtime(spec.origin)
+
+    def resolve(self, target: str) -> Tuple[inspect.Signature, Optional[str]]:
+        """返回目标函数的 (签名, 文档)"""
+        module_name = target.partition(":")[0]
+        mtime = self._module_mtime(module_name)
+        entry = self._entries.get(target)
+        if entry is not None and mtime is not None and entry.get("mtime") == mtime:
+            return parse_params(entry["params"]), entry.get("doc")
+
+        func = LazyFunction(target, inspect.Signature()).load()
+        sig = inspect.signature(func)
+        doc = func.__doc__
+        if mtime is not None:
+            self._entries[target] = {"mtime": mtime, "params": signature_to_params(sig), "doc": doc}
+            self._dirty = True
+        return sig, doc
+
+    def save(self):
+        """写回缓存文件（先写临时文件再原子替换）"""
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(temp_fd, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._dirty = False
+
+
+def load_manifest(path: str, signature_cache: Optional[SignatureCache] = None) -> List[Dict]:
+    """
+    读取函数清单
+
+    清单格式（JSON）:
+        {
+          "functions": [
+            {
+              "route": "/api/function1",
+              "name": "function_1",
+              "target": "sample_functions:function_1",
+              "doc": "函数说明（可选）",
+              "params": {"param1": "str", "param3": {"type": "int", "default": 5}},
+              "inject": ["workdir", "progress"],
+              "options": {"cache_ttl": 600, "executor": "process"}
+            }
+          ]
+        }
+
+    params 只写请求参数，可以省略，此时签名从签名缓存读取（缓存失效时导入模块获取）。
+    inject 列出函数接受的框架注入参数（见 INJECTED_PARAMS）。
+
+    Returns:
+        [{"route", "name", "function": LazyFunction, "options"}]
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    signature_cache = signature_cache or SignatureCache()
+    entries = []
+    for item in manifest.get("functions", []):
+        target = item["target"]
+        if "params" in item:
+            sig, doc = parse_params(item["params"]), item.get("doc")
+        else:
+            sig, doc = signature_cache.resolve(target)
+            doc = item.get("doc") or doc
+        sig = add_injected_params(sig, item.get("inject", ()))
+
+        entries.append({
+            "route": item["route"],
+            "name": item["name"],
+            "function": LazyFunction(target, sig, doc),
+            "options": item.get("options", {})
+        })
+    signature_cache.save()
+    return entries
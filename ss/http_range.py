@@ -0,0 +1,209 @@
+"""
+HTTP范围请求模块
+为磁盘上的文件提供 Range / If-Range / If-None-Match 支持，用于断点续传和分段并行下载。
+
+文件按块从磁盘读取（os.pread，不改变文件偏移，在线程池中执行），不会把整个文件读入内存。
+"""
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+
+# 每次从磁盘读取的块大小
+CHUNK_SIZE = 256 * 1024
+
+# 单个请求最多接受的范围数，超过时忽略Range返回完整内容（防止大量小范围拖慢服务）
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    """请求的范围都不在文件内"""
+
+
+def make_etag(digest: str) -> str:
+    """由内容摘要生成强ETag"""
+    return f'"{digest}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match 比较（弱比较：忽略 W/ 前缀）
+
+    Args:
+        header: If-None-Match 请求头
+        etag: 当前资源的ETag
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def if_range_matches(header: Optional[str], etag: str) -> bool:
+    """
+    If-Range 比较（强比较，且只接受ETag；日期或弱ETag视为不匹配，返回完整内容）
+    """
+    if header is None:
+        return True
+    return header.strip() == etag
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    解析 Range 请求头
+
+    Args:
+        header: Range 请求头，如 "bytes=0-1023"、"bytes=1024-"、"bytes=-500"
+        size: 文件大小
+
+    Returns:
+        [(起始, 结束)] 闭区间列表；没有Range、格式无法识别或范围过多时返回None（应返回完整内容）
+
+    Raises:
+        RangeNotSatisfiable: 所有范围都超出文件
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    items = spec.split(",")
+    if len(items) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for item in items:
+        first, sep, last = item.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                # 开放范围（"bytes=N-"）到文件末尾；起始位置超出文件时不可满足，而不是格式错误
+                end = int(last) if last else max(start, size - 1)
+                if start > end:
+                    return None
+            else:
+                # 后缀范围：最后N个字节
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable(header)
+    return merge_ranges(ranges)
+
+
+def merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合并重叠或相邻的范围"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def iter_file_range(path: str, start: int, end: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """按块读取文件的 [start, end] 闭区间"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset <= end:
+            chunk = os.pread(fd, min(chunk_size, end - offset + 1), offset)
+            if not chunk:
+                break
+            yield chunk
+            offset += len(chunk)
+    finally:
+        os.close(fd)
+
+
+def _iter_byteranges(path: str, ranges: List[Tuple[int, int]], boundary: str,
+                     media_type: str, size: int) -> Iterator[bytes]:
+    for start, end in ranges:
+        yield _part_header(boundary, media_type, start, end, size)
+        yield from iter_file_range(path, start, end)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def _part_header(boundary: str, media_type: str, start: int, end: int, size: int) -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        f"Content-Type: {media_type}\r\n"
+        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+    ).encode("ascii")
+
+
+def ranged_file_response(request_headers, path: str, etag: str,
+                         media_type: str = "application/octet-stream",
+                         headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    按请求头返回文件的完整内容、部分内容或304
+
+    - If-None-Match 命中时返回304
+    - Range 有效且 If-Range（如果有）与ETag相同时返回206；多个范围使用 multipart/byteranges
+    - 范围都超出文件时返回416
+    - 其余情况返回完整内容（200）
+
+    Args:
+        request_headers: 请求头
+        path: 文件路径
+        etag: 文件内容的强ETag
+        media_type: 文件的媒体类型
+        headers: 额外的响应头（如 Content-Disposition、Cache-Control）
+    """
+    headers = {**(headers or {}), "ETag": etag, "Accept-Ranges": "bytes"}
+
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    ranges = None
+    if if_range_matches(request_headers.get("if-range"), etag):
+        try:
+            ranges = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if ranges is None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return StreamingResponse(
+            iter_file_range(path, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers={
+                **headers,
+                "Content-Range": f"bytes {start}-{end}/{size}",
+                "Content-Length": str(end - start + 1)
+            }
+        )
+
+    boundary = f"range-{uuid.uuid4().hex}"
+    length = sum(
+        len(_part_header(boundary, media_type, start, end, size)) + (end - start + 1) + 2
+        for start, end in ranges
+    ) + len(boundary) + 6
+    return StreamingResponse(
+        _iter_byteranges(path, ranges, boundary, media_type, size),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers={**headers, "Content-Length": str(length)}
+    )
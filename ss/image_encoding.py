@@ -0,0 +1,150 @@
+"""
+图片编码模块
+在线程池中并行地把PIL图片编码一次，编码结果同时供JSON响应、压缩包和会话存储使用。
+Pillow在压缩编码时会释放GIL，多张大图可以真正并行编码。
+"""
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from PIL import Image, features
+
+
+# 支持的编码格式 -> (文件扩展名, MIME类型, 默认保存参数)
+IMAGE_FORMATS = {
+    "PNG": (".png", "image/png", {"compress_level": 6}),
+    "WEBP": (".webp", "image/webp", {"quality": 80, "method": 4}),
+    "JPEG": (".jpg", "image/jpeg", {"quality": 85, "optimize": False}),
+}
+
+
+@dataclass
+class ImageEncoding:
+    """
+    图片编码配置（可在 registry.register 中按函数指定）
+
+    Args:
+        format: 编码格式 PNG / WEBP / JPEG
+        options: 传给 PIL.Image.save 的参数，如 {"compress_level": 1}、{"quality": 90}
+    """
+    format: str = "PNG"
+    options: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.format = self.format.upper()
+        if self.format == "JPG":
+            self.format = "JPEG"
+        if self.format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {self.format}, expected one of {list(IMAGE_FORMATS)}")
+
+    @property
+    def extension(self) -> str:
+        return IMAGE_FORMATS[self.format][0]
+
+    @property
+    def content_type(self) -> str:
+        return IMAGE_FORMATS[self.format][1]
+
+    @property
+    def save_options(self) -> Dict:
+        return {**IMAGE_FORMATS[self.format][2], **self.options}
+
+
+@dataclass
+class EncodedImage:
+    """编码后的图片"""
+    data: bytes
+    format: str
+    width: int
+    height: int
+
+
+_encode_pool: Optional[ThreadPoolExecutor] = None
+_encode_workers: Optional[int] = None
+
+
+def configure_encode_pool(workers: Optional[int] = None):
+    """设置编码线程池大小（需在第一次编码前设置）"""
+    global _encode_workers
+    _encode_workers = workers
+
+
+def get_encode_pool() -> ThreadPoolExecutor:
+    """获取图片编码线程池"""
+    global _encode_pool
+    if _encode_pool is None:
+        _encode_pool = ThreadPoolExecutor(
+            max_workers=_encode_workers or os.cpu_count() or 1,
+            thread_name_prefix="image-encode"
+        )
+    return _encode_pool
+
+
+def shutdown_encode_pool():
+    """关闭图片编码线程池"""
+    global _encode_pool
+    if _encode_pool is not None:
+        _encode_pool.shutdown(wait=False)
+        _encode_pool = None
+
+
+def encode_image(image: Image.Image, encoding: ImageEncoding) -> EncodedImage:
+    """按配置将单张图片编码为字节"""
+    # JPEG不支持透明通道和调色板模式
+    if encoding.format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=encoding.format, **encoding.save_options)
+    return EncodedImage(
+        data=buffer.getvalue(),
+        format=encoding.format,
+        width=image.width,
+        height=image.height
+    )
+
+
+def encode_images(images: List[Image.Image], encoding: ImageEncoding) -> List[EncodedImage]:
+    """
+    并行编码多张图片，返回顺序与输入一致
+
+    只有一张图片时直接在当前线程编码，省去线程切换开销。
+    """
+    if len(images) <= 1:
+        return [encode_image(img, encoding) for img in images]
+    pool = get_encode_pool()
+    return list(pool.map(lambda img: encode_image(img, encoding), images))
+
+
+# ==================== 缩略图 ====================
+
+# 允许的缩略图边长（请求的尺寸会对齐到最接近的一档，避免缓存被任意尺寸撑爆）
+THUMBNAIL_SIZES = (160, 320, 640)
+
+# 缩略图编码：优先WebP（体积小），Pillow未编译WebP支持时退回快速PNG
+THUMBNAIL_ENCODING = (
+    ImageEncoding("WEBP", {"quality": 75})
+    if features.check("webp")
+    else ImageEncoding("PNG", {"compress_level": 1})
+)
+
+
+def snap_thumbnail_size(size: int) -> int:
+    """将请求的尺寸对齐到允许的缩略图边长"""
+    return min(THUMBNAIL_SIZES, key=lambda s: abs(s - size))
+
+
+def make_thumbnail(path: str, size: int) -> EncodedImage:
+    """
+    从磁盘上的图片生成缩略图
+
+    Raises:
+        OSError: 文件不是可识别的图片
+    """
+    with Image.open(path) as img:
+        # JPEG等格式可以在解码阶段直接缩小，减少解码开销
+        img.draft("RGB", (size, size))
+        img.thumbnail((size, size))
+        return encode_image(img, THUMBNAIL_ENCODING)
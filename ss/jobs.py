@@ -0,0 +1,175 @@
+"""
+异步任务模块
+以 ?mode=async 调用的函数立即返回任务ID，函数在有界的工作池中后台执行，
+状态和结果通过 /jobs/{job_id} 查询
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from session_store import SessionStore
+
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """排队和执行中的任务数已达上限"""
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    同时执行的任务数由 workers 限制，其余任务排队；排队加执行中的任务总数
+    超过 max_pending 时拒绝新任务。任务记录在每次状态变化（排队、执行中、结束）时写入
+    有界的 SessionStore，按TTL过期、按LRU淘汰；sqlite后端时其他服务进程也能查询到
+    尚未结束的任务。存储的读写（sqlite后端会阻塞）在线程中执行，不占用事件循环。
+
+    Args:
+        workers: 同时执行的最大任务数
+        max_pending: 排队和执行中的最大任务总数
+        result_store: 保存任务记录的存储（SessionStore 或 SqliteSessionStore）
+        on_finish: 任务结束（结果已保存）后以任务ID调用的回调
+    """
+
+    def __init__(self, workers: int, max_pending: int, result_store: SessionStore,
+                 on_finish: Optional[Callable[[str], None]] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._results = result_store
+        self._on_finish = on_finish
+        self._semaphore = asyncio.Semaphore(workers)
+        self._active: Dict[str, Dict] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 统计信息
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    async def submit(self, function_name: str,
+               fn: Callable[[str], Awaitable[Tuple[int, Dict[str, Any]]]],
+               info: Optional[Dict[str, Any]] = None) -> Dict:
+        """
+        提交任务
+
+        Args:
+            function_name: 函数名称
+            fn: 实际执行的协程函数，以任务ID调用，返回 (HTTP状态码, APIResponse字典)
+            info: 附加到任务记录中的信息（如交付模式）
+
+        Returns:
+            任务记录
+
+        Raises:
+            JobQueueFullError: 任务数已达上限
+        """
+        if len(self._active) >= self.max_pending:
+            self.rejected += 1
+            raise JobQueueFullError(
+                f"Too many pending jobs ({self.max_pending}), please retry later"
+            )
+
+        job = {
+            'job_id': str(uuid.uuid4()),
+            'function_name': function_name,
+            'status': JOB_QUEUED,
+            'created_at': _now(),
+            'started_at': None,
+            'finished_at': None,
+            'status_code': None,
+            'response': None,
+            **(info or {})
+        }
+        await self._save(job)
+        self._active[job['job_id']] = job
+        self.submitted += 1
+
+        task = asyncio.create_task(self._run(job, fn))
+        # 保留任务引用，避免被垃圾回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return dict(job)
+
+    async def _run(self, job: Dict, fn: Callable[[str], Awaitable[Tuple[int, Dict[str, Any]]]]):
+        try:
+            async with self._semaphore:
+                job['status'] = JOB_RUNNING
+                job['started_at'] = _now()
+                await self._save(job)
+                started = time.monotonic()
+                try:
+                    status_code, response = await fn(job['job_id'])
+                except Exception as e:
+                    status_code, response = 500, {
+                        'success': False,
+                        'message': f"Error in {job['function_name']}",
+                        'error': str(e)
+                    }
+                job['duration'] = time.monotonic() - started
+                job['status_code'] = status_code
+                job['response'] = response
+                job['status'] = JOB_SUCCEEDED if response.get('success') else JOB_FAILED
+        finally:
+            job['finished_at'] = _now()
+            if job['status'] == JOB_SUCCEEDED:
+                self.succeeded += 1
+            else:
+                # 被取消（服务关闭）的任务也记为失败
+                job['status'] = JOB_FAILED
+                self.failed += 1
+            # 先写入存储再移出执行中列表，期间查询仍能从 _active 读到任务
+            await self._save(job)
+            self._active.pop(job['job_id'], None)
+            if self._on_finish is not None:
+                self._on_finish(job['job_id'])
+
+    async def _save(self, job: Dict):
+        """把任务记录的当前状态写入存储"""
+        await asyncio.to_thread(self._results.__setitem__, job['job_id'], dict(job))
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """
+        查询任务记录，不存在或已过期返回None
+
+        本进程提交的任务直接读取内存中的记录，其他进程提交的任务从存储读取。
+        """
+        job = self._active.get(job_id)
+        if job is not None:
+            return dict(job)
+        return await asyncio.to_thread(self._results.get, job_id)
+
+    async def shutdown(self):
+        """取消所有未结束的任务"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def get_stats(self) -> Dict:
+        """获取任务统计信息"""
+        running = sum(1 for job in self._active.values() if job['status'] == JOB_RUNNING)
+        results = await asyncio.to_thread(len, self._results)
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'queued': len(self._active) - running,
+            'running': running,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'results': results
+        }
@@ -0,0 +1,155 @@
+"""
+指标模块
+记录注册函数每个请求各阶段（排队、函数执行、图片编码、base64、压缩、序列化等）的耗时，
+按路由汇总为直方图，以Prometheus文本格式从 /metrics 导出，
+同时为每个响应生成 Server-Timing 响应头
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+
+# 直方图默认分桶上界（秒）
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+class PhaseTimer:
+    """
+    单个请求的分阶段计时器
+
+    同名阶段的耗时累加（如批量编码时多次进入 encode），阶段按首次出现的顺序输出。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def add(self, phase: str, seconds: float):
+        """累加一个阶段的耗时"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def span(self, phase: str) -> Iterator[None]:
+        """计时代码块"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    @property
+    def total(self) -> float:
+        """从创建到现在的总耗时（秒）"""
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """生成 Server-Timing 响应头（毫秒）"""
+        entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """
+    带标签的累积直方图（Prometheus histogram 语义）
+
+    Args:
+        name: 指标名称
+        documentation: 指标说明（# HELP）
+        label_names: 标签名称
+        buckets: 分桶上界（秒），自动追加 +Inf
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各分桶计数（非累积）..., +Inf计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        """记录一次观测值"""
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        """生成Prometheus文本格式的行"""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram"
+        ]
+        with self._lock:
+            snapshot = sorted((labels, list(series)) for labels, series in self._series.items())
+
+        for label_values, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class APIMetrics:
+    """注册函数的请求和阶段耗时指标"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "api_request_duration_seconds",
+            "Total handling time of registered function endpoints",
+            ("route", "status")
+        )
+        self.phase_duration = Histogram(
+            "api_phase_duration_seconds",
+            "Time spent in each phase of registered function endpoints",
+            ("route", "phase")
+        )
+
+    def observe_phases(self, route: str, timer: PhaseTimer):
+        """记录一个请求各阶段的耗时"""
+        for phase, seconds in timer.phases.items():
+            self.phase_duration.observe(seconds, route, phase)
+
+    def observe_request(self, route: str, status_code: int, timer: PhaseTimer):
+        """记录一个请求的各阶段耗时和总耗时"""
+        self.observe_phases(route, timer)
+        self.request_duration.observe(timer.total, route, str(status_code))
+
+    def render(self) -> str:
+        """生成 /metrics 的Prometheus文本"""
+        lines = self.request_duration.render() + self.phase_duration.render()
+        return "\n".join(lines) + "\n"
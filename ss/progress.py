@@ -0,0 +1,172 @@
+"""
+进度上报模块
+注册函数声明 progress 参数时，框架注入 ProgressCallback，函数调用 progress(当前, 总数, 说明)
+上报进度；进度通过 /progress/{job_id} 以Server-Sent Events推送给调用方。
+
+进程池中执行的函数通过 multiprocessing 队列把进度送回主进程，由后台线程转发。
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+
+# 注册函数中用于接收进度回调的参数名（不会出现在请求模型中）
+PROGRESS_PARAM = "progress"
+
+# 每个订阅者最多缓存的未发送事件数（超出时丢弃，订阅者仍会收到之后的事件）
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# 任务结束的通知（只在进程内传递，不会发送给客户端）
+FINISHED = object()
+
+
+def make_event(current: float, total: Optional[float] = None, message: Optional[str] = None,
+               **extra: Any) -> Dict:
+    """构造进度事件"""
+    event = {
+        "current": current,
+        "total": total,
+        "percent": round(current / total * 100, 1) if total else None,
+        "message": message,
+        "timestamp": time.time()
+    }
+    event.update(extra)
+    return event
+
+
+class ProgressHub:
+    """
+    进度事件分发器（运行在主进程的事件循环中）
+
+    publish 可以从任意线程调用；每个任务只保留最新一条进度，
+    迟到的订阅者先收到最新进度，再收到之后的事件。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest: Dict[str, Dict] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """绑定服务所在的事件循环"""
+        self._loop = loop
+
+    def publish(self, progress_id: str, event: Any):
+        """发布事件（线程安全）"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(progress_id, event)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, progress_id, event)
+
+    def finish(self, progress_id: str):
+        """任务结束，通知订阅者并清除最新进度"""
+        self.publish(progress_id, FINISHED)
+
+    def _dispatch(self, progress_id: str, event: Any):
+        if event is FINISHED:
+            self._latest.pop(progress_id, None)
+        else:
+            self._latest[progress_id] = event
+        for queue in self._subscribers.get(progress_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    def subscribe(self, progress_id: str) -> asyncio.Queue:
+        """订阅任务的进度事件"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(progress_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, progress_id: str, queue: asyncio.Queue):
+        """取消订阅"""
+        subscribers = self._subscribers.get(progress_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[progress_id]
+
+    def latest(self, progress_id: str) -> Optional[Dict]:
+        """任务的最新进度"""
+        return self._latest.get(progress_id)
+
+
+# 主进程中的全局分发器
+progress_hub = ProgressHub()
+
+# 进程池工作进程中由 init_worker 设置的进度队列
+_worker_queue = None
+
+# 主进程中的进度队列及其转发线程
+_process_queue = None
+_process_queue_lock = threading.Lock()
+
+
+def init_worker(queue):
+    """进程池工作进程的初始化函数"""
+    global _worker_queue
+    _worker_queue = queue
+
+
+def _forward_process_events(queue):
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        progress_hub.publish(*item)
+
+
+def get_process_queue():
+    """获取工作进程使用的进度队列（第一次调用时启动转发线程）"""
+    global _process_queue
+    with _process_queue_lock:
+        if _process_queue is None:
+            _process_queue = multiprocessing.Queue()
+            threading.Thread(
+                target=_forward_process_events, args=(_process_queue,),
+                name="progress-forwarder", daemon=True
+            ).start()
+    return _process_queue
+
+
+class ProgressCallback:
+    """
+    注入给注册函数的进度回调
+
+    用法（在注册函数中）:
+        def train(epochs: int, progress=None):
+            for epoch in range(epochs):
+                ...
+                if progress:
+                    progress(epoch + 1, epochs, f"epoch {epoch + 1}/{epochs}")
+
+    只按任务ID pickle，可以传给进程池中的函数。progress_id 为None（同步调用）时不做任何事。
+    """
+
+    def __init__(self, progress_id: Optional[str] = None):
+        self.progress_id = progress_id
+
+    def __call__(self, current: float, total: Optional[float] = None, message: Optional[str] = None,
+                 **extra: Any):
+        if not self.progress_id:
+            return
+        event = make_event(current, total, message, **extra)
+        if _worker_queue is not None:
+            _worker_queue.put((self.progress_id, event))
+        else:
+            progress_hub.publish(self.progress_id, event)
+
+    def __reduce__(self):
+        return (ProgressCallback, (self.progress_id,))
@@ -0,0 +1,119 @@
+"""
+结果缓存模块
+按请求参数的稳定哈希缓存注册函数的处理结果（产物以摘要引用，不重复保存内容），
+支持TTL过期、按条目数和字节数的LRU淘汰和命中统计
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from session_store import estimate_size
+
+
+def make_cache_key(func_name: str, request_json: str) -> str:
+    """
+    生成缓存键
+
+    Args:
+        func_name: 函数名称
+        request_json: 校验后的请求模型序列化结果（字段顺序由模型定义决定，是稳定的）
+    """
+    return hashlib.sha256(f"{func_name}\0{request_json}".encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    单个函数的结果缓存
+
+    条目本身只含元数据和产物摘要，但函数返回的原始数据（raw_data）可能很大，
+    所以除条目数外还按估算的字节数限制；单个条目超过 max_bytes 时不缓存。
+
+    Args:
+        ttl: 缓存有效期（秒）
+        max_entries: 最大缓存条目数，超出按LRU淘汰
+        max_bytes: 缓存条目的最大总字节数（估算值），超出按LRU淘汰
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # 键 -> (过期时间, 条目, 字节数)
+        self._entries: "OrderedDict[str, Tuple[float, Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evicted = 0
+        self.oversized = 0
+
+    def _pop(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] <= time.time():
+                if item is not None:
+                    self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: str, value: Any):
+        """写入缓存（超过 max_bytes 的条目不缓存）"""
+        size = estimate_size(value)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                self.oversized += 1
+                return
+            self._entries[key] = (time.time() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evicted += 1
+
+    def invalidate(self, key: str):
+        """删除缓存条目（如引用的产物已丢失）"""
+        with self._lock:
+            self._pop(key)
+
+    def values(self) -> List[Any]:
+        """所有未过期的缓存条目（不更新LRU顺序，用于产物清理时收集仍被引用的摘要）"""
+        now = time.time()
+        with self._lock:
+            return [item[1] for item in self._entries.values() if item[0] > now]
+
+    def record_bypass(self):
+        """记录一次绕过缓存的请求"""
+        with self._lock:
+            self.bypassed += 1
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'evicted': self.evicted,
+                'oversized': self.oversized,
+                'hit_rate': self.hits / lookups * 100 if lookups else 0
+            }
@@ -30,16 +30,16 @@ def create_sample_image(text: str, width: int = 800, height: int = 600) -> Image
     return img
 
 
-def create_sample_csv(data: dict, filename: str) -> str:
+def create_sample_csv(data: dict, filename: str, output_dir: str = "outputs") -> str:
     """创建样例CSV文件"""
     df = pd.DataFrame(data)
-    os.makedirs("outputs", exist_ok=True)
-    filepath = os.path.join("outputs", filename)
+    os.makedirs(output_dir, exist_ok=True)
+    filepath = os.path.join(output_dir, filename)
     df.to_csv(filepath, index=False)
     return filepath
 
 
-def function_1(param1: str, param2: str, param3: int, param4: str, param5: int) -> Dict:
+def function_1(param1: str, param2: str, param3: int, param4: str, param5: int, workdir: str = "outputs") -> Dict:
     """
     样例函数1 - 5个参数
     实际使用时替换为你的真实函数
@@ -55,7 +55,7 @@ def function_1(param1: str, param2: str, param3: int, param4: str, param5: int)
         'value': np.random.randn(10).tolist()
     }
 
-    csv_file = create_sample_csv(data, f"function1_{param1}.csv")
+    csv_file = create_sample_csv(data, f"function1_{param1}.csv", workdir)
 
     # 创建多个图片
     images = [
@@ -73,7 +73,7 @@ def function_1(param1: str, param2: str, param3: int, param4: str, param5: int)
     }
 
 
-def function_2(param1: str, param2: int, param3: str, param4: int, param5: str, param6: int) -> Dict:
+def function_2(param1: str, param2: int, param3: str, param4: int, param5: str, param6: int, workdir: str = "outputs") -> Dict:
     """
     样例函数2 - 6个参数
     """
@@ -86,7 +86,7 @@ def function_2(param1: str, param2: int, param3: str, param4: int, param5: str,
         'value2': np.random.randn(15).tolist()
     }
 
-    csv_file = create_sample_csv(data, f"function2_{param1}.csv")
+    csv_file = create_sample_csv(data, f"function2_{param1}.csv", workdir)
 
     images = [
         create_sample_image(f"Func2 Analysis", 1200, 800),
@@ -102,7 +102,7 @@ def function_2(param1: str, param2: int, param3: str, param4: int, param5: str,
     }
 
 
-def function_3(name: str, category: str, count: int, threshold: int, output: str) -> Dict:
+def function_3(name: str, category: str, count: int, threshold: int, output: str, workdir: str = "outputs") -> Dict:
     """
     样例函数3 - 5个参数（不同命名）
     """
@@ -115,7 +115,7 @@ def function_3(name: str, category: str, count: int, threshold: int, output: str
         'metric': np.random.random(20).tolist()
     }
 
-    csv_file = create_sample_csv(data, f"function3_{name}.csv")
+    csv_file = create_sample_csv(data, f"function3_{name}.csv", workdir)
 
     images = [
         create_sample_image(f"Report: {name}", 1000, 700),
@@ -132,7 +132,7 @@ def function_3(name: str, category: str, count: int, threshold: int, output: str
     }
 
 
-def function_4(input_file: str, max_records: int, filter_col: str, min_val: int, batch_size: int, offset: int) -> Dict:
+def function_4(input_file: str, max_records: int, filter_col: str, min_val: int, batch_size: int, offset: int, workdir: str = "outputs") -> Dict:
     """
     样例函数4 - 6个参数
     """
@@ -146,7 +146,7 @@ def function_4(input_file: str, max_records: int, filter_col: str, min_val: int,
         'score': np.random.uniform(0, 100, 25).tolist()
     }
 
-    csv_file = create_sample_csv(data, f"function4_{input_file}.csv")
+    csv_file = create_sample_csv(data, f"function4_{input_file}.csv", workdir)
 
     images = [
         create_sample_image(f"File: {input_file}", 1100, 750),
@@ -162,7 +162,7 @@ def function_4(input_file: str, max_records: int, filter_col: str, min_val: int,
     }
 
 
-def function_5(title: str, x_label: str, y_label: str, data_points: int, color: str) -> Dict:
+def function_5(title: str, x_label: str, y_label: str, data_points: int, color: str, workdir: str = "outputs") -> Dict:
     """
     样例函数5 - 5个参数
     """
@@ -176,7 +176,7 @@ def function_5(title: str, x_label: str, y_label: str, data_points: int, color:
         'y_value': np.random.randn(data_points).tolist()
     }
 
-    csv_file = create_sample_csv(data, f"function5_{title}.csv")
+    csv_file = create_sample_csv(data, f"function5_{title}.csv", workdir)
 
     images = [
         create_sample_image(f"Chart: {title}", 1000, 600),
@@ -194,10 +194,28 @@ def function_5(title: str, x_label: str, y_label: str, data_points: int, color:
     }
 
 
-def function_6(dataset: str, model_type: str, epochs: int, batch_size: int, learning_rate: int, optimizer: str) -> Dict:
+def function_6(dataset: str, model_type: str, epochs: int, batch_size: int, learning_rate: int, optimizer: str,
+               progress=None, workdir: str = "outputs") -> Dict:
     """
-    样例函数6 - 6个参数
+    样例函数6 - 6个参数，每完成一个epoch的计算、写出CSV和生成每张图片后上报进度
+    （progress由框架注入，异步调用时通过 /progress/{job_id} 推送）
     """
+    total = epochs + 4
+    step = 0
+
+    def report(message: str):
+        nonlocal step
+        step += 1
+        if progress:
+            progress(step, total, message)
+
+    losses = []
+    accuracies = []
+    for epoch in range(1, epochs + 1):
+        losses.append(float(np.random.uniform(0, 1)))
+        accuracies.append(float(np.random.uniform(0.7, 0.99)))
+        report(f"epoch {epoch}/{epochs}")
+
     data = {
         'epoch': range(1, epochs + 1),
         'dataset': [dataset] * epochs,
@@ -205,17 +223,19 @@ def function_6(dataset: str, model_type: str, epochs: int, batch_size: int, lear
         'batch_size': [batch_size] * epochs,
         'learning_rate': [learning_rate] * epochs,
         'optimizer': [optimizer] * epochs,
-        'loss': np.random.uniform(0, 1, epochs).tolist(),
-        'accuracy': np.random.uniform(0.7, 0.99, epochs).tolist()
+        'loss': losses,
+        'accuracy': accuracies
     }
 
-    csv_file = create_sample_csv(data, f"function6_{dataset}.csv")
+    csv_file = create_sample_csv(data, f"function6_{dataset}.csv", workdir)
+    report("csv written")
 
-    images = [
-        create_sample_image(f"Model: {model_type}", 1200, 800),
-        create_sample_image(f"Dataset: {dataset}", 1000, 600),
-        create_sample_image(f"Optimizer: {optimizer}", 800, 600)
-    ]
+    images = []
+    for text, width, height in ((f"Model: {model_type}", 1200, 800),
+                                (f"Dataset: {dataset}", 1000, 600),
+                                (f"Optimizer: {optimizer}", 800, 600)):
+        images.append(create_sample_image(text, width, height))
+        report(f"image {len(images)}/3")
 
     return {
         "message": f"Function 6 trained model on {dataset}!",
@@ -0,0 +1,200 @@
+"""
+临时工作目录模块
+每次函数调用使用独立的临时目录（优先放在内存文件系统 /dev/shm），函数的输出文件写到这里，
+互不覆盖；响应构造完成（输出已存入产物存储）后由后台线程删除，不阻塞请求。
+
+函数声明 workdir 参数时由框架注入目录路径，该参数不出现在请求模型中。
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+
+# 注册函数中用于接收临时目录的参数名（不会出现在请求模型中）
+WORKDIR_PARAM = "workdir"
+
+# 内存文件系统的挂载点
+SHM_DIR = "/dev/shm"
+
+# 临时目录根目录的名称
+ROOT_NAME = "api_func_scratch"
+
+
+class ScratchQuotaError(Exception):
+    """临时目录占用已达上限或剩余空间不足"""
+
+
+def default_scratch_root() -> str:
+    """默认根目录：/dev/shm 可写时使用内存文件系统，否则使用系统临时目录"""
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return os.path.join(SHM_DIR, ROOT_NAME)
+    return os.path.join(tempfile.gettempdir(), ROOT_NAME)
+
+
+def _tree_size(path: str) -> int:
+    """目录下所有文件的总字节数"""
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _tree_size(entry.path)
+            else:
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            pass
+    return total
+
+
+class ScratchSpace:
+    """
+    临时工作目录管理器
+
+    创建目录前检查配额：根目录下（包括尚未删除的目录）的总占用超过 max_bytes，
+    或所在文件系统的剩余空间低于 min_free_bytes 时拒绝，避免写满内存文件系统。
+
+    Args:
+        root: 根目录，None表示自动选择（见 default_scratch_root）
+        max_bytes: 所有临时目录的最大总字节数
+        min_free_bytes: 文件系统需要保留的最小剩余空间
+        usage_ttl: 占用统计的缓存秒数；遍历根目录的开销随文件数增长，不在每次创建时重复
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: int = 1024 * 1024 * 1024,
+                 min_free_bytes: int = 64 * 1024 * 1024, usage_ttl: float = 1.0):
+        self.root = root or default_scratch_root()
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.usage_ttl = usage_ttl
+        os.makedirs(self.root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # (统计时间, 占用字节数, 剩余字节数)
+        self._usage_cache = None
+        self._active = set()
+        self._pending = 0
+        # 单线程删除：清理只占用一个后台线程，不与请求争抢线程池
+        self._cleaner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scratch-cleanup")
+
+        # 统计信息
+        self.created = 0
+        self.released = 0
+        self.rejected = 0
+
+    def usage(self) -> int:
+        """根目录下的总占用字节数"""
+        return _tree_size(self.root)
+
+    def _measure(self):
+        """返回 (占用字节数, 剩余字节数)，usage_ttl 秒内复用上次的统计结果"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._usage_cache
+        if cached is not None and now - cached[0] < self.usage_ttl:
+            return cached[1], cached[2]
+        used = self.usage()
+        free = shutil.disk_usage(self.root).free
+        with self._lock:
+            self._usage_cache = (now, used, free)
+        return used, free
+
+    def create(self, prefix: str = "call") -> str:
+        """
+        创建临时目录
+
+        占用统计可能需要遍历根目录，异步代码中应通过线程池调用。
+
+        Raises:
+            ScratchQuotaError: 占用已达上限或剩余空间不足
+        """
+        used, free = self._measure()
+        if used >= self.max_bytes or free < self.min_free_bytes:
+            with self._lock:
+                self.rejected += 1
+            raise ScratchQuotaError(
+                f"Scratch space exhausted ({used} bytes used, {free} bytes free), please retry later"
+            )
+
+        path = tempfile.mkdtemp(prefix=f"{prefix}_", dir=self.root)
+        with self._lock:
+            self._active.add(path)
+            self.created += 1
+        return path
+
+    def release(self, path: str):
+        """在后台删除临时目录"""
+        with self._lock:
+            if path not in self._active:
+                return
+            self._active.discard(path)
+            self._pending += 1
+        self._cleaner.submit(self._remove, path)
+
+    def _remove(self, path: str):
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.released += 1
+
+    def purge_stale(self, max_age: float) -> int:
+        """
+        删除超过 max_age 秒未修改的遗留目录（进程异常退出时未清理的目录）
+
+        多个服务进程共享根目录时，只删除足够旧的目录，不影响其他进程正在使用的目录。
+
+        Returns:
+            删除的目录数
+        """
+        cutoff = time.time() - max_age
+        removed = 0
+        with self._lock:
+            active = set(self._active)
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.path in active or entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                    continue
+            except OSError:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+            removed += 1
+        return removed
+
+    def shutdown(self):
+        """等待后台删除完成"""
+        self._cleaner.shutdown(wait=True)
+
+    def get_stats(self) -> Dict:
+        """获取临时目录统计信息"""
+        with self._lock:
+            active, pending = len(self._active), self._pending
+        return {
+            'root': self.root,
+            'active': active,
+            'pending_cleanup': pending,
+            'used_bytes': self.usage(),
+            'max_bytes': self.max_bytes,
+            'free_bytes': shutil.disk_usage(self.root).free,
+            'min_free_bytes': self.min_free_bytes,
+            'created': self.created,
+            'released': self.released,
+            'rejected': self.rejected
+        }
@@ -0,0 +1,162 @@
+"""
+响应序列化模块
+将已校验的Pydantic模型直接序列化为JSON字节，不经过 model_dump 生成的中间字典；
+并支持按 Accept 请求头协商的二进制格式（multipart/mixed、MessagePack），直接发送产物原始字节。
+
+原来的路径 JSONResponse(model.model_dump()) 会先复制出一个字典，再由 json.dumps
+生成str、encode 生成bytes，几MB的base64字符串在每一步都要复制一次；
+pydantic-core 的序列化器按模型结构直接写出UTF-8字节，只产生最终的一份输出。
+"""
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+# MessagePack为可选依赖，未安装时不参与内容协商
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# 响应格式
+FORMAT_JSON = "application/json"
+FORMAT_MULTIPART = "multipart/mixed"
+FORMAT_MSGPACK = "application/msgpack"
+
+# Accept 中可识别的媒体类型 -> 响应格式
+_MEDIA_TYPES = {
+    "application/json": FORMAT_JSON,
+    "application/*": FORMAT_JSON,
+    "*/*": FORMAT_JSON,
+    "multipart/mixed": FORMAT_MULTIPART,
+    "multipart/*": FORMAT_MULTIPART,
+    "application/msgpack": FORMAT_MSGPACK,
+    "application/x-msgpack": FORMAT_MSGPACK,
+    "application/vnd.msgpack": FORMAT_MSGPACK,
+}
+
+# 流式发送multipart时读取产物的块大小
+CHUNK_SIZE = 256 * 1024
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    序列化为JSON字节
+
+    Pydantic模型使用模型自身的序列化器；字典、列表等普通对象（如异步任务结果）
+    使用 pydantic-core 的通用序列化器，同样不经过 json 模块。
+    """
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    return to_json(content)
+
+
+class ModelJSONResponse(JSONResponse):
+    """
+    直接渲染Pydantic模型的JSON响应
+
+    用法与JSONResponse相同，content 可以直接传入模型实例：
+        return ModelJSONResponse(response, status_code=200, headers=headers)
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
+
+
+def available_formats() -> Tuple[str, ...]:
+    """当前环境支持的响应格式"""
+    formats = (FORMAT_JSON, FORMAT_MULTIPART)
+    return formats + (FORMAT_MSGPACK,) if msgpack is not None else formats
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """
+    根据 Accept 请求头选择响应格式
+
+    按q值从高到低选择第一个支持的格式（q值相同时按出现顺序）。没有 Accept 或
+    Accept 中没有可识别的类型（如 text/html）时保持原来的行为，使用JSON。
+    以 q=0 明确拒绝的类型（如 "application/json;q=0"）不会再被选中，*/* 此时选择其他可用格式。
+
+    Returns:
+        响应格式；只请求了当前环境不支持的格式（如未安装msgpack）或明确拒绝了JSON
+        而没有其他可用格式时返回None（应返回406）
+    """
+    if not accept or not accept.strip():
+        return FORMAT_JSON
+
+    candidates = []
+    excluded = set()
+    for index, item in enumerate(accept.split(",")):
+        params = [p.strip() for p in item.split(";")]
+        media_type = params[0].lower()
+        quality = 1.0
+        for param in params[1:]:
+            if param.lower().startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    # 无法识别的q值：忽略该项
+                    quality = None
+        if quality is None or media_type not in _MEDIA_TYPES:
+            continue
+        if quality > 0:
+            candidates.append((-quality, index, media_type))
+        elif "*" not in media_type:
+            excluded.add(_MEDIA_TYPES[media_type])
+
+    supported = [f for f in available_formats() if f not in excluded]
+    if not candidates:
+        return FORMAT_JSON if FORMAT_JSON in supported else None
+
+    for _, _, media_type in sorted(candidates):
+        if media_type == "*/*":
+            # 任意格式都可以：JSON被明确拒绝时使用其他可用格式
+            return supported[0] if supported else None
+        if _MEDIA_TYPES[media_type] in supported:
+            return _MEDIA_TYPES[media_type]
+    return None
+
+
+def iter_multipart(boundary: str, metadata: bytes,
+                   parts: Iterable[Tuple[Dict[str, str], str]],
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    流式生成 multipart/mixed 响应体
+
+    第一部分是JSON元数据，之后每个产物一部分，内容直接从磁盘分块读取。
+
+    Args:
+        boundary: 分隔符
+        metadata: JSON元数据
+        parts: (部分的头部, 磁盘路径) 列表
+    """
+    delimiter = f"--{boundary}\r\n".encode('ascii')
+    yield delimiter + b"Content-Type: application/json\r\n\r\n" + metadata + b"\r\n"
+
+    for headers, path in parts:
+        head = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        yield delimiter + head.encode('utf-8') + b"\r\n"
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield b"\r\n"
+
+    yield f"--{boundary}--\r\n".encode('ascii')
+
+
+def new_boundary() -> str:
+    """生成multipart分隔符"""
+    return f"api-{uuid.uuid4().hex}"
+
+
+def pack_msgpack(content: Any) -> bytes:
+    """序列化为MessagePack（bytes字段按bin类型编码）"""
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(content, use_bin_type=True)
@@ -0,0 +1,408 @@
+"""
+会话存储模块
+为 /files/{session_id} 等页面保存会话元数据，限制条目数和总字节数，
+按TTL过期、按LRU淘汰，较大的会话数据溢出到本地磁盘目录
+
+两种后端接口相同（与dict一致）：
+    memory: SessionStore，保存在进程内存中，只有写入的进程能读到
+    sqlite: SqliteSessionStore，保存在SQLite数据库（WAL模式）中，
+            同一台机器上的多个服务进程（uvicorn --workers N）共享
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+# 存储后端
+BACKEND_MEMORY = "memory"
+BACKEND_SQLITE = "sqlite"
+
+
+@dataclass
+class _Entry:
+    """单个会话条目，data为None时表示内容已溢出到磁盘"""
+    data: Optional[Dict]
+    size: int
+    expires_at: float
+    spill_path: Optional[str] = None
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算会话数据占用的字节数（以字符串长度为主）"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k)) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 8
+
+
+class SessionStore:
+    """
+    有界的会话存储，接口与dict保持一致（session_storage[id] = data、id in session_storage、get）
+
+    Args:
+        max_entries: 最大会话数
+        max_bytes: 内存中会话数据的最大总字节数
+        ttl: 会话有效期（秒）
+        spill_dir: 溢出目录，None表示不溢出
+        spill_threshold: 单个会话超过该字节数时写入磁盘
+        max_spill_bytes: 溢出目录的最大总字节数
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600, spill_dir: Optional[str] = None,
+                 spill_threshold: int = 256 * 1024, max_spill_bytes: int = 1024 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.spill_threshold = spill_threshold
+        self.max_spill_bytes = max_spill_bytes
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._memory_bytes = 0
+        self._spill_bytes = 0
+        self._last_purge = 0.0
+
+        # 统计信息
+        self.expired = 0
+        self.evicted = 0
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # ---------- 内部方法 ----------
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _remove(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        if entry.spill_path:
+            self._spill_bytes -= entry.size
+            try:
+                os.remove(entry.spill_path)
+            except OSError:
+                pass
+        else:
+            self._memory_bytes -= entry.size
+        return entry
+
+    def _purge_expired(self, force: bool = False):
+        """清理过期会话（最多每秒扫描一次）"""
+        now = time.time()
+        if not force and now - self._last_purge < 1:
+            return
+        self._last_purge = now
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            self._remove(key)
+            self.expired += 1
+
+    def _enforce_limits(self):
+        """按LRU顺序淘汰最久未访问的会话，直到满足所有限制"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or self._memory_bytes > self.max_bytes
+            or self._spill_bytes > self.max_spill_bytes
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evicted += 1
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """读取会话数据，过期或不存在返回None，命中时更新LRU顺序"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self.expired += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if entry.data is not None:
+            return entry.data
+        try:
+            with open(entry.spill_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # 溢出文件丢失或损坏，视为会话不存在
+            self._remove(key)
+            return None
+
+    # ---------- dict兼容接口 ----------
+
+    def __setitem__(self, key: str, value: Dict):
+        size = estimate_size(value)
+        entry = _Entry(data=value, size=size, expires_at=time.time() + self.ttl)
+
+        spill_payload = None
+        if self.spill_dir and size >= self.spill_threshold:
+            spill_payload = json.dumps(value, ensure_ascii=False)
+            entry = _Entry(data=None, size=len(spill_payload), expires_at=entry.expires_at,
+                           spill_path=self._spill_path(key))
+
+        with self._lock:
+            self._remove(key)
+            if spill_payload is not None:
+                with open(entry.spill_path, 'w', encoding='utf-8') as f:
+                    f.write(spill_payload)
+                self._spill_bytes += entry.size
+            else:
+                self._memory_bytes += entry.size
+            self._entries[key] = entry
+            self._purge_expired()
+            self._enforce_limits()
+
+    def __getitem__(self, key: str) -> Dict:
+        data = self.get(key)
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            if self._remove(key) is None:
+                raise KeyError(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired()
+            return len(self._entries)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            data = self._load(key)
+        return default if data is None else data
+
+    def values(self) -> List[Dict]:
+        """所有未过期会话的数据（不更新LRU顺序，用于产物清理时收集仍被引用的摘要）"""
+        with self._lock:
+            self._purge_expired(force=True)
+            entries = list(self._entries.values())
+        result = []
+        for entry in entries:
+            if entry.data is not None:
+                result.append(entry.data)
+                continue
+            try:
+                with open(entry.spill_path, 'r', encoding='utf-8') as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return result
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_stats(self) -> Dict:
+        """获取存储统计信息"""
+        with self._lock:
+            self._purge_expired(force=True)
+            return {
+                'backend': BACKEND_MEMORY,
+                'entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'spill_bytes': self._spill_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
+
+
+class SqliteSessionStore:
+    """
+    基于SQLite的会话存储，接口与 SessionStore 相同
+
+    数据库使用WAL模式，读写互不阻塞，多个进程可以同时打开同一个数据库文件；
+    任意一个服务进程写入的会话，其他进程都能读到。每个线程使用独立的连接。
+
+    LRU按最后访问时间淘汰；为减少写操作，同一会话一秒内的重复访问只更新一次访问时间。
+    expired / evicted 统计只包含当前进程执行的清理。
+
+    Args:
+        path: 数据库文件路径
+        max_entries: 最大会话数
+        max_bytes: 会话数据（JSON）的最大总字节数
+        ttl: 会话有效期（秒）
+        table: 表名（同一数据库中可以保存多种数据，如会话和异步任务结果）
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, max_bytes: int = 1024 * 1024 * 1024,
+                 ttl: float = 3600, table: str = "sessions"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.table = table
+
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+        # 统计信息
+        self.expired = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+
+    # ---------- 内部方法 ----------
+
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _purge_expired(self, conn: sqlite3.Connection, force: bool = False):
+        """清理过期会话（每个进程最多每秒执行一次）"""
+        now = time.time()
+        if not force and now - self._last_purge < 1:
+            return
+        self._last_purge = now
+        cursor = conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        self.expired += max(cursor.rowcount, 0)
+
+    def _enforce_limits(self, conn: sqlite3.Connection):
+        """按最后访问时间淘汰，直到满足条目数和字节数限制"""
+        cursor = conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self.evicted += max(cursor.rowcount, 0)
+        cursor = conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed_at DESC, key) AS total "
+            f"FROM {self.table}) WHERE total > ?)",
+            (self.max_bytes,)
+        )
+        self.evicted += max(cursor.rowcount, 0)
+
+    # ---------- dict兼容接口 ----------
+
+    def __setitem__(self, key: str, value: Dict):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, data, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload.encode('utf-8')), now + self.ttl, now)
+            )
+            self._purge_expired(conn)
+            self._enforce_limits(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __getitem__(self, key: str) -> Dict:
+        data = self.get(key)
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __delitem__(self, key: str):
+        cursor = self._conn().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __len__(self) -> int:
+        conn = self._conn()
+        self._purge_expired(conn)
+        return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        conn = self._conn()
+        row = conn.execute(
+            f"SELECT data, expires_at, accessed_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+
+        data, expires_at, accessed_at = row
+        now = time.time()
+        if expires_at <= now:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires_at <= ?", (key, now))
+            self.expired += 1
+            return default
+        if now - accessed_at >= 1:
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        try:
+            return json.loads(data)
+        except ValueError:
+            return default
+
+    def values(self) -> List[Dict]:
+        """所有未过期会话的数据（不更新访问时间，用于产物清理时收集仍被引用的摘要）"""
+        rows = self._conn().execute(
+            f"SELECT data FROM {self.table} WHERE expires_at > ?", (time.time(),)
+        ).fetchall()
+        result = []
+        for (data,) in rows:
+            try:
+                result.append(json.loads(data))
+            except ValueError:
+                continue
+        return result
+
+    def clear(self):
+        self._conn().execute(f"DELETE FROM {self.table}")
+
+    def get_stats(self) -> Dict:
+        """获取存储统计信息"""
+        conn = self._conn()
+        self._purge_expired(conn, force=True)
+        entries, total = conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        return {
+            'backend': BACKEND_SQLITE,
+            'path': self.path,
+            'entries': entries,
+            'bytes': total,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+            'expired': self.expired,
+            'evicted': self.evicted
+        }
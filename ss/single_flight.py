@@ -0,0 +1,84 @@
+"""
+请求合并模块（single-flight）
+相同参数的请求在第一个请求执行期间到达时，不再重复执行函数，而是等待同一个结果
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """
+    单个函数的在途请求去重表
+
+    第一个到达的请求（leader）负责执行，执行期间到达的相同请求（follower）
+    等待leader的结果；leader结束后条目立即移除，之后的请求重新执行。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计信息
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters: Dict[str, int] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        执行或加入一次调用
+
+        Args:
+            key: 请求的去重键
+            fn: 实际执行的协程函数（只有leader会调用）
+
+        Returns:
+            (结果, 是否为合并的请求)
+        """
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+
+            # 作为follower等待leader的结果；shield避免follower断开时取消leader
+            self.coalesced += 1
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+            try:
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # leader被取消（如客户端断开）时由当前请求重新执行；自身被取消则继续向上抛出
+                if not future.cancelled():
+                    raise
+            finally:
+                self._waiters[key] -= 1
+                if not self._waiters[key]:
+                    del self._waiters[key]
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有follower时也标记异常已读取，避免事件循环打印警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        """获取合并统计信息"""
+        total = self.leaders + self.coalesced
+        return {
+            'in_flight': len(self._inflight),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'max_waiters': self.max_waiters,
+            'coalesce_rate': self.coalesced / total * 100 if total else 0
+        }
@@ -0,0 +1,160 @@
+"""
+转发服务准入控制模块
+同时转发的请求数不超过上限；超出上限的请求按到达顺序排队，排队有截止时间。
+队列已满时立即拒绝（429），排队超过截止时间时拒绝（503），并根据当前队列长度和
+平均处理时间计算 Retry-After，让客户端在预计有空闲时再重试。
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入"""
+
+    def __init__(self, status_code: int, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    有界准入控制（先到先得）
+
+    释放的槽位直接交给队首的等待者，不会被新到达的请求插队。
+
+    Args:
+        limit: 同时转发的最大请求数
+        max_queue: 最大排队请求数
+        queue_timeout: 最长排队时间（秒）
+        max_retry_after: Retry-After 的上限（秒）
+    """
+
+    # 平均处理时间的平滑系数
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float,
+                 max_retry_after: int = 60):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retry_after = max_retry_after
+
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.in_flight = 0
+        self._service_time = 0.0
+
+        # 统计信息
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    def _retry_after(self) -> int:
+        """预计队列中的请求全部处理完需要的秒数"""
+        if self._service_time <= 0:
+            return 1
+        estimate = (len(self._waiters) + 1) * self._service_time / max(self.limit, 1)
+        return min(self.max_retry_after, max(1, math.ceil(estimate)))
+
+    def acquire(self) -> float:
+        """
+        申请一个转发槽位
+
+        Returns:
+            排队等待的秒数（没有排队时为0）
+
+        Raises:
+            AdmissionRejected: 队列已满（429）或排队超时（503）
+        """
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                self.admitted += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_full += 1
+                raise AdmissionRejected(
+                    429, "Proxy Error: Too many queued requests, please retry later", self._retry_after()
+                )
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+            self.queued += 1
+
+        start = time.monotonic()
+        waiter.event.wait(self.queue_timeout)
+        waited = time.monotonic() - start
+
+        with self._lock:
+            if waiter.granted:
+                self.admitted += 1
+                return waited
+            self._waiters.remove(waiter)
+            self.rejected_timeout += 1
+            raise AdmissionRejected(
+                503, f"Proxy Error: Request waited {waited:.1f}s in queue, please retry later", self._retry_after()
+            )
+
+    def release(self, service_time: float = 0.0):
+        """
+        归还槽位，有排队请求时直接交给队首
+
+        Args:
+            service_time: 本次占用槽位的时间（秒），用于估算 Retry-After
+        """
+        with self._lock:
+            if service_time > 0:
+                if self._service_time <= 0:
+                    self._service_time = service_time
+                else:
+                    self._service_time += self.EWMA_ALPHA * (service_time - self._service_time)
+            if self._waiters and self.in_flight <= self.limit:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.in_flight -= 1
+
+    def set_limit(self, limit: int):
+        """
+        调整并发上限（由自适应限制调用）
+
+        上限提高时立即把空出的槽位交给排队的请求；降低时不中断转发中的请求，
+        只是在它们结束前不再准入新请求。
+        """
+        with self._lock:
+            self.limit = limit
+            while self._waiters and self.in_flight < self.limit:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.event.set()
+                self.in_flight += 1
+
+    def get_stats(self) -> Dict:
+        """获取准入统计信息"""
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'in_flight': self.in_flight,
+                'queue_size': len(self._waiters),
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'rejected_full': self.rejected_full,
+                'rejected_timeout': self.rejected_timeout,
+                'avg_service_time': round(self._service_time, 6)
+            }
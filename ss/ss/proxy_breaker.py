@@ -0,0 +1,244 @@
+"""
+转发服务熔断器模块
+按 目标服务器 + 路由前缀 分别熔断：某个慢路由（如 /api/function6）持续失败时只拒绝该路由，
+其他路由照常转发。
+
+每个熔断器有三种状态：
+- closed（关闭）：正常转发，按时间窗口统计失败次数和错误率
+- open（打开）：窗口内失败次数和错误率都超过阈值后打开，直接拒绝请求
+- half_open（半开）：打开 open_timeout 秒后放行少量探测请求，探测全部成功则关闭，任一失败则重新打开
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from proxy_metrics import OTHER_ROUTE, route_key
+
+
+# 熔断器状态
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    单个熔断器（线程安全）
+
+    Args:
+        name: 名称（用于指标）
+        failure_threshold: 窗口内最少失败次数
+        error_rate: 窗口内错误率阈值（0-1）
+        window: 统计窗口（秒）
+        open_timeout: 打开后多久进入半开状态（秒）
+        half_open_requests: 半开状态的探测请求数
+        on_transition: 状态变化时的回调 (name, from_state, to_state, reason)
+    """
+
+    # 统计窗口切分的时间片数
+    BUCKETS = 10
+
+    def __init__(self, name: str, failure_threshold: int = 5, error_rate: float = 0.5,
+                 window: float = 30.0, open_timeout: float = 60.0, half_open_requests: int = 3,
+                 on_transition=None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_requests = half_open_requests
+        self._on_transition = on_transition
+
+        self._lock = threading.Lock()
+        self._bucket_seconds = window / self.BUCKETS
+        # 每个时间片: [时间片编号, 请求数, 失败数]
+        self._buckets = [[-1, 0, 0] for _ in range(self.BUCKETS)]
+
+        self.state = STATE_CLOSED
+        self.opened_at: Optional[float] = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        # 统计信息
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {}
+
+    def _bucket(self, now: float):
+        epoch = int(now / self._bucket_seconds)
+        bucket = self._buckets[epoch % self.BUCKETS]
+        if bucket[0] != epoch:
+            bucket[0], bucket[1], bucket[2] = epoch, 0, 0
+        return bucket
+
+    def _window_counts(self, now: float) -> Tuple[int, int]:
+        oldest = int(now / self._bucket_seconds) - self.BUCKETS + 1
+        requests = failures = 0
+        for epoch, total, failed in self._buckets:
+            if epoch >= oldest:
+                requests += total
+                failures += failed
+        return requests, failures
+
+    def _transition(self, to_state: str, reason: str, now: float):
+        from_state, self.state = self.state, to_state
+        key = f"{from_state}->{to_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        if to_state == STATE_OPEN:
+            self.opened_at = now
+        elif to_state == STATE_HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        else:
+            self.opened_at = None
+            for bucket in self._buckets:
+                bucket[0], bucket[1], bucket[2] = -1, 0, 0
+        if self._on_transition is not None:
+            self._on_transition(self.name, from_state, to_state, reason)
+
+    def acquire(self) -> Optional[str]:
+        """
+        申请转发
+
+        Returns:
+            放行时返回当时的状态（closed 或 half_open，传给 record/cancel），拒绝时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self.state == STATE_OPEN and now - self.opened_at >= self.open_timeout:
+                self._transition(STATE_HALF_OPEN, "open timeout elapsed", now)
+
+            if self.state == STATE_CLOSED:
+                return STATE_CLOSED
+            if self.state == STATE_HALF_OPEN and \
+                    self._probes_in_flight + self._probe_successes < self.half_open_requests:
+                self._probes_in_flight += 1
+                return STATE_HALF_OPEN
+            self.rejected += 1
+            return None
+
+    def cancel(self, permit: str):
+        """放行后没有实际转发（如被准入控制拒绝），归还探测名额"""
+        if permit == STATE_HALF_OPEN:
+            with self._lock:
+                if self.state == STATE_HALF_OPEN:
+                    self._probes_in_flight -= 1
+
+    def record(self, permit: str, success: bool):
+        """
+        记录转发结果
+
+        Args:
+            permit: acquire 返回的状态
+            success: 目标服务器是否正常响应（连接失败、超时、5xx 为失败）
+        """
+        now = time.monotonic()
+        with self._lock:
+            if permit == STATE_HALF_OPEN:
+                if self.state != STATE_HALF_OPEN:
+                    return
+                self._probes_in_flight -= 1
+                if not success:
+                    self._transition(STATE_OPEN, "half-open probe failed", now)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_requests:
+                    self._transition(STATE_CLOSED, f"{self._probe_successes} probes succeeded", now)
+                return
+
+            if self.state != STATE_CLOSED:
+                # 打开之前放行的请求，结果不再计入
+                return
+            bucket = self._bucket(now)
+            bucket[1] += 1
+            if success:
+                return
+            bucket[2] += 1
+            requests, failures = self._window_counts(now)
+            if failures >= self.failure_threshold and failures / requests >= self.error_rate:
+                self._transition(
+                    STATE_OPEN, f"{failures}/{requests} failed in {self.window:g}s", now
+                )
+
+    def retry_after(self) -> int:
+        """打开状态下距离进入半开还有多少秒"""
+        with self._lock:
+            if self.state != STATE_OPEN:
+                return 1
+            remaining = self.open_timeout - (time.monotonic() - self.opened_at)
+            return max(1, int(remaining + 0.999))
+
+    def get_stats(self) -> Dict:
+        """获取熔断器统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            requests, failures = self._window_counts(now)
+            return {
+                'state': self.state,
+                'window_requests': requests,
+                'window_failures': failures,
+                'window_error_rate': round(failures / requests, 4) if requests else 0.0,
+                'open_for': round(now - self.opened_at, 3) if self.opened_at is not None else None,
+                'probes_in_flight': self._probes_in_flight,
+                'probe_successes': self._probe_successes,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions)
+            }
+
+
+class BreakerRegistry:
+    """
+    按 目标服务器 + 路由前缀 管理熔断器
+
+    Args:
+        failure_threshold / error_rate / window / open_timeout / half_open_requests: 见 CircuitBreaker
+        max_breakers: 最多单独熔断的路由数，超过后新路由共用 __other__ 熔断器
+    """
+
+    def __init__(self, failure_threshold: int = 5, error_rate: float = 0.5, window: float = 30.0,
+                 open_timeout: float = 60.0, half_open_requests: int = 3, max_breakers: int = 64):
+        self._options = dict(
+            failure_threshold=failure_threshold, error_rate=error_rate, window=window,
+            open_timeout=open_timeout, half_open_requests=half_open_requests
+        )
+        self.max_breakers = max_breakers
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        # 最近的状态变化（deque.append 是线程安全的）
+        self.recent_transitions: deque = deque(maxlen=50)
+
+    def _record_transition(self, name: str, from_state: str, to_state: str, reason: str):
+        self.recent_transitions.append({
+            'time': datetime.now().isoformat(),
+            'breaker': name,
+            'from': from_state,
+            'to': to_state,
+            'reason': reason
+        })
+
+    def get(self, upstream: str, path: str) -> CircuitBreaker:
+        """请求对应的熔断器"""
+        name = f"{upstream}{route_key(path)}"
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                if name not in self._breakers and len(self._breakers) >= self.max_breakers:
+                    name = f"{upstream}/{OTHER_ROUTE}"
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, on_transition=self._record_transition, **self._options)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def get_stats(self) -> Dict:
+        """所有熔断器的状态"""
+        with self._lock:
+            breakers = sorted(self._breakers.items())
+        states = {name: breaker.get_stats() for name, breaker in breakers}
+        return {
+            # 打开或半开的熔断器
+            'tripped': sorted(name for name, stats in states.items() if stats['state'] != STATE_CLOSED),
+            'breakers': states,
+            'recent_transitions': list(self.recent_transitions)
+        }
@@ -0,0 +1,163 @@
+"""
+转发服务自适应并发限制模块
+根据目标服务器的响应时间自动调整同时转发的请求数（梯度算法 + 丢弃时乘性减小）：
+
+- 每个采样周期计算梯度 = tolerance * 最小RTT / RTT（限制在 [0.5, 1]），RTT 明显变长
+  （目标服务器开始排队）时梯度小于1，限制按比例缩小
+- 新限制 = 当前限制 * 梯度 + sqrt(当前限制)，RTT 接近最小值时限制逐步增长，探测是否还有余量
+- 出现超时、连接失败、502/503/504 时按 backoff_ratio 乘性减小
+- 实际并发不到限制一半时不增长（流量不足时RTT说明不了余量）
+
+各路由的处理时间差别很大（/api/function6 秒级，/health 毫秒级），最小RTT按路由分别统计，
+每个样本和自己路由的最小RTT比较，不会因为慢路由的样本把限制压到最低。
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class AdaptiveLimiter:
+    """
+    自适应并发限制（线程安全）
+
+    Args:
+        initial_limit: 初始限制
+        min_limit: 最小限制
+        max_limit: 最大限制
+        on_change: 限制变化时以新限制调用的回调（如 AdmissionController.set_limit）
+        interval: 采样周期（秒），周期内至少 min_samples 个样本才调整
+        min_samples: 调整所需的最少样本数
+        tolerance: RTT 在最小RTT的 tolerance 倍以内视为没有排队
+        smoothing: 新限制的平滑系数（0-1）
+        backoff_ratio: 丢弃时的乘性减小系数
+        min_rtt_window: 最小RTT的统计窗口（秒），过期后重新测量，适应目标服务器的变化
+    """
+
+    # 保留的限制变化历史条数
+    HISTORY_SIZE = 120
+
+    def __init__(self, initial_limit: int = 10, min_limit: int = 2, max_limit: int = 50,
+                 on_change: Optional[Callable[[int], None]] = None, interval: float = 1.0,
+                 min_samples: int = 5, tolerance: float = 1.5, smoothing: float = 0.2,
+                 backoff_ratio: float = 0.9, min_rtt_window: float = 60.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.interval = interval
+        self.min_samples = min_samples
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff_ratio = backoff_ratio
+        self.min_rtt_window = min_rtt_window
+        self._on_change = on_change
+
+        self._lock = threading.Lock()
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.limit = int(self._limit)
+
+        # 每个路由的最小RTT：{路由: [当前窗口最小值, 上一窗口最小值]}，窗口到期时轮换
+        self._min_rtts: Dict[str, list] = {}
+        self._min_rtt_rotated = time.monotonic()
+
+        # 当前采样周期
+        self._window_start = time.monotonic()
+        self._samples = 0
+        self._gradient_sum = 0.0
+        self._rtt_sum = 0.0
+        self._max_in_flight = 0
+        self._dropped = False
+
+        self.last_gradient = 1.0
+        self.history: deque = deque(maxlen=self.HISTORY_SIZE)
+
+    def _min_rtt(self, route: str, rtt: float) -> float:
+        now = time.monotonic()
+        if now - self._min_rtt_rotated >= self.min_rtt_window:
+            for values in self._min_rtts.values():
+                values[1], values[0] = values[0], math.inf
+            self._min_rtt_rotated = now
+        if route not in self._min_rtts and len(self._min_rtts) >= 256:
+            self._min_rtts.clear()
+        values = self._min_rtts.setdefault(route, [math.inf, math.inf])
+        values[0] = min(values[0], rtt)
+        return min(values)
+
+    def on_sample(self, route: str, rtt: float, in_flight: int, dropped: bool = False):
+        """
+        记录一次转发结果
+
+        Args:
+            route: 路由前缀
+            rtt: 目标服务器的响应时间（秒，不含排队）
+            in_flight: 当前转发中的请求数
+            dropped: 是否超时、连接失败或 502/503/504
+        """
+        with self._lock:
+            if dropped:
+                self._dropped = True
+            elif rtt > 0:
+                min_rtt = self._min_rtt(route, rtt)
+                self._gradient_sum += max(0.5, min(1.0, self.tolerance * min_rtt / rtt))
+                self._rtt_sum += rtt
+                self._samples += 1
+            self._max_in_flight = max(self._max_in_flight, in_flight)
+
+            now = time.monotonic()
+            if now - self._window_start >= self.interval and (self._dropped or self._samples >= self.min_samples):
+                changed = self._update()
+                self._window_start = now
+                self._samples = 0
+                self._gradient_sum = 0.0
+                self._rtt_sum = 0.0
+                self._max_in_flight = 0
+                self._dropped = False
+                # 在锁内通知，保证多个线程的调整按顺序生效
+                if changed is not None and self._on_change is not None:
+                    self._on_change(changed)
+
+    def _update(self) -> Optional[int]:
+        """按当前采样周期调整限制，返回变化后的限制（没有变化时返回None）"""
+        old = self.limit
+        avg_rtt = self._rtt_sum / self._samples if self._samples else 0.0
+        if self._dropped:
+            reason = "drop"
+            self._limit = self._limit * self.backoff_ratio
+        else:
+            gradient = self._gradient_sum / self._samples
+            self.last_gradient = gradient
+            new_limit = self._limit * gradient + math.sqrt(self._limit)
+            if new_limit > self._limit and self._max_in_flight < self._limit / 2:
+                # 流量不足，不增长
+                return None
+            reason = "gradient"
+            self._limit = self._limit * (1 - self.smoothing) + new_limit * self.smoothing
+
+        self._limit = max(self.min_limit, min(self.max_limit, self._limit))
+        self.limit = int(self._limit)
+        if self.limit == old:
+            return None
+        self.history.append({
+            'time': datetime.now().isoformat(),
+            'limit': self.limit,
+            'previous': old,
+            'reason': reason,
+            'gradient': round(self.last_gradient, 4),
+            'avg_rtt': round(avg_rtt, 6),
+            'max_in_flight': self._max_in_flight
+        })
+        return self.limit
+
+    def get_stats(self) -> Dict:
+        """当前限制、各路由最小RTT和限制变化历史"""
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'last_gradient': round(self.last_gradient, 4),
+                'min_rtt': {route: round(min(values), 6) for route, values in self._min_rtts.items()
+                            if min(values) != math.inf},
+                'history': list(self.history)
+            }
@@ -0,0 +1,270 @@
+"""
+转发服务指标模块
+多线程安全的计数器和延迟直方图：
+
+- ShardedCounter: 分片计数器，每个线程固定写一个分片，读取时求和，减少锁竞争
+- LatencyHistogram: 对数分桶的延迟直方图（类似HDR Histogram，相对误差约3%），可合并
+- WindowedHistogram: 按时间片滚动的直方图，统计最近1分钟、5分钟等滑动窗口
+
+每个请求的记录开销是常数（一次加锁和一次字典更新），与请求数、窗口长度无关。
+"""
+import itertools
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+
+# 每个2的幂区间分成 2**SUB_BUCKET_BITS 个子桶（相对误差 1/32）
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+# 输出的分位数
+PERCENTILES = (('p50', 0.50), ('p90', 0.90), ('p99', 0.99), ('p999', 0.999))
+
+# 路由数超过上限后，新路由统一记在这里（防止路径中的ID导致指标无限增长）
+OTHER_ROUTE = "__other__"
+
+
+def route_key(path: str) -> str:
+    """
+    请求路径归并为路由前缀
+
+    /api/function6?x=1 -> /api/function6，/jobs/<job_id> -> /jobs，/ -> /
+    """
+    segments = [s for s in path.split('?', 1)[0].split('/') if s]
+    if not segments:
+        return '/'
+    if segments[0] == 'api' and len(segments) > 1:
+        return f"/api/{segments[1]}"
+    return f"/{segments[0]}"
+
+
+def status_class(status_code: int) -> str:
+    """状态码分类，如 200 -> 2xx"""
+    return f"{status_code // 100}xx"
+
+
+class ShardedCounter:
+    """
+    分片计数器
+
+    每个线程第一次使用时分配一个分片（轮流分配），之后只对该分片加锁累加。
+
+    Args:
+        shards: 分片数
+    """
+
+    def __init__(self, shards: int = 16):
+        self._shards = [[threading.Lock(), 0] for _ in range(shards)]
+        self._local = threading.local()
+        self._next = itertools.count()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._shards[next(self._next) % len(self._shards)]
+            self._local.shard = shard
+        return shard
+
+    def add(self, n: int = 1):
+        """累加（n可以为负，用作当前值的增减）"""
+        shard = self._shard()
+        with shard[0]:
+            shard[1] += n
+
+    @property
+    def value(self) -> int:
+        """所有分片的总和"""
+        return sum(shard[1] for shard in self._shards)
+
+
+def bucket_index(value: int) -> int:
+    """值（微秒）所在的桶：小于 2*SUB_BUCKET_COUNT 时每个值一个桶，之后每个2的幂区间 SUB_BUCKET_COUNT 个桶"""
+    if value < SUB_BUCKET_COUNT:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKET_COUNT + (value >> shift) - SUB_BUCKET_COUNT
+
+
+def bucket_value(index: int) -> float:
+    """桶的代表值（桶内区间的中点，微秒）"""
+    if index < SUB_BUCKET_COUNT:
+        return float(index)
+    shift = index // SUB_BUCKET_COUNT - 1
+    lower = (index % SUB_BUCKET_COUNT + SUB_BUCKET_COUNT) << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+class LatencyHistogram:
+    """
+    对数分桶的延迟直方图（非线程安全，由调用方加锁）
+
+    延迟以微秒记录，桶稀疏存储；两个直方图可以直接合并（桶计数相加）。
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """记录一次延迟（秒）"""
+        index = bucket_index(int(seconds * 1_000_000))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        """合并另一个直方图"""
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """分位数（秒）"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_value(index) / 1_000_000, self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        """请求数、平均值、分位数和最大值（秒）"""
+        result = {
+            'count': self.count,
+            'mean': round(self.total / self.count, 6) if self.count else 0.0
+        }
+        for name, q in PERCENTILES:
+            result[name] = round(self.percentile(q), 6)
+        result['max'] = round(self.max, 6)
+        return result
+
+
+class WindowedHistogram:
+    """
+    滑动时间窗口的延迟直方图
+
+    按 slice_seconds 切分时间片，环形保存最近 slices 个时间片的直方图；
+    查询某个窗口时合并窗口内的时间片。
+
+    Args:
+        slice_seconds: 时间片长度（秒）
+        slices: 保存的时间片数（最长窗口 = slice_seconds * slices）
+    """
+
+    def __init__(self, slice_seconds: float = 10.0, slices: int = 30):
+        self.slice_seconds = slice_seconds
+        self._lock = threading.Lock()
+        self._ring = [(-1, LatencyHistogram()) for _ in range(slices)]
+
+    def record(self, seconds: float, now: Optional[float] = None):
+        """记录一次延迟"""
+        epoch = int((now if now is not None else time.time()) / self.slice_seconds)
+        slot = epoch % len(self._ring)
+        with self._lock:
+            slice_epoch, histogram = self._ring[slot]
+            if slice_epoch != epoch:
+                # 时间片已过期，复用该位置
+                histogram = LatencyHistogram()
+                self._ring[slot] = (epoch, histogram)
+            histogram.record(seconds)
+
+    def merge_into(self, target: LatencyHistogram, window: float, now: Optional[float] = None):
+        """把最近 window 秒内的时间片合并到 target"""
+        epoch = int((now if now is not None else time.time()) / self.slice_seconds)
+        oldest = epoch - max(1, int(window / self.slice_seconds)) + 1
+        with self._lock:
+            for slice_epoch, histogram in self._ring:
+                if oldest <= slice_epoch <= epoch:
+                    target.merge(histogram)
+
+    def snapshot(self, window: float, now: Optional[float] = None) -> LatencyHistogram:
+        """最近 window 秒的直方图"""
+        histogram = LatencyHistogram()
+        self.merge_into(histogram, window, now)
+        return histogram
+
+
+class LatencyTracker:
+    """
+    按路由前缀和状态码分类统计延迟
+
+    Args:
+        windows: 输出的窗口长度（秒），如 (60, 300)
+        slice_seconds: 时间片长度（秒）
+        max_routes: 最多单独统计的路由数
+    """
+
+    def __init__(self, windows: Iterable[float] = (60, 300), slice_seconds: float = 10.0,
+                 max_routes: int = 64):
+        self.windows = tuple(windows)
+        self.slice_seconds = slice_seconds
+        self.max_routes = max_routes
+        self._slices = max(1, int(max(self.windows) / slice_seconds))
+        self._lock = threading.Lock()
+        self._routes = set()
+        self._histograms: Dict[Tuple[str, str], WindowedHistogram] = {}
+
+    def _histogram(self, route: str, status: str) -> WindowedHistogram:
+        key = (route, status)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                if route not in self._routes and len(self._routes) >= self.max_routes:
+                    route, key = OTHER_ROUTE, (OTHER_ROUTE, status)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = WindowedHistogram(self.slice_seconds, self._slices)
+                    self._histograms[key] = histogram
+                    self._routes.add(route)
+        return histogram
+
+    def record(self, route: str, status_code: int, seconds: float):
+        """记录一次请求的延迟"""
+        self._histogram(route, status_class(status_code)).record(seconds)
+
+    @staticmethod
+    def window_name(window: float) -> str:
+        """窗口名称，如 60 -> 1m"""
+        return f"{int(window // 60)}m" if window >= 60 and window % 60 == 0 else f"{int(window)}s"
+
+    def window(self, window: float, route: Optional[str] = None) -> LatencyHistogram:
+        """最近 window 秒的合并直方图（route为None时合并所有路由）"""
+        with self._lock:
+            items = list(self._histograms.items())
+        now = time.time()
+        merged = LatencyHistogram()
+        for (key_route, _), histogram in items:
+            if route is None or key_route == route:
+                histogram.merge_into(merged, window, now)
+        return merged
+
+    def get_stats(self) -> Dict:
+        """所有路由的汇总分位数，以及每个路由、每个状态码分类的分位数"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        now = time.time()
+
+        overall = {}
+        routes: Dict[str, Dict] = {}
+        for window in self.windows:
+            name = self.window_name(window)
+            merged = LatencyHistogram()
+            for (route, status), histogram in items:
+                snapshot = histogram.snapshot(window, now)
+                merged.merge(snapshot)
+                if snapshot.count:
+                    routes.setdefault(route, {}).setdefault(status, {})[name] = snapshot.summary()
+            overall[name] = merged.summary()
+        return {'overall': overall, 'routes': routes}
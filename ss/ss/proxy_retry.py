@@ -0,0 +1,197 @@
+"""
+转发服务重试和对冲策略模块
+
+- 幂等请求（GET/HEAD/OPTIONS，或带 Idempotency-Key 请求头的请求）：连接失败、超时、
+  502/503/504 时可以重试；等待响应头超过该路由的 p95 延迟时发出一个对冲请求，先返回的胜出
+- 非幂等请求（普通POST等）：只在连接没有建立（请求确定没有到达目标服务器）时重试，
+  避免昂贵的函数被执行两次
+- 流式转发的大请求体只能发送一次，不重试也不对冲
+
+重试和对冲共用一个预算：每个请求存入 ratio 个令牌，另外每秒补充 min_per_second 个，
+每次重试或对冲消耗一个，预算用完时不再产生额外请求，目标服务器的重复工作量不超过约 ratio。
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+from proxy_metrics import LatencyTracker
+from proxy_server import is_idempotent
+
+# 幂等请求可以重试的响应状态码（网关错误和服务暂不可用）
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class RetryBudget:
+    """
+    重试预算（令牌桶，线程安全）
+
+    Args:
+        ratio: 每个请求存入的令牌数（额外请求占比的上限）
+        min_per_second: 每秒补充的令牌数（低流量时也允许少量重试）
+        max_tokens: 令牌上限
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+
+        # 统计信息
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """每个原始请求存入 ratio 个令牌"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """消耗一个令牌，预算不足时返回False"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RetryPolicy:
+    """
+    重试和对冲策略
+
+    对冲延迟取该路由最近1分钟响应头到达时间的 hedge_percentile 分位数，
+    样本少于 hedge_min_samples 时不对冲。分位数按路由缓存1秒，每个请求的开销是常数。
+
+    Args:
+        max_retries: 最大重试次数
+        backoff_factor: 第n次重试前等待 backoff_factor * 2**(n-1) 秒
+        budget: 重试预算
+        hedge_percentile: 对冲延迟的分位数（0表示不对冲）
+        hedge_min_samples: 开始对冲所需的最少样本数
+        hedge_min_delay: 对冲延迟的下限（秒）
+    """
+
+    # 对冲延迟的缓存时间（秒）
+    HEDGE_DELAY_TTL = 1.0
+
+    def __init__(self, max_retries: int = 2, backoff_factor: float = 0.5,
+                 budget: Optional[RetryBudget] = None, hedge_percentile: float = 0.95,
+                 hedge_min_samples: int = 20, hedge_min_delay: float = 0.05):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.budget = budget or RetryBudget()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+        # 每个路由响应头到达时间（不含响应体转发）
+        self.header_latency = LatencyTracker(windows=(60,))
+        self._lock = threading.Lock()
+        self._hedge_delays: Dict[str, tuple] = {}
+
+        # 统计信息
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @staticmethod
+    def is_idempotent(method: str, headers) -> bool:
+        """请求是否可以安全地重复发送"""
+        return is_idempotent(method, headers)
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间"""
+        return self.backoff_factor * (2 ** (attempt - 1)) if self.backoff_factor > 0 else 0.0
+
+    def can_retry_error(self, attempt: int, idempotent: bool, connect_failed: bool) -> bool:
+        """
+        转发失败（没有收到响应）后是否重试
+
+        非幂等请求只在连接没有建立时重试；重试消耗预算
+        """
+        if attempt >= self.max_retries or not (idempotent or connect_failed):
+            return False
+        return self._spend_retry()
+
+    def can_retry_status(self, attempt: int, idempotent: bool, status_code: int) -> bool:
+        """收到 502/503/504 后是否重试（只重试幂等请求）"""
+        if attempt >= self.max_retries or not idempotent or status_code not in RETRY_STATUSES:
+            return False
+        return self._spend_retry()
+
+    def _spend_retry(self) -> bool:
+        if not self.budget.withdraw():
+            return False
+        with self._lock:
+            self.retries += 1
+        return True
+
+    def record_headers(self, route: str, status_code: int, seconds: float):
+        """记录响应头到达时间（用于计算对冲延迟）"""
+        if status_code < 500:
+            self.header_latency.record(route, status_code, seconds)
+
+    def hedge_delay(self, route: str) -> Optional[float]:
+        """该路由的对冲延迟（秒），不对冲时返回None"""
+        if self.hedge_percentile <= 0:
+            return None
+        now = time.monotonic()
+        cached = self._hedge_delays.get(route)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        histogram = self.header_latency.window(60, route)
+        delay = None
+        if histogram.count >= self.hedge_min_samples:
+            delay = max(self.hedge_min_delay, histogram.percentile(self.hedge_percentile))
+        with self._lock:
+            if len(self._hedge_delays) >= 256:
+                self._hedge_delays.clear()
+            self._hedge_delays[route] = (now + self.HEDGE_DELAY_TTL, delay)
+        return delay
+
+    def start_hedge(self) -> bool:
+        """发出对冲请求前消耗预算"""
+        if not self.budget.withdraw():
+            return False
+        with self._lock:
+            self.hedges += 1
+        return True
+
+    def record_hedge_win(self):
+        """对冲请求先于原请求返回"""
+        with self._lock:
+            self.hedge_wins += 1
+
+    def get_stats(self) -> Dict:
+        """获取重试和对冲统计信息"""
+        with self._lock:
+            delays = {route: round(delay, 6) for route, (_, delay) in self._hedge_delays.items()
+                      if delay is not None}
+            return {
+                'max_retries': self.max_retries,
+                'retries': self.retries,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'hedge_delays': delays,
+                'budget_ratio': self.budget.ratio,
+                'budget_tokens': round(self.budget.tokens, 3),
+                'budget_spent': self.budget.spent,
+                'budget_denied': self.budget.denied
+            }
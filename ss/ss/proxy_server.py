@@ -3,6 +3,12 @@
 简单的HTTP转发服务
 用于将请求从B服务器转发到C服务器
 
+每个客户端连接由独立线程处理，可以同时转发多个请求；到目标服务器的连接放在
+keep-alive连接池中复用，不必每个请求都重新建立TCP连接。
+
+请求体和响应体都按块流式转发（支持 Transfer-Encoding: chunked），转发服务的内存占用
+只与块大小有关，与请求和响应的大小无关；客户端在目标服务器返回第一个数据块时就开始接收。
+
 使用方法:
     python3 proxy_server.py --target-host <C服务器IP> --target-port 8000 --listen-port 8080
 
@@ -10,130 +16,435 @@
     python3 proxy_server.py --target-host 192.168.1.100 --target-port 8000 --listen-port 8080
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.client import HTTPConnection, HTTPException, HTTPResponse, RemoteDisconnected
 from urllib.parse import urlparse
 import socket
 import argparse
 import sys
-from typing import Tuple
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# 逐跳头部（只对单个连接有效，不转发）
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-connection', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+}
+
+# 流式转发的块大小
+CHUNK_SIZE = 64 * 1024
+
+# 不超过该大小的请求体读入内存（连接失效时可以重发），更大的请求体流式转发
+MAX_BUFFERED_BODY = 64 * 1024
+
+# 单个chunked分块头部行的最大长度
+_MAX_CHUNK_LINE = 1024
+
+# 本身是幂等的方法（PUT/DELETE 虽然语义上幂等，但可能触发耗时操作，需要带 Idempotency-Key）
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# 客户端声明请求可以安全重复执行的请求头
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+# ==================== 流式转发 ====================
+
+def iter_limited(rfile, length: int, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """按块读取固定长度的请求体"""
+    remaining = length
+    while remaining > 0:
+        chunk = rfile.read(min(chunk_size, remaining))
+        if not chunk:
+            raise ConnectionError("Client closed connection before sending the full request body")
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_chunked(rfile, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """解码 Transfer-Encoding: chunked 的请求体，按块返回数据（忽略分块扩展和尾部头部）"""
+    while True:
+        line = rfile.readline(_MAX_CHUNK_LINE)
+        if not line.endswith(b"\n"):
+            raise ValueError("Invalid chunked request body")
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise ValueError("Invalid chunk size in request body")
+        if size == 0:
+            # 尾部头部，直到空行
+            while rfile.readline(_MAX_CHUNK_LINE) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        yield from iter_limited(rfile, size, chunk_size)
+        rfile.readline(_MAX_CHUNK_LINE)
+
+
+class SizedBody:
+    """
+    已知长度、流式读取的请求体
+
+    可迭代且支持 len()：http.client / requests 据此发送 Content-Length 并逐块写出，
+    而不是先读入内存。只能读取一次。
+    """
+
+    def __init__(self, rfile, length: int):
+        self.rfile = rfile
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter_limited(self.rfile, self.length)
+
+
+RequestBody = Union[None, bytes, SizedBody, Iterator[bytes]]
+
+
+def read_request_body(rfile, headers) -> RequestBody:
+    """
+    读取客户端请求体
+
+    Returns:
+        None: 没有请求体
+        bytes: 不超过 MAX_BUFFERED_BODY 的请求体（可以重发）
+        SizedBody: 更大的、已知长度的请求体（流式转发）
+        Iterator[bytes]: chunked 请求体（解码后流式转发，长度未知）
+
+    Raises:
+        ValueError: Content-Length 或 Transfer-Encoding 无效
+    """
+    transfer_encoding = headers.get('Transfer-Encoding', '').lower()
+    if transfer_encoding:
+        if transfer_encoding.split(',')[-1].strip() != 'chunked':
+            raise ValueError(f"Unsupported Transfer-Encoding: {transfer_encoding}")
+        return iter_chunked(rfile)
+
+    content_length = int(headers.get('Content-Length', 0) or 0)
+    if content_length < 0:
+        raise ValueError("Invalid Content-Length")
+    if content_length == 0:
+        return None
+    if content_length <= MAX_BUFFERED_BODY:
+        return b''.join(iter_limited(rfile, content_length))
+    return SizedBody(rfile, content_length)
+
+
+def is_replayable(body: RequestBody) -> bool:
+    """请求体是否可以重新发送（没有请求体或已读入内存）"""
+    return body is None or isinstance(body, bytes)
+
+
+def is_idempotent(method: str, headers) -> bool:
+    """请求是否可以安全地重复发送（幂等方法，或带 Idempotency-Key 请求头）"""
+    if method in IDEMPOTENT_METHODS:
+        return True
+    key = IDEMPOTENCY_KEY_HEADER.lower()
+    return any(name.lower() == key and value for name, value in headers.items())
+
+
+def body_length(body: RequestBody) -> Optional[int]:
+    """请求体长度，chunked 请求体返回None"""
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, SizedBody)):
+        return len(body)
+    return None
+
+
+def relay_response(handler: BaseHTTPRequestHandler, status: int, headers: List[Tuple[str, str]],
+                   chunks: Iterable[bytes], length: Optional[int]) -> int:
+    """
+    把响应按块写回客户端
+
+    长度已知时发送 Content-Length；未知时对HTTP/1.1客户端使用 chunked 编码，
+    对HTTP/1.0客户端在发送完后关闭连接。
+
+    Args:
+        handler: 请求处理器
+        status: 状态码
+        headers: 响应头（已过滤逐跳头部和 Content-Length）
+        chunks: 响应体数据块
+        length: 响应体长度，未知时为None
+
+    Returns:
+        写出的响应体字节数
+    """
+    handler.send_response(status)
+    for header, value in headers:
+        handler.send_header(header, value)
+
+    # 1xx / 204 / 304 没有响应体
+    if status < 200 or status in (204, 304):
+        handler.end_headers()
+        for _ in chunks:
+            pass
+        return 0
+
+    chunked = False
+    if length is not None:
+        handler.send_header('Content-Length', str(length))
+    elif handler.request_version != 'HTTP/1.0' and handler.protocol_version >= 'HTTP/1.1':
+        handler.send_header('Transfer-Encoding', 'chunked')
+        chunked = True
+    else:
+        handler.close_connection = True
+        handler.send_header('Connection', 'close')
+    handler.end_headers()
+
+    sent = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if chunked:
+            handler.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        else:
+            handler.wfile.write(chunk)
+        sent += len(chunk)
+    if chunked:
+        handler.wfile.write(b"0\r\n\r\n")
+    handler.wfile.flush()
+    return sent
+
+
+class UpstreamConnectionPool:
+    """
+    到目标服务器的keep-alive连接池（线程安全）
+
+    空闲连接后进先出复用；空闲超过 idle_timeout 秒的连接直接丢弃
+    （uvicorn默认5秒关闭空闲连接，复用这类连接大概率失败）。
+
+    Args:
+        host: 目标服务器地址
+        port: 目标服务器端口
+        max_idle: 最多保留的空闲连接数
+        timeout: 连接和读取超时（秒）
+        idle_timeout: 空闲连接的最长保留时间（秒）
+    """
+
+    def __init__(self, host: str, port: int, max_idle: int = 32, timeout: float = 30,
+                 idle_timeout: float = 4.0):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self) -> Tuple[HTTPConnection, bool]:
+        """
+        获取连接
+
+        Returns:
+            (连接, 是否为复用的连接)
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn, released_at = self._idle.pop()
+                if now - released_at < self.idle_timeout:
+                    self.reused += 1
+                    return conn, True
+                conn.close()
+        return self.connect(), False
+
+    def connect(self) -> HTTPConnection:
+        """新建连接（不复用空闲连接）"""
+        with self._lock:
+            self.created += 1
+        return HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn: HTTPConnection):
+        """归还可以继续使用的连接（响应必须已完整读取）"""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            while self._idle:
+                self._idle.pop()[0].close()
+
+    def request(self, method: str, path: str, body: RequestBody, headers: Dict[str, str],
+                retry_stale: bool = True) -> Tuple[HTTPConnection, HTTPResponse]:
+        """
+        发送请求并读取响应头（响应体由调用方流式读取后调用 finish）
+
+        复用的空闲连接可能已被目标服务器关闭，但请求发出后连接被重置并不能证明请求没有被处理，
+        所以只有幂等请求（见 is_idempotent）且请求体可以重发时，才换一个新建的连接重试一次。
+
+        Args:
+            retry_stale: 是否重试失效的空闲连接；调用方有自己的重试策略时传False
+        """
+        conn, reused = self.acquire()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            return conn, conn.getresponse()
+        except (RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            conn.close()
+            if not (retry_stale and reused and is_replayable(body) and is_idempotent(method, headers)):
+                raise
+        except Exception:
+            conn.close()
+            raise
+
+        conn = self.connect()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            return conn, conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+
+    def finish(self, conn: HTTPConnection, response: HTTPResponse, completed: bool):
+        """响应体读取结束：完整读取且可以保持的连接放回连接池，否则关闭"""
+        if completed and not response.will_close:
+            self.release(conn)
+        else:
+            conn.close()
+
+
+def upstream_headers(headers, target_host: str, target_port: int, body: RequestBody) -> Dict[str, str]:
+    """生成发往目标服务器的请求头（过滤逐跳头部，按请求体设置 Content-Length）"""
+    skip_headers = HOP_BY_HOP_HEADERS | {'host', 'accept-encoding', 'content-length'}
+    connection_tokens = {
+        token.strip().lower() for token in headers.get('Connection', '').split(',')
+    }
+    result = {}
+    for header, value in headers.items():
+        name = header.lower()
+        if name not in skip_headers and name not in connection_tokens:
+            result[header] = value
+    result['Host'] = f"{target_host}:{target_port}"
+    length = body_length(body)
+    if length is not None and (length or body is not None):
+        result['Content-Length'] = str(length)
+    return result
+
+
+def response_headers(headers: Iterable[Tuple[str, str]], skip: Iterable[str] = ()) -> List[Tuple[str, str]]:
+    """过滤目标服务器响应中的逐跳头部和 Content-Length（由 relay_response 重新设置）"""
+    skip_headers = HOP_BY_HOP_HEADERS | {'content-length'} | set(skip)
+    return [(header, value) for header, value in headers if header.lower() not in skip_headers]
+
+
+def iter_response(response, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """按块读取 http.client 响应体（chunked 响应由 http.client 解码）"""
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def declared_length(response) -> Optional[int]:
+    """目标服务器响应声明的 Content-Length（chunked 或未声明时返回None）"""
+    if response.getheader('Transfer-Encoding'):
+        return None
+    value = response.getheader('Content-Length')
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
 
 
 class ProxyHTTPRequestHandler(BaseHTTPRequestHandler):
     """HTTP请求转发处理器"""
 
+    # 支持客户端keep-alive（响应带有Content-Length或使用chunked编码）
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写入，关闭Nagle算法，避免与客户端的延迟ACK叠加出约40ms的等待
+    disable_nagle_algorithm = True
+
     # 目标服务器配置（类变量，由服务器启动时设置）
     target_host = None
     target_port = None
+    upstream_pool: Optional[UpstreamConnectionPool] = None
 
     def log_message(self, format: str, *args):
         """自定义日志格式"""
         sys.stderr.write(f"[Proxy] {self.log_date_time_string()} - {format % args}\n")
 
-    def _forward_request(self) -> Tuple[bytes, int, dict]:
-        """
-        转发请求到目标服务器
+    def _send_error_response(self, status_code: int, message: str):
+        """发送错误响应"""
+        body = message.encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _relay(self):
+        """流式转发请求，并把响应按块写回客户端"""
+        # 解析请求URL
+        parsed_path = urlparse(self.path)
+        path = parsed_path.path or '/'
+        if parsed_path.query:
+            path = f"{path}?{parsed_path.query}"
 
-        Returns:
-            (response_body, status_code, response_headers)
-        """
         try:
-            # 解析请求URL
-            parsed_path = urlparse(self.path)
-            path = parsed_path.path
-            query = parsed_path.query
-
-            # 构建目标URL
-            if query:
-                target_url = f"http://{self.target_host}:{self.target_port}{path}?{query}"
-            else:
-                target_url = f"http://{self.target_host}:{self.target_port}{path}"
-
-            # 获取请求体（如果有）
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length) if content_length > 0 else None
-
-            # 发送请求到目标服务器
-            import urllib.request
-            req = urllib.request.Request(target_url, data=request_body, method=self.command)
-
-            # 复制原始请求头（过滤掉一些不需要的头）
-            skip_headers = {'host', 'connection', 'accept-encoding', 'content-length'}
-            for header, value in self.headers.items():
-                if header.lower() not in skip_headers:
-                    req.add_header(header, value)
-
-            # 执行请求
-            with urllib.request.urlopen(req, timeout=30) as response:
-                response_body = response.read()
-                status_code = response.status
-
-                # 收集响应头
-                response_headers = {}
-                skip_response_headers = {'connection', 'transfer-encoding', 'content-encoding'}
-                for header, value in response.headers.items():
-                    if header.lower() not in skip_response_headers:
-                        response_headers[header] = value
-
-                return response_body, status_code, response_headers
-
-        except urllib.error.HTTPError as e:
-            # HTTP错误（如404, 500等）
-            error_body = e.read() if e.fp else b''
-            return error_body, e.code, {}
-        except urllib.error.URLError as e:
-            # 连接错误
-            error_msg = f"Proxy Error: Cannot connect to target server {self.target_host}:{self.target_port}\nReason: {e.reason}"
-            return error_msg.encode('utf-8'), 502, {'Content-Type': 'text/plain'}
+            body = read_request_body(self.rfile, self.headers)
+        except ValueError as e:
+            self.close_connection = True
+            self._send_error_response(400, f"Proxy Error: {e}")
+            return
+
+        headers = upstream_headers(self.headers, self.target_host, self.target_port, body)
+        try:
+            conn, response = self.upstream_pool.request(self.command, path, body, headers)
         except socket.timeout:
-            error_msg = f"Proxy Error: Target server timeout"
-            return error_msg.encode('utf-8'), 504, {'Content-Type': 'text/plain'}
+            self.close_connection = True
+            self._send_error_response(504, "Proxy Error: Target server timeout")
+            return
+        except (OSError, HTTPException) as e:
+            # 连接错误（请求体可能没有读完，不能继续复用客户端连接）
+            self.close_connection = True
+            self._send_error_response(
+                502,
+                f"Proxy Error: Cannot connect to target server {self.target_host}:{self.target_port}\nReason: {e}"
+            )
+            return
+
+        completed = False
+        try:
+            relay_response(
+                self, response.status, response_headers(response.getheaders()),
+                iter_response(response), declared_length(response)
+            )
+            completed = True
         except Exception as e:
-            error_msg = f"Proxy Error: {str(e)}"
-            return error_msg.encode('utf-8'), 500, {'Content-Type': 'text/plain'}
+            # 响应头已经发出，只能断开客户端连接
+            self.close_connection = True
+            self.log_message("Relay aborted: %s", e)
+        finally:
+            self.upstream_pool.finish(conn, response, completed)
 
     def do_GET(self):
         """处理GET请求"""
-        response_body, status_code, response_headers = self._forward_request()
-
-        # 发送响应
-        self.send_response(status_code)
-        for header, value in response_headers.items():
-            self.send_header(header, value)
-        self.end_headers()
-        self.wfile.write(response_body)
+        self._relay()
 
     def do_POST(self):
         """处理POST请求"""
-        response_body, status_code, response_headers = self._forward_request()
-
-        # 发送响应
-        self.send_response(status_code)
-        for header, value in response_headers.items():
-            self.send_header(header, value)
-        self.end_headers()
-        self.wfile.write(response_body)
+        self._relay()
 
     def do_PUT(self):
         """处理PUT请求"""
-        response_body, status_code, response_headers = self._forward_request()
-
-        # 发送响应
-        self.send_response(status_code)
-        for header, value in response_headers.items():
-            self.send_header(header, value)
-        self.end_headers()
-        self.wfile.write(response_body)
+        self._relay()
 
     def do_DELETE(self):
         """处理DELETE请求"""
-        response_body, status_code, response_headers = self._forward_request()
-
-        # 发送响应
-        self.send_response(status_code)
-        for header, value in response_headers.items():
-            self.send_header(header, value)
-        self.end_headers()
-        self.wfile.write(response_body)
+        self._relay()
 
     def do_OPTIONS(self):
         """处理OPTIONS请求（用于CORS预检）"""
@@ -141,10 +452,19 @@ class ProxyHTTPRequestHandler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', '*')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
 
-def run_proxy_server(listen_host: str, listen_port: int, target_host: str, target_port: int):
+class ProxyHTTPServer(ThreadingHTTPServer):
+    """多线程转发服务器：每个客户端连接一个线程"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def run_proxy_server(listen_host: str, listen_port: int, target_host: str, target_port: int,
+                     max_connections: int = 32, timeout: float = 30, idle_timeout: float = 4.0):
     """
     启动代理服务器
 
@@ -153,20 +473,27 @@ def run_proxy_server(listen_host: str, listen_port: int, target_host: str, targe
         listen_port: 监听端口
         target_host: 目标服务器IP（C服务器）
         target_port: 目标服务器端口（通常是8000）
+        max_connections: 到目标服务器的最大空闲keep-alive连接数
+        timeout: 到目标服务器的连接和读取超时（秒）
+        idle_timeout: 空闲连接的最长保留时间（秒），应小于目标服务器的keep-alive超时
     """
     # 设置目标服务器配置
     ProxyHTTPRequestHandler.target_host = target_host
     ProxyHTTPRequestHandler.target_port = target_port
+    ProxyHTTPRequestHandler.upstream_pool = UpstreamConnectionPool(
+        target_host, target_port, max_idle=max_connections, timeout=timeout, idle_timeout=idle_timeout
+    )
 
     # 创建服务器
     server_address = (listen_host, listen_port)
-    httpd = HTTPServer(server_address, ProxyHTTPRequestHandler)
+    httpd = ProxyHTTPServer(server_address, ProxyHTTPRequestHandler)
 
     print("=" * 70)
     print("HTTP转发服务已启动")
     print("=" * 70)
     print(f"监听地址: {listen_host}:{listen_port}")
     print(f"目标地址: {target_host}:{target_port}")
+    print(f"连接池:   最多 {max_connections} 个空闲keep-alive连接，超时 {timeout}s")
     print(f"\n使用方式:")
     print(f"  A服务器访问: http://{listen_host}:{listen_port}/api/function1")
     print(f"  将被转发到:   http://{target_host}:{target_port}/api/function1")
@@ -177,7 +504,9 @@ def run_proxy_server(listen_host: str, listen_port: int, target_host: str, targe
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n\n服务器已停止")
-        httpd.shutdown()
+    finally:
+        httpd.server_close()
+        ProxyHTTPRequestHandler.upstream_pool.close()
 
 
 def main():
@@ -221,6 +550,27 @@ def main():
         help='监听端口（默认: 8080）'
     )
 
+    parser.add_argument(
+        '--max-connections',
+        type=int,
+        default=32,
+        help='到目标服务器的最大空闲keep-alive连接数（默认: 32）'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=30,
+        help='到目标服务器的连接和读取超时，秒（默认: 30）'
+    )
+
+    parser.add_argument(
+        '--idle-timeout',
+        type=float,
+        default=4.0,
+        help='空闲连接的最长保留时间，秒，应小于目标服务器的keep-alive超时（默认: 4）'
+    )
+
     args = parser.parse_args()
 
     # 启动服务器
@@ -228,7 +578,10 @@ def main():
         listen_host=args.listen_host,
         listen_port=args.listen_port,
         target_host=args.target_host,
-        target_port=args.target_port
+        target_port=args.target_port,
+        max_connections=args.max_connections,
+        timeout=args.timeout,
+        idle_timeout=args.idle_timeout
     )
 
 
@@ -3,34 +3,46 @@
 增强版HTTP转发服务 - 支持并发控制
 用于将请求从B服务器转发到C服务器，具有以下特性:
 - 连接池复用
-- 并发请求限制
+- 并发请求限制（按目标服务器响应时间自适应调整；有界排队，超限快速拒绝）
 - 请求超时控制
-- 熔断机制
+- 熔断机制（按目标服务器和路由前缀分别熔断，半开状态放行探测请求）
+- 幂等请求的重试和对冲（非幂等请求只在连接失败时重试，额外请求受预算限制）
 - 指标监控
+- 请求体和响应体流式转发（内存占用与请求、响应大小无关）
 
 使用方法:
     python3 proxy_server_enhanced.py --target-host <C服务器IP> --target-port 8000 --listen-port 8080
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse
 import socket
 import argparse
 import sys
 import threading
-import queue
 import time
 from datetime import datetime
-from typing import Tuple, Optional
-from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Tuple, Optional
+from dataclasses import dataclass
 from collections import deque
-import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.client import HTTPException
+
+from proxy_admission import AdmissionController, AdmissionRejected
+from proxy_breaker import STATE_CLOSED, BreakerRegistry
+from proxy_limiter import AdaptiveLimiter
+from proxy_metrics import LatencyTracker, ShardedCounter, WindowedHistogram, route_key
+from proxy_retry import RETRY_STATUSES, RetryBudget, RetryPolicy
+from proxy_server import (
+    CHUNK_SIZE, ProxyHTTPServer, RequestBody, UpstreamConnectionPool, declared_length, is_replayable,
+    iter_response, read_request_body, relay_response, response_headers, upstream_headers
+)
 
 # 尝试导入更好的HTTP库
 try:
     import requests
     from requests.adapters import HTTPAdapter
-    from urllib3.util.retry import Retry
+    from urllib3.exceptions import NewConnectionError
     HAS_REQUESTS = True
 except ImportError:
     HAS_REQUESTS = False
@@ -50,8 +62,12 @@ class ProxyConfig:
     listen_port: int = 8080
 
     # 并发控制
-    max_concurrent_requests: int = 50  # 最大并发请求数
+    max_concurrent_requests: int = 50  # 最大并发请求数（开启自适应时为上限）
     max_queue_size: int = 100  # 请求队列最大长度
+    adaptive_concurrency: bool = True  # 按目标服务器响应时间自动调整并发数
+    min_concurrent_requests: int = 2  # 自适应并发数的下限
+    initial_concurrent_requests: int = 10  # 自适应并发数的初始值
+    queue_timeout: float = 10.0  # 最长排队时间(秒)，超时返回503
 
     # 超时配置
     connect_timeout: int = 10  # 连接超时(秒)
@@ -59,141 +75,189 @@ class ProxyConfig:
 
     # 连接池配置
     pool_connections: int = 20  # 连接池大小
-    pool_maxsize: int = 50  # 连接池最大连接数
+    pool_maxsize: int = 50  # 连接池最大连接数（不小于最大并发请求数）
 
-    # 重试配置
+    # 重试配置（幂等请求在连接失败、超时、502/503/504时重试；非幂等请求只在连接失败时重试）
     max_retries: int = 2  # 失败重试次数
     retry_backoff_factor: float = 0.5  # 重试退避因子
+    retry_budget_ratio: float = 0.1  # 重试和对冲产生的额外请求占比上限
+
+    # 对冲配置（幂等请求等待响应头超过该路由的分位数延迟时发出备份请求）
+    hedge_percentile: float = 0.95  # 对冲延迟的分位数，0表示不对冲
+    hedge_min_samples: int = 20  # 开始对冲所需的最少样本数
 
     # 熔断配置
-    circuit_breaker_threshold: int = 5  # 熔断阈值(连续失败次数)
-    circuit_breaker_timeout: int = 60  # 熔断恢复时间(秒)
+    circuit_breaker_threshold: int = 5  # 熔断阈值(窗口内最少失败次数)
+    circuit_breaker_timeout: int = 60  # 熔断后进入半开状态的时间(秒)
+    circuit_breaker_error_rate: float = 0.5  # 熔断阈值(窗口内错误率)
+    circuit_breaker_window: int = 30  # 错误率统计窗口(秒)
+    circuit_breaker_half_open_requests: int = 3  # 半开状态的探测请求数
 
     # 指标配置
     enable_metrics: bool = True
-    metrics_window_size: int = 1000  # 指标窗口大小
+    metrics_windows: Tuple[int, ...] = (60, 300)  # 延迟分位数的滑动窗口(秒)
+    metrics_slice_seconds: float = 10.0  # 滑动窗口的时间片长度(秒)
+    metrics_max_routes: int = 64  # 单独统计延迟的最大路由数
 
 
 # ==================== 指标收集 ====================
 
-@dataclass
 class ProxyMetrics:
-    """转发服务指标"""
-    total_requests: int = 0
-    successful_requests: int = 0
-    failed_requests: int = 0
-    timeout_requests: int = 0
-    active_requests: int = 0
-    queue_rejected: int = 0
-
-    # 响应时间统计
-    response_times: deque = field(default_factory=lambda: deque(maxlen=1000))
-    recent_errors: deque = field(default_factory=lambda: deque(maxlen=100))
-
-    # 熔断器状态
-    consecutive_failures: int = 0
-    circuit_open_since: Optional[float] = None
-
-    def record_request(self, duration: float, success: bool, is_timeout: bool = False):
-        """记录请求结果"""
-        self.total_requests += 1
-        self.response_times.append(duration)
+    """
+    转发服务指标（多线程安全）
+
+    计数使用分片计数器；延迟按路由前缀和状态码分类记录在滑动窗口直方图中，
+    输出各窗口的 p50/p90/p99/p999。
+    """
+
+    def __init__(self, config: Optional[ProxyConfig] = None):
+        self.total_requests = ShardedCounter()
+        self.successful_requests = ShardedCounter()
+        self.failed_requests = ShardedCounter()
+        self.timeout_requests = ShardedCounter()
+        self.active_requests = ShardedCounter()
+        self.queue_rejected = ShardedCounter()
+
+        if config is not None:
+            self.latency = LatencyTracker(
+                config.metrics_windows, config.metrics_slice_seconds, config.metrics_max_routes
+            )
+        else:
+            self.latency = LatencyTracker()
+        # 准入排队时间（只统计被准入的请求）
+        self.queue_wait = WindowedHistogram(
+            self.latency.slice_seconds, max(1, int(max(self.latency.windows) / self.latency.slice_seconds))
+        )
+
+        # deque.append 是线程安全的
+        self.recent_errors: deque = deque(maxlen=100)
+
+    def record_request(self, duration: float, success: bool, is_timeout: bool = False,
+                       path: str = '/', status_code: int = 0):
+        """
+        记录请求结果
+
+        Args:
+            duration: 耗时（秒）
+            success: 是否成功
+            is_timeout: 是否超时
+            path: 请求路径（归并为路由前缀）
+            status_code: 返回给客户端的状态码
+        """
+        self.total_requests.add()
+        self.latency.record(route_key(path), status_code, duration)
 
         if success:
-            self.successful_requests += 1
-            self.consecutive_failures = 0
+            self.successful_requests.add()
         else:
-            self.failed_requests += 1
-            self.consecutive_failures += 1
+            self.failed_requests.add()
             self.recent_errors.append({
                 'time': datetime.now().isoformat(),
+                'path': path,
+                'status_code': status_code,
                 'duration': duration
             })
 
         if is_timeout:
-            self.timeout_requests += 1
-
-    def is_circuit_open(self, config: ProxyConfig) -> bool:
-        """检查熔断器是否打开"""
-        if self.consecutive_failures >= config.circuit_breaker_threshold:
-            if self.circuit_open_since is None:
-                self.circuit_open_since = time.time()
-                return True
-
-            # 检查是否应该恢复
-            if time.time() - self.circuit_open_since > config.circuit_breaker_timeout:
-                self.consecutive_failures = 0
-                self.circuit_open_since = None
-                return False
-            return True
-
-        self.circuit_open_since = None
-        return False
+            self.timeout_requests.add()
 
     def get_stats(self) -> dict:
         """获取统计信息"""
-        avg_response_time = (
-            sum(self.response_times) / len(self.response_times)
-            if self.response_times else 0
-        )
+        total = self.total_requests.value
+        successful = self.successful_requests.value
+        latency = self.latency.get_stats()
+        # 平均响应时间取最短窗口内的平均值
+        shortest = next(iter(latency['overall'].values()), {})
 
         return {
-            'total_requests': self.total_requests,
-            'successful_requests': self.successful_requests,
-            'failed_requests': self.failed_requests,
-            'timeout_requests': self.timeout_requests,
-            'active_requests': self.active_requests,
-            'queue_rejected': self.queue_rejected,
-            'success_rate': (
-                self.successful_requests / self.total_requests * 100
-                if self.total_requests > 0 else 0
-            ),
-            'avg_response_time': avg_response_time,
-            'circuit_open': self.circuit_open_since is not None,
-            'consecutive_failures': self.consecutive_failures
+            'total_requests': total,
+            'successful_requests': successful,
+            'failed_requests': self.failed_requests.value,
+            'timeout_requests': self.timeout_requests.value,
+            'active_requests': self.active_requests.value,
+            'queue_rejected': self.queue_rejected.value,
+            'success_rate': successful / total * 100 if total > 0 else 0,
+            'avg_response_time': shortest.get('mean', 0.0),
+            'latency': latency['overall'],
+            'routes': latency['routes'],
+            'queue_wait': {
+                LatencyTracker.window_name(window): self.queue_wait.snapshot(window).summary()
+                for window in self.latency.windows
+            }
         }
 
 
 # ==================== 请求工作池 ====================
 
 class RequestWorkerPool:
-    """请求处理工作池"""
+    """
+    请求处理工作池
+
+    每个客户端连接由服务器的线程处理，转发前必须通过准入控制：
+    同时转发的请求数不超过当前并发限制（自适应时在 min_concurrent_requests 和
+    max_concurrent_requests 之间调整），其余请求最多排队 max_queue_size 个、最长 queue_timeout 秒。
+    """
 
     def __init__(self, config: ProxyConfig):
         self.config = config
-        self.metrics = ProxyMetrics()
-        self.semaphore = threading.Semaphore(config.max_concurrent_requests)
-        self.request_queue = queue.Queue(maxsize=config.max_queue_size)
+        self.metrics = ProxyMetrics(config)
+        self.admission = AdmissionController(
+            config.max_concurrent_requests, config.max_queue_size, config.queue_timeout
+        )
+        # 自适应并发限制：按目标服务器响应时间调整准入上限
+        self.limiter = None
+        if config.adaptive_concurrency:
+            self.limiter = AdaptiveLimiter(
+                initial_limit=config.initial_concurrent_requests,
+                min_limit=config.min_concurrent_requests,
+                max_limit=config.max_concurrent_requests,
+                on_change=self.admission.set_limit
+            )
+            self.admission.set_limit(self.limiter.limit)
+        self.breakers = BreakerRegistry(
+            failure_threshold=config.circuit_breaker_threshold,
+            error_rate=config.circuit_breaker_error_rate,
+            window=config.circuit_breaker_window,
+            open_timeout=config.circuit_breaker_timeout,
+            half_open_requests=config.circuit_breaker_half_open_requests,
+            max_breakers=config.metrics_max_routes
+        )
+
+        self.retry_policy = RetryPolicy(
+            max_retries=config.max_retries,
+            backoff_factor=config.retry_backoff_factor,
+            budget=RetryBudget(ratio=config.retry_budget_ratio),
+            hedge_percentile=config.hedge_percentile,
+            hedge_min_samples=config.hedge_min_samples
+        )
+        # 对冲时原请求和备份请求在这里并行等待响应头
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=2 * config.max_concurrent_requests, thread_name_prefix="hedge"
+        )
 
         # HTTP会话池
         self.session = None
+        self.connection_pool = None
+        # 并发数会自动增长到 max_concurrent_requests，连接池不能比它小
+        self.pool_maxsize = max(config.pool_maxsize, config.max_concurrent_requests)
         if HAS_REQUESTS:
             self._init_session()
-
-        # 启动工作线程
-        self.workers = []
-        for i in range(config.max_concurrent_requests):
-            worker = threading.Thread(target=self._worker_loop, daemon=True)
-            worker.start()
-            self.workers.append(worker)
+        else:
+            self.connection_pool = UpstreamConnectionPool(
+                config.target_host, config.target_port,
+                max_idle=self.pool_maxsize,
+                timeout=config.connect_timeout + config.read_timeout
+            )
 
     def _init_session(self):
         """初始化requests会话"""
         session = requests.Session()
 
-        # 配置重试策略
-        retry_strategy = Retry(
-            total=self.config.max_retries,
-            backoff_factor=self.config.retry_backoff_factor,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "OPTIONS", "POST", "PUT", "DELETE"]
-        )
-
-        # 配置连接池适配器
+        # 配置连接池适配器（不在适配器中重试，重试由 RetryPolicy 按幂等性决定）
         adapter = HTTPAdapter(
-            max_retries=retry_strategy,
+            max_retries=0,
             pool_connections=self.config.pool_connections,
-            pool_maxsize=self.config.pool_maxsize
+            pool_maxsize=self.pool_maxsize
         )
 
         session.mount("http://", adapter)
@@ -201,61 +265,98 @@ class RequestWorkerPool:
 
         self.session = session
 
-    def _worker_loop(self):
-        """工作线程循环"""
-        while True:
-            try:
-                # 等待获取信号量（控制并发）
-                self.semaphore.acquire()
-
-                # 从队列获取任务
-                task = self.request_queue.get()
-
-                if task is None:  # 哨兵值，退出信号
-                    self.semaphore.release()
-                    break
-
-                # 执行请求
-                callback, args = task
-                try:
-                    callback(*args)
-                except Exception as e:
-                    print(f"Worker error: {e}", file=sys.stderr)
-                    traceback.print_exc()
-
-                self.request_queue.task_done()
-                self.semaphore.release()
+    def admit(self) -> float:
+        """
+        申请转发槽位
 
-            except Exception as e:
-                print(f"Worker loop error: {e}", file=sys.stderr)
-                if self.semaphore._value < self.config.max_concurrent_requests:
-                    self.semaphore.release()
+        Returns:
+            排队等待的秒数
 
-    def submit_request(self, callback, args: tuple) -> bool:
-        """提交请求到工作池"""
+        Raises:
+            AdmissionRejected: 队列已满或排队超时
+        """
         try:
-            # 非阻塞尝试放入队列
-            self.request_queue.put_nowait((callback, args))
-            return True
-        except queue.Full:
-            self.metrics.queue_rejected += 1
-            return False
+            waited = self.admission.acquire()
+        except AdmissionRejected:
+            self.metrics.queue_rejected.add()
+            raise
+        self.metrics.queue_wait.record(waited)
+        return waited
+
+    def release(self, service_time: float):
+        """归还转发槽位"""
+        self.admission.release(service_time)
+
+    def record_upstream(self, path: str, rtt: float, dropped: bool):
+        """
+        记录一次到目标服务器的请求（用于自适应并发限制）
+
+        Args:
+            path: 请求路径
+            rtt: 响应头到达时间（秒）
+            dropped: 超时、连接失败或 502/503/504
+        """
+        if self.limiter is not None:
+            self.limiter.on_sample(route_key(path), rtt, self.admission.in_flight, dropped)
 
     def get_stats(self) -> dict:
         """获取统计信息"""
+        admission = self.admission.get_stats()
+        breakers = self.breakers.get_stats()
         return {
+            'concurrency_limit': (
+                self.limiter.get_stats() if self.limiter is not None
+                else {'limit': admission['limit'], 'adaptive': False}
+            ),
+            'retries': self.retry_policy.get_stats(),
             **self.metrics.get_stats(),
-            'queue_size': self.request_queue.qsize(),
-            'active_workers': sum(1 for w in self.workers if w.is_alive()),
-            'available_slots': self.semaphore._value
+            'queue_size': admission['queue_size'],
+            'available_slots': max(0, admission['limit'] - admission['in_flight']),
+            'admission': admission,
+            'circuit_open': bool(breakers['tripped']),
+            'circuit_breakers': breakers
         }
 
 
 # ==================== 增强版处理器 ====================
 
+class ProxyError(Exception):
+    """转发失败（还没有向客户端发送响应）"""
+
+    def __init__(self, status_code: int, message: str, is_timeout: bool = False,
+                 connect_failed: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.is_timeout = is_timeout
+        # 连接没有建立，请求确定没有到达目标服务器（非幂等请求也可以重试）
+        self.connect_failed = connect_failed
+
+
+@dataclass
+class UpstreamResponse:
+    """目标服务器的响应（响应体尚未读取）"""
+    status_code: int
+    headers: List[Tuple[str, str]]
+    chunks: Iterator[bytes]
+    length: Optional[int]
+    finish: Callable[[bool], None]  # 参数为响应体是否已完整读取
+
+
+def _discard_upstream(future):
+    """对冲中落后的请求返回后关闭连接"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().finish(False)
+
+
 class EnhancedProxyHTTPRequestHandler(BaseHTTPRequestHandler):
     """增强版HTTP请求转发处理器"""
 
+    # 支持客户端keep-alive（响应带有Content-Length或使用chunked编码）
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分开写入，关闭Nagle算法，避免与客户端的延迟ACK叠加出约40ms的等待
+    disable_nagle_algorithm = True
+
     # 类变量（由服务器启动时设置）
     config: ProxyConfig = None
     worker_pool: RequestWorkerPool = None
@@ -264,186 +365,290 @@ class EnhancedProxyHTTPRequestHandler(BaseHTTPRequestHandler):
         """自定义日志格式"""
         sys.stderr.write(f"[Proxy] {self.log_date_time_string()} - {format % args}\n")
 
-    def _send_error_response(self, status_code: int, message: str):
+    def _send_error_response(self, status_code: int, message: str, headers: Optional[dict] = None):
         """发送错误响应"""
+        body = message.encode('utf-8')
         self.send_response(status_code)
         self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
         self.end_headers()
-        self.wfile.write(message.encode('utf-8'))
+        self.wfile.write(body)
 
-    def _forward_request_sync(self) -> Tuple[bytes, int, dict]:
-        """
-        同步转发请求到目标服务器（使用urllib）
+    def _target_path(self) -> str:
+        """请求的路径和查询参数"""
+        parsed_path = urlparse(self.path)
+        path = parsed_path.path or '/'
+        if parsed_path.query:
+            path = f"{path}?{parsed_path.query}"
+        return path
 
-        Returns:
-            (response_body, status_code, response_headers)
+    def _open_upstream_sync(self, path: str, body: RequestBody) -> UpstreamResponse:
         """
-        import urllib.request
+        发送请求到目标服务器（使用连接池中的http.client连接）
 
+        Raises:
+            ProxyError: 连接失败或超时
+        """
+        pool = self.worker_pool.connection_pool
+        headers = upstream_headers(self.headers, self.config.target_host, self.config.target_port, body)
         try:
-            # 解析请求URL
-            parsed_path = urlparse(self.path)
-            path = parsed_path.path
-            query = parsed_path.query
-
-            # 构建目标URL
-            if query:
-                target_url = f"http://{self.config.target_host}:{self.config.target_port}{path}?{query}"
-            else:
-                target_url = f"http://{self.config.target_host}:{self.config.target_port}{path}"
-
-            # 获取请求体
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length) if content_length > 0 else None
-
-            # 创建请求
-            req = urllib.request.Request(target_url, data=request_body, method=self.command)
-
-            # 复制请求头
-            skip_headers = {'host', 'connection', 'accept-encoding', 'content-length'}
-            for header, value in self.headers.items():
-                if header.lower() not in skip_headers:
-                    req.add_header(header, value)
-
-            # 设置超时
-            timeout = self.config.connect_timeout + self.config.read_timeout
-
-            # 执行请求
-            start_time = time.time()
-            with urllib.request.urlopen(req, timeout=timeout) as response:
-                response_body = response.read()
-                status_code = response.status
-
-                # 收集响应头
-                response_headers = {}
-                skip_response_headers = {'connection', 'transfer-encoding', 'content-encoding'}
-                for header, value in response.headers.items():
-                    if header.lower() not in skip_response_headers:
-                        response_headers[header] = value
-
-                duration = time.time() - start_time
-                return response_body, status_code, response_headers, duration, True, False
-
-        except urllib.error.HTTPError as e:
-            error_body = e.read() if e.fp else b''
-            return error_body, e.code, {}, 0, False, False
-
-        except urllib.error.URLError as e:
-            error_msg = f"Proxy Error: Cannot connect to target {self.config.target_host}:{self.config.target_port}\nReason: {e.reason}"
-            return error_msg.encode('utf-8'), 502, {'Content-Type': 'text/plain'}, 0, False, False
-
+            # 失效连接的重试也由 RetryPolicy 决定（幂等判断和重试预算），连接池本身不重试
+            conn, response = pool.request(self.command, path, body, headers, retry_stale=False)
         except socket.timeout:
-            error_msg = "Proxy Error: Target server timeout"
-            return error_msg.encode('utf-8'), 504, {'Content-Type': 'text/plain'}, 0, False, True
-
-        except Exception as e:
-            error_msg = f"Proxy Error: {str(e)}"
-            return error_msg.encode('utf-8'), 500, {'Content-Type': 'text/plain'}, 0, False, True
+            raise ProxyError(504, "Proxy Error: Target server timeout", is_timeout=True)
+        except (OSError, HTTPException) as e:
+            raise ProxyError(
+                502,
+                f"Proxy Error: Cannot connect to target {self.config.target_host}:{self.config.target_port}\nReason: {e}",
+                connect_failed=isinstance(e, (ConnectionRefusedError, socket.gaierror))
+            )
 
-    def _forward_request_async(self) -> Tuple[bytes, int, dict]:
-        """
-        异步转发请求到目标服务器（使用requests）
+        return UpstreamResponse(
+            status_code=response.status,
+            headers=response_headers(response.getheaders()),
+            chunks=iter_response(response),
+            length=declared_length(response),
+            finish=lambda completed: pool.finish(conn, response, completed)
+        )
 
-        Returns:
-            (response_body, status_code, response_headers)
+    def _open_upstream_async(self, path: str, body: RequestBody) -> UpstreamResponse:
         """
-        try:
-            # 解析请求URL
-            parsed_path = urlparse(self.path)
-            path = parsed_path.path
-            query = parsed_path.query
-
-            # 构建目标URL
-            if query:
-                target_url = f"http://{self.config.target_host}:{self.config.target_port}{path}?{query}"
-            else:
-                target_url = f"http://{self.config.target_host}:{self.config.target_port}{path}"
+        发送请求到目标服务器（使用requests，stream=True只读取响应头）
 
-            # 获取请求体
-            content_length = int(self.headers.get('Content-Length', 0))
-            request_body = self.rfile.read(content_length) if content_length > 0 else None
+        响应体按原始字节转发（不解压），Content-Encoding 原样保留。
 
-            # 构建请求头
-            headers = {}
-            skip_headers = {'host', 'connection', 'accept-encoding', 'content-length'}
-            for header, value in self.headers.items():
-                if header.lower() not in skip_headers:
-                    headers[header] = value
+        Raises:
+            ProxyError: 连接失败或超时
+        """
+        target_url = f"http://{self.config.target_host}:{self.config.target_port}{path}"
+        headers = upstream_headers(self.headers, self.config.target_host, self.config.target_port, body)
+        headers.pop('Host', None)
 
-            # 执行请求
-            start_time = time.time()
+        try:
             response = self.worker_pool.session.request(
                 method=self.command,
                 url=target_url,
                 headers=headers,
-                data=request_body,
+                data=body,
                 timeout=(self.config.connect_timeout, self.config.read_timeout),
-                allow_redirects=False
+                allow_redirects=False,
+                stream=True
+            )
+        except requests.exceptions.ConnectTimeout:
+            raise ProxyError(504, "Proxy Error: Target server connect timeout", is_timeout=True, connect_failed=True)
+        except requests.exceptions.Timeout:
+            raise ProxyError(504, "Proxy Error: Target server timeout", is_timeout=True)
+        except requests.exceptions.ConnectionError as e:
+            reason = getattr(e.args[0], 'reason', None) if e.args else None
+            raise ProxyError(
+                502,
+                f"Proxy Error: Cannot connect to target {self.config.target_host}:{self.config.target_port}\nReason: {str(e)}",
+                connect_failed=isinstance(reason, NewConnectionError)
             )
-            duration = time.time() - start_time
 
-            # 读取响应体
-            response_body = response.content
+        def finish(completed: bool):
+            if completed:
+                # 响应体已读完，连接放回连接池
+                response.raw.release_conn()
+            else:
+                response.close()
+
+        length = declared_length(response.raw)
+        return UpstreamResponse(
+            status_code=response.status_code,
+            headers=response_headers(response.raw.headers.items()),
+            chunks=response.raw.stream(CHUNK_SIZE, decode_content=False),
+            length=length,
+            finish=finish
+        )
 
-            # 收集响应头
-            response_headers = {}
-            skip_response_headers = {'connection', 'transfer-encoding', 'content-encoding'}
-            for header, value in response.headers.items():
-                if header.lower() not in skip_response_headers:
-                    response_headers[header] = value
+    def _open_upstream(self, path: str, body: RequestBody) -> UpstreamResponse:
+        """发送请求到目标服务器（根据可用库选择），并记录响应头到达时间"""
+        start_time = time.time()
+        try:
+            if HAS_REQUESTS and self.worker_pool.session:
+                upstream = self._open_upstream_async(path, body)
+            else:
+                upstream = self._open_upstream_sync(path, body)
+        except ProxyError:
+            self.worker_pool.record_upstream(path, time.time() - start_time, dropped=True)
+            raise
+        rtt = time.time() - start_time
+        self.worker_pool.retry_policy.record_headers(route_key(path), upstream.status_code, rtt)
+        self.worker_pool.record_upstream(path, rtt, dropped=upstream.status_code in RETRY_STATUSES)
+        return upstream
+
+    def _open_upstream_hedged(self, path: str, body: RequestBody, delay: float) -> UpstreamResponse:
+        """
+        对冲发送：原请求 delay 秒内没有返回响应头时再发一个备份请求，先返回的胜出，
+        落后的一个在返回后直接关闭连接
+        """
+        policy = self.worker_pool.retry_policy
+        executor = self.worker_pool.hedge_executor
+        primary = executor.submit(self._open_upstream, path, body)
+        done, _ = wait([primary], timeout=delay)
+        if done or not policy.start_hedge():
+            return primary.result()
+
+        backup = executor.submit(self._open_upstream, path, body)
+        pending = {primary, backup}
+        winner = error = None
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    upstream = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if winner is None:
+                    winner = upstream
+                    if future is backup:
+                        policy.record_hedge_win()
+                else:
+                    upstream.finish(False)
+
+        for future in pending:
+            future.add_done_callback(_discard_upstream)
+        if winner is None:
+            raise error
+        return winner
+
+    def _call_upstream(self, path: str, body: RequestBody, allow_hedge: bool) -> UpstreamResponse:
+        """
+        按重试和对冲策略发送请求
 
-            return response_body, response.status_code, response_headers, duration, True, False
+        Args:
+            allow_hedge: 是否允许对冲（熔断器半开时的探测请求不对冲）
 
-        except requests.exceptions.Timeout:
-            error_msg = "Proxy Error: Target server timeout"
-            return error_msg.encode('utf-8'), 504, {'Content-Type': 'text/plain'}, 0, False, True
+        Raises:
+            ProxyError: 重试后仍然失败
+        """
+        policy = self.worker_pool.retry_policy
+        policy.budget.deposit()
+        idempotent = policy.is_idempotent(self.command, self.headers)
+        # 流式转发的请求体只能发送一次
+        replayable = is_replayable(body)
+        hedge_delay = policy.hedge_delay(route_key(path)) if allow_hedge and idempotent and replayable else None
+
+        attempt = 0
+        while True:
+            try:
+                if hedge_delay is not None:
+                    upstream = self._open_upstream_hedged(path, body, hedge_delay)
+                else:
+                    upstream = self._open_upstream(path, body)
+            except ProxyError as e:
+                if not (replayable and policy.can_retry_error(attempt, idempotent, e.connect_failed)):
+                    raise
+            else:
+                if not (replayable and policy.can_retry_status(attempt, idempotent, upstream.status_code)):
+                    return upstream
+                upstream.finish(False)
 
-        except requests.exceptions.ConnectionError as e:
-            error_msg = f"Proxy Error: Cannot connect to target {self.config.target_host}:{self.config.target_port}\nReason: {str(e)}"
-            return error_msg.encode('utf-8'), 502, {'Content-Type': 'text/plain'}, 0, False, False
-
-        except Exception as e:
-            error_msg = f"Proxy Error: {str(e)}"
-            return error_msg.encode('utf-8'), 500, {'Content-Type': 'text/plain'}, 0, False, True
-
-    def _forward_request(self) -> Tuple[bytes, int, dict]:
-        """转发请求到目标服务器（根据可用库选择）"""
-        # 检查熔断器
-        if self.worker_pool.metrics.is_circuit_open(self.config):
-            error_msg = "Proxy Error: Circuit breaker is open, target server is unreachable"
-            return error_msg.encode('utf-8'), 503, {'Content-Type': 'text/plain'}
-
-        # 选择请求方法
-        if HAS_REQUESTS and self.worker_pool.session:
-            return self._forward_request_async()
-        else:
-            return self._forward_request_sync()
+            attempt += 1
+            time.sleep(policy.backoff(attempt))
 
     def _handle_request(self):
         """处理请求（统一入口）"""
-        self.worker_pool.metrics.active_requests += 1
+        path = self._target_path()
+
+        # 熔断器（按目标服务器和路由前缀）：打开时直接拒绝，不占用排队名额
+        upstream_name = f"{self.config.target_host}:{self.config.target_port}"
+        breaker = self.worker_pool.breakers.get(upstream_name, path)
+        permit = breaker.acquire()
+        if permit is None:
+            self.close_connection = True
+            self._send_error_response(
+                503, f"Proxy Error: Circuit breaker for {breaker.name} is open, please retry later",
+                {'Retry-After': str(breaker.retry_after())}
+            )
+            return
+
+        # 准入控制：排队已满或排队超时时快速拒绝（请求体未读取，关闭连接）
+        try:
+            self.worker_pool.admit()
+        except AdmissionRejected as e:
+            breaker.cancel(permit)
+            self.close_connection = True
+            self._send_error_response(e.status_code, e.message, {'Retry-After': str(e.retry_after)})
+            return
 
         start_time = time.time()
-        response_body, status_code, response_headers = self._forward_request()
+        upstream_ok = None
+        try:
+            upstream_ok = self._forward(path, start_time, permit)
+        finally:
+            self.worker_pool.release(time.time() - start_time)
+            if upstream_ok is None:
+                breaker.cancel(permit)
+            else:
+                breaker.record(permit, upstream_ok)
 
-        # 如果返回了5个值（包含duration和success），则更新指标
-        if len(response_body) == 6:
-            response_body, status_code, response_headers, duration, success, is_timeout = response_body
-        else:
-            duration = time.time() - start_time
-            success = 200 <= status_code < 500
-            is_timeout = status_code == 504
+    def _forward(self, path: str, start_time: float, permit: str) -> Optional[bool]:
+        """
+        读取请求体并转发（已通过熔断器和准入控制）
 
-        # 记录指标
-        self.worker_pool.metrics.record_request(duration, success, is_timeout)
-        self.worker_pool.metrics.active_requests -= 1
+        Returns:
+            目标服务器是否正常（连接失败、超时、5xx 为False），没有发送到目标服务器时返回None
+        """
+        metrics = self.worker_pool.metrics
+        try:
+            body = read_request_body(self.rfile, self.headers)
+        except ValueError as e:
+            self.close_connection = True
+            self._send_error_response(400, f"Proxy Error: {e}")
+            return None
+
+        metrics.active_requests.add(1)
+        success = is_timeout = False
+        status_code = 500
+        try:
+            try:
+                upstream = self._call_upstream(path, body, allow_hedge=permit == STATE_CLOSED)
+            except ProxyError as e:
+                # 请求体可能没有读完，不能继续复用客户端连接
+                self.close_connection = True
+                is_timeout = e.is_timeout
+                status_code = e.status_code
+                self._send_error_response(e.status_code, e.message)
+                return False
+            except (socket.timeout, TimeoutError):
+                self.close_connection = True
+                is_timeout = True
+                status_code = 504
+                self._send_error_response(504, "Proxy Error: Target server timeout")
+                return False
+            except Exception as e:
+                # 其他错误只计为失败，不计入超时
+                self.close_connection = True
+                self._send_error_response(500, f"Proxy Error: {str(e)}")
+                return False
 
-        # 发送响应
-        self.send_response(status_code)
-        for header, value in response_headers.items():
-            self.send_header(header, value)
-        self.end_headers()
-        self.wfile.write(response_body)
+            status_code = upstream.status_code
+            upstream_ok = upstream.status_code < 500
+            completed = False
+            try:
+                relay_response(self, upstream.status_code, upstream.headers, upstream.chunks, upstream.length)
+                completed = True
+                success = upstream_ok
+            except (socket.timeout, TimeoutError):
+                is_timeout = True
+                upstream_ok = False
+                self.close_connection = True
+            except Exception as e:
+                # 响应头已经发出，只能断开客户端连接（多为客户端断开，不计入熔断）
+                self.close_connection = True
+                self.log_message("Relay aborted: %s", e)
+            finally:
+                upstream.finish(completed)
+            return upstream_ok
+        finally:
+            # 记录指标（耗时包含响应体转发）
+            metrics.record_request(time.time() - start_time, success, is_timeout, path, status_code)
+            metrics.active_requests.add(-1)
 
     def do_GET(self):
         """处理GET请求"""
@@ -467,6 +672,7 @@ class EnhancedProxyHTTPRequestHandler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', '*')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
 
@@ -482,13 +688,13 @@ class MetricsProxyHTTPRequestHandler(EnhancedProxyHTTPRequestHandler):
             stats = self.worker_pool.get_stats()
 
             import json
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
 
             health_status = "healthy" if stats['success_rate'] > 80 else "degraded"
-            if stats['circuit_open']:
-                health_status = "unhealthy"
+            breakers = stats['circuit_breakers']
+            if breakers['tripped']:
+                # 部分路由熔断为降级，所有路由都熔断为不可用
+                all_tripped = len(breakers['tripped']) == len(breakers['breakers'])
+                health_status = "unhealthy" if all_tripped else "degraded"
 
             metrics_response = {
                 'status': health_status,
@@ -496,14 +702,22 @@ class MetricsProxyHTTPRequestHandler(EnhancedProxyHTTPRequestHandler):
                 'config': {
                     'target': f"{self.config.target_host}:{self.config.target_port}",
                     'max_concurrent_requests': self.config.max_concurrent_requests,
+                    'adaptive_concurrency': self.config.adaptive_concurrency,
+                    'min_concurrent_requests': self.config.min_concurrent_requests,
                     'max_queue_size': self.config.max_queue_size,
+                    'queue_timeout': self.config.queue_timeout,
                     'connect_timeout': self.config.connect_timeout,
                     'read_timeout': self.config.read_timeout
                 },
                 'metrics': stats
             }
 
-            self.wfile.write(json.dumps(metrics_response, indent=2).encode('utf-8'))
+            body = json.dumps(metrics_response, indent=2).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
         else:
             super().do_GET()
 
@@ -526,7 +740,7 @@ def run_proxy_server(config: ProxyConfig):
 
     # 创建服务器
     server_address = (config.listen_host, config.listen_port)
-    httpd = HTTPServer(server_address, MetricsProxyHTTPRequestHandler)
+    httpd = ProxyHTTPServer(server_address, MetricsProxyHTTPRequestHandler)
 
     print("=" * 70)
     print("增强版HTTP转发服务已启动")
@@ -534,13 +748,19 @@ def run_proxy_server(config: ProxyConfig):
     print(f"监听地址: {config.listen_host}:{config.listen_port}")
     print(f"目标地址: {config.target_host}:{config.target_port}")
     print(f"\n并发控制配置:")
-    print(f"  最大并发请求数: {config.max_concurrent_requests}")
+    if config.adaptive_concurrency:
+        print(f"  并发请求数: 自适应 {config.min_concurrent_requests}-{config.max_concurrent_requests}"
+              f"（初始 {config.initial_concurrent_requests}）")
+    else:
+        print(f"  最大并发请求数: {config.max_concurrent_requests}")
     print(f"  请求队列大小: {config.max_queue_size}")
+    print(f"  最长排队时间: {config.queue_timeout}秒")
     print(f"  连接超时: {config.connect_timeout}秒")
     print(f"  读取超时: {config.read_timeout}秒")
     print(f"  连接池大小: {config.pool_connections}")
     print(f"  失败重试次数: {config.max_retries}")
-    print(f"  熔断阈值: {config.circuit_breaker_threshold}次连续失败")
+    print(f"  熔断阈值: {config.circuit_breaker_window}秒内至少{config.circuit_breaker_threshold}次失败"
+          f"且错误率达到{config.circuit_breaker_error_rate:.0%}（按路由）")
     print(f"\n监控端点:")
     print(f"  http://{config.listen_host}:{config.listen_port}/proxy-metrics")
     print(f"  http://{config.listen_host}:{config.listen_port}/proxy-health")
@@ -614,7 +834,28 @@ def main():
         '--max-concurrent-requests',
         type=int,
         default=50,
-        help='最大并发请求数（默认: 50）'
+        help='最大并发请求数，开启自适应并发时为上限（默认: 50）'
+    )
+
+    parser.add_argument(
+        '--no-adaptive-concurrency',
+        dest='adaptive_concurrency',
+        action='store_false',
+        help='关闭自适应并发，固定使用 --max-concurrent-requests'
+    )
+
+    parser.add_argument(
+        '--min-concurrent-requests',
+        type=int,
+        default=2,
+        help='自适应并发数的下限（默认: 2）'
+    )
+
+    parser.add_argument(
+        '--initial-concurrent-requests',
+        type=int,
+        default=10,
+        help='自适应并发数的初始值（默认: 10）'
     )
 
     parser.add_argument(
@@ -624,6 +865,13 @@ def main():
         help='请求队列最大长度（默认: 100）'
     )
 
+    parser.add_argument(
+        '--queue-timeout',
+        type=float,
+        default=10.0,
+        help='最长排队时间，秒，超时返回503（默认: 10）'
+    )
+
     # 超时配置
     parser.add_argument(
         '--connect-timeout',
@@ -659,7 +907,7 @@ def main():
         '--max-retries',
         type=int,
         default=2,
-        help='失败重试次数（默认: 2）'
+        help='失败重试次数，非幂等请求只在连接失败时重试（默认: 2）'
     )
 
     parser.add_argument(
@@ -669,19 +917,54 @@ def main():
         help='重试退避因子（默认: 0.5）'
     )
 
+    parser.add_argument(
+        '--retry-budget-ratio',
+        type=float,
+        default=0.1,
+        help='重试和对冲产生的额外请求占比上限（默认: 0.1）'
+    )
+
+    parser.add_argument(
+        '--hedge-percentile',
+        type=float,
+        default=0.95,
+        help='幂等请求等待响应头超过该路由此分位数延迟时发出对冲请求，0表示不对冲（默认: 0.95）'
+    )
+
     # 熔断配置
     parser.add_argument(
         '--circuit-breaker-threshold',
         type=int,
         default=5,
-        help='熔断阈值-连续失败次数（默认: 5）'
+        help='熔断阈值-统计窗口内最少失败次数（默认: 5）'
     )
 
     parser.add_argument(
         '--circuit-breaker-timeout',
         type=int,
         default=60,
-        help='熔断恢复时间，秒（默认: 60）'
+        help='熔断后进入半开状态的时间，秒（默认: 60）'
+    )
+
+    parser.add_argument(
+        '--circuit-breaker-error-rate',
+        type=float,
+        default=0.5,
+        help='熔断阈值-统计窗口内错误率，0-1（默认: 0.5）'
+    )
+
+    parser.add_argument(
+        '--circuit-breaker-window',
+        type=int,
+        default=30,
+        help='错误率统计窗口，秒（默认: 30）'
+    )
+
+    parser.add_argument(
+        '--circuit-breaker-half-open-requests',
+        type=int,
+        default=3,
+        help='半开状态放行的探测请求数，全部成功后恢复（默认: 3）'
     )
 
     args = parser.parse_args()
@@ -694,14 +977,23 @@ def main():
         listen_port=args.listen_port,
         max_concurrent_requests=args.max_concurrent_requests,
         max_queue_size=args.max_queue_size,
+        adaptive_concurrency=args.adaptive_concurrency,
+        min_concurrent_requests=args.min_concurrent_requests,
+        initial_concurrent_requests=args.initial_concurrent_requests,
+        queue_timeout=args.queue_timeout,
         connect_timeout=args.connect_timeout,
         read_timeout=args.read_timeout,
         pool_connections=args.pool_connections,
         pool_maxsize=args.pool_maxsize,
         max_retries=args.max_retries,
         retry_backoff_factor=args.retry_backoff_factor,
+        retry_budget_ratio=args.retry_budget_ratio,
+        hedge_percentile=args.hedge_percentile,
         circuit_breaker_threshold=args.circuit_breaker_threshold,
-        circuit_breaker_timeout=args.circuit_breaker_timeout
+        circuit_breaker_timeout=args.circuit_breaker_timeout,
+        circuit_breaker_error_rate=args.circuit_breaker_error_rate,
+        circuit_breaker_window=args.circuit_breaker_window,
+        circuit_breaker_half_open_requests=args.circuit_breaker_half_open_requests
     )
 
     # 启动服务器
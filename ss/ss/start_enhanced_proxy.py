@@ -20,14 +20,23 @@ def load_config(config_file: str) -> ProxyConfig:
         listen_port=data['listen']['port'],
         max_concurrent_requests=data['concurrency']['max_concurrent_requests'],
         max_queue_size=data['concurrency']['max_queue_size'],
+        adaptive_concurrency=data['concurrency'].get('adaptive', True),
+        min_concurrent_requests=data['concurrency'].get('min_concurrent_requests', 2),
+        initial_concurrent_requests=data['concurrency'].get('initial_concurrent_requests', 10),
+        queue_timeout=data['concurrency'].get('queue_timeout', 10.0),
         connect_timeout=data['timeout']['connect_timeout'],
         read_timeout=data['timeout']['read_timeout'],
         pool_connections=data['connection_pool']['pool_connections'],
         pool_maxsize=data['connection_pool']['pool_maxsize'],
         max_retries=data['retry']['max_retries'],
         retry_backoff_factor=data['retry']['retry_backoff_factor'],
+        retry_budget_ratio=data['retry'].get('retry_budget_ratio', 0.1),
+        hedge_percentile=data['retry'].get('hedge_percentile', 0.95),
         circuit_breaker_threshold=data['circuit_breaker']['threshold'],
-        circuit_breaker_timeout=data['circuit_breaker']['timeout']
+        circuit_breaker_timeout=data['circuit_breaker']['timeout'],
+        circuit_breaker_error_rate=data['circuit_breaker'].get('error_rate', 0.5),
+        circuit_breaker_window=data['circuit_breaker'].get('window', 30),
+        circuit_breaker_half_open_requests=data['circuit_breaker'].get('half_open_requests', 3)
     )
 
 
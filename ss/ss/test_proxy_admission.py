@@ -0,0 +1,148 @@
+"""
+测试脚本 - 验证准入控制的先到先得交接、队列已满（429）、排队超时（503）和 Retry-After 计算
+"""
+import threading
+import time
+
+from proxy_admission import AdmissionController, AdmissionRejected
+
+
+def wait_queued(admission, size, timeout=2.0):
+    """等待排队请求数达到 size"""
+    deadline = time.monotonic() + timeout
+    while admission.get_stats()['queue_size'] < size:
+        assert time.monotonic() < deadline, "waiter did not queue in time"
+        time.sleep(0.001)
+
+
+def test_fifo_handoff():
+    """释放的槽位按到达顺序交给排队的请求，新请求不能插队"""
+    print("="*60)
+    print("测试 先到先得交接")
+    print("="*60)
+
+    admission = AdmissionController(limit=1, max_queue=10, queue_timeout=5)
+    assert admission.acquire() == 0.0
+    order = []
+    threads = []
+    for i in range(3):
+        thread = threading.Thread(target=lambda i=i: (admission.acquire(), order.append(i)))
+        thread.start()
+        threads.append(thread)
+        wait_queued(admission, i + 1)
+
+    for expected in range(1, 4):
+        admission.release()
+        deadline = time.monotonic() + 2
+        while len(order) < expected:
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        # 槽位直接交接，转发中的请求数不变
+        assert admission.in_flight == 1
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2]
+    stats = admission.get_stats()
+    assert (stats['admitted'], stats['queued'], stats['queue_size']) == (4, 3, 0)
+    admission.release()
+    assert admission.in_flight == 0
+    print("✓ 通过")
+
+
+def test_queue_full():
+    """队列已满时立即返回429，不等待"""
+    print("="*60)
+    print("测试 队列已满")
+    print("="*60)
+
+    admission = AdmissionController(limit=1, max_queue=1, queue_timeout=5)
+    admission.acquire()
+    waiter = threading.Thread(target=admission.acquire)
+    waiter.start()
+    wait_queued(admission, 1)
+
+    start = time.monotonic()
+    try:
+        admission.acquire()
+    except AdmissionRejected as e:
+        assert e.status_code == 429
+        assert e.retry_after >= 1
+    else:
+        raise AssertionError("acquire should be rejected when the queue is full")
+    assert time.monotonic() - start < 0.5
+    assert admission.get_stats()['rejected_full'] == 1
+
+    admission.release()
+    waiter.join()
+    print("✓ 通过")
+
+
+def test_queue_timeout():
+    """排队超过 queue_timeout 返回503，并移出队列"""
+    print("="*60)
+    print("测试 排队超时")
+    print("="*60)
+
+    admission = AdmissionController(limit=1, max_queue=5, queue_timeout=0.05)
+    admission.acquire()
+    start = time.monotonic()
+    try:
+        admission.acquire()
+    except AdmissionRejected as e:
+        assert e.status_code == 503
+    else:
+        raise AssertionError("acquire should time out while the slot is taken")
+    assert time.monotonic() - start >= 0.05
+    stats = admission.get_stats()
+    assert (stats['rejected_timeout'], stats['queue_size'], stats['in_flight']) == (1, 0, 1)
+
+    # 超时的请求不会拿走之后释放的槽位
+    admission.release()
+    assert admission.in_flight == 0
+    assert admission.acquire() == 0.0
+    print("✓ 通过")
+
+
+def test_retry_after():
+    """Retry-After 按排队长度和平均处理时间估算，至少1秒，不超过上限"""
+    print("="*60)
+    print("测试 Retry-After")
+    print("="*60)
+
+    admission = AdmissionController(limit=2, max_queue=0, queue_timeout=1, max_retry_after=10)
+
+    def rejected_retry_after():
+        try:
+            admission.acquire()
+        except AdmissionRejected as e:
+            return e.retry_after
+        raise AssertionError("acquire should be rejected")
+
+    # 没有处理时间样本时为1秒
+    admission.acquire()
+    admission.acquire()
+    assert rejected_retry_after() == 1
+
+    # 平均处理4秒、2个槽位：(0 + 1) * 4 / 2 = 2秒
+    admission.release(4.0)
+    admission.acquire()
+    assert rejected_retry_after() == 2
+
+    # 平滑：4 + 0.2 * (9 - 4) = 5，(0 + 1) * 5 / 2 向上取整为3秒
+    admission.release(9.0)
+    admission.acquire()
+    assert rejected_retry_after() == 3
+
+    # 不超过 max_retry_after
+    admission.release(1000.0)
+    admission.acquire()
+    assert rejected_retry_after() == 10
+    print("✓ 通过")
+
+
+if __name__ == "__main__":
+    test_fifo_handoff()
+    test_queue_full()
+    test_queue_timeout()
+    test_retry_after()
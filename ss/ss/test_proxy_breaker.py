@@ -0,0 +1,83 @@
+"""
+测试脚本 - 验证按路由熔断、错误率阈值和半开探测
+"""
+import time
+
+from proxy_breaker import STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, BreakerRegistry, CircuitBreaker
+
+
+def test_error_rate_threshold():
+    """失败次数和错误率都达到阈值才熔断"""
+    print("="*60)
+    print("测试 错误率阈值")
+    print("="*60)
+
+    breaker = CircuitBreaker("t", failure_threshold=3, error_rate=0.5, window=10)
+    for _ in range(10):
+        breaker.record(breaker.acquire(), True)
+    for _ in range(4):
+        breaker.record(breaker.acquire(), False)
+    # 4/14 < 50%
+    assert breaker.state == STATE_CLOSED
+
+    for _ in range(6):
+        breaker.record(breaker.acquire(), False)
+    assert breaker.state == STATE_OPEN
+    assert breaker.acquire() is None
+    assert breaker.get_stats()['transitions'] == {'closed->open': 1}
+    print("✓ 通过")
+
+
+def test_half_open_probes():
+    """半开状态只放行有限的探测请求，探测成功后关闭，失败后重新打开"""
+    print("="*60)
+    print("测试 半开探测")
+    print("="*60)
+
+    breaker = CircuitBreaker("t", failure_threshold=1, error_rate=0.5, open_timeout=0.05,
+                             half_open_requests=2)
+    breaker.record(breaker.acquire(), False)
+    assert breaker.state == STATE_OPEN
+
+    time.sleep(0.06)
+    first, second = breaker.acquire(), breaker.acquire()
+    assert first == second == STATE_HALF_OPEN
+    assert breaker.acquire() is None
+
+    breaker.record(first, True)
+    breaker.record(second, False)
+    assert breaker.state == STATE_OPEN
+
+    time.sleep(0.06)
+    for _ in range(2):
+        breaker.record(breaker.acquire(), True)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.get_stats()['transitions'] == {
+        'closed->open': 1, 'open->half_open': 2, 'half_open->open': 1, 'half_open->closed': 1
+    }
+    print("✓ 通过")
+
+
+def test_per_route_isolation():
+    """一个路由熔断不影响其他路由"""
+    print("="*60)
+    print("测试 按路由熔断")
+    print("="*60)
+
+    registry = BreakerRegistry(failure_threshold=2)
+    slow = registry.get("c:8000", "/api/function6?x=1")
+    for _ in range(2):
+        slow.record(slow.acquire(), False)
+
+    assert registry.get("c:8000", "/api/function6").acquire() is None
+    assert registry.get("c:8000", "/api/function1").acquire() == STATE_CLOSED
+    stats = registry.get_stats()
+    assert stats['tripped'] == ["c:8000/api/function6"]
+    assert stats['recent_transitions'][0]['to'] == STATE_OPEN
+    print("✓ 通过")
+
+
+if __name__ == "__main__":
+    test_error_rate_threshold()
+    test_half_open_probes()
+    test_per_route_isolation()
@@ -0,0 +1,84 @@
+"""
+测试脚本 - 验证自适应并发限制随响应时间增长和收缩
+"""
+from proxy_admission import AdmissionController
+from proxy_limiter import AdaptiveLimiter
+
+
+def feed(limiter, route, rtt, in_flight, rounds, per_round=5):
+    for _ in range(rounds):
+        for _ in range(per_round):
+            limiter.on_sample(route, rtt, in_flight)
+
+
+def test_grow_and_shrink():
+    """RTT 接近最小值时增长，目标服务器开始排队时收缩"""
+    print("="*60)
+    print("测试 按响应时间调整限制")
+    print("="*60)
+
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, max_limit=50, interval=0)
+    feed(limiter, "/api/function1", 0.01, in_flight=10, rounds=20)
+    grown = limiter.limit
+    assert grown > 10
+
+    # 响应时间变为10倍：排队了
+    feed(limiter, "/api/function1", 0.1, in_flight=grown, rounds=20)
+    assert limiter.limit < grown
+    assert limiter.history[-1]['reason'] == "gradient"
+    print("✓ 通过")
+
+
+def test_idle_and_drops():
+    """流量不足时不增长；超时和 5xx 乘性减小，不低于下限"""
+    print("="*60)
+    print("测试 低流量和丢弃")
+    print("="*60)
+
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, max_limit=50, interval=0)
+    feed(limiter, "/health", 0.001, in_flight=1, rounds=20)
+    assert limiter.limit == 10
+
+    for _ in range(30):
+        limiter.on_sample("/health", 0.0, in_flight=10, dropped=True)
+    assert limiter.limit == 2
+    assert limiter.get_stats()['history'][-1]['reason'] == "drop"
+    print("✓ 通过")
+
+
+def test_routes_compared_to_own_min_rtt():
+    """慢路由和自己的最小RTT比较，不会把限制压低"""
+    print("="*60)
+    print("测试 按路由统计最小RTT")
+    print("="*60)
+
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, max_limit=50, interval=0)
+    for _ in range(20):
+        feed(limiter, "/health", 0.001, in_flight=10, rounds=1, per_round=3)
+        feed(limiter, "/api/function6", 2.0, in_flight=10, rounds=1, per_round=2)
+    assert limiter.limit > 10
+    assert limiter.get_stats()['min_rtt'] == {'/health': 0.001, '/api/function6': 2.0}
+    print("✓ 通过")
+
+
+def test_admission_follows_limit():
+    """限制提高时排队的请求立即获得槽位"""
+    print("="*60)
+    print("测试 准入上限跟随调整")
+    print("="*60)
+
+    admission = AdmissionController(limit=1, max_queue=5, queue_timeout=0.01)
+    admission.acquire()
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_limit=5, interval=0,
+                              on_change=admission.set_limit)
+    feed(limiter, "/", 0.01, in_flight=1, rounds=10)
+    assert admission.limit == limiter.limit > 1
+    assert admission.acquire() == 0.0
+    print("✓ 通过")
+
+
+if __name__ == "__main__":
+    test_grow_and_shrink()
+    test_idle_and_drops()
+    test_routes_compared_to_own_min_rtt()
+    test_admission_follows_limit()
@@ -0,0 +1,102 @@
+"""
+测试脚本 - 验证转发服务指标的分片计数、延迟直方图分位数和滑动窗口
+"""
+import random
+import threading
+
+from proxy_metrics import (
+    LatencyHistogram, LatencyTracker, ShardedCounter, WindowedHistogram, route_key
+)
+
+
+def test_sharded_counter_threads():
+    """多线程并发累加不丢失计数"""
+    print("="*60)
+    print("测试 分片计数器")
+    print("="*60)
+
+    counter = ShardedCounter(shards=4)
+
+    def work():
+        for _ in range(10000):
+            counter.add()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.value == 80000
+    print("✓ 通过")
+
+
+def test_histogram_percentiles():
+    """分位数的相对误差在桶精度以内，合并结果与整体记录一致"""
+    print("="*60)
+    print("测试 延迟直方图分位数")
+    print("="*60)
+
+    rng = random.Random(1)
+    values = [rng.lognormvariate(-3, 1) for _ in range(20000)]
+    a, b, whole = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, v in enumerate(values):
+        (a if i % 2 else b).record(v)
+        whole.record(v)
+    a.merge(b)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = ordered[int(q * len(ordered)) - 1]
+        assert abs(a.percentile(q) - exact) / exact < 0.05, q
+        assert a.percentile(q) == whole.percentile(q)
+    assert a.count == 20000
+    print("✓ 通过")
+
+
+def test_sliding_window():
+    """超出窗口的时间片不计入"""
+    print("="*60)
+    print("测试 滑动窗口")
+    print("="*60)
+
+    histogram = WindowedHistogram(slice_seconds=10, slices=6)
+    histogram.record(5.0, now=1000)
+    histogram.record(0.1, now=1055)
+
+    assert histogram.snapshot(60, now=1055).count == 2
+    assert histogram.snapshot(10, now=1055).count == 1
+    # 70秒后第一条记录已滑出窗口，其位置被新时间片复用
+    histogram.record(0.2, now=1061)
+    assert histogram.snapshot(60, now=1061).max == 0.2
+    print("✓ 通过")
+
+
+def test_tracker_routes():
+    """按路由前缀和状态码分类，路由数超过上限后归入 __other__"""
+    print("="*60)
+    print("测试 路由分类")
+    print("="*60)
+
+    assert route_key('/api/function6?x=1') == '/api/function6'
+    assert route_key('/jobs/123') == '/jobs'
+    assert route_key('/') == '/'
+
+    tracker = LatencyTracker(windows=(60,), max_routes=2)
+    tracker.record('/api/function1', 200, 0.01)
+    tracker.record('/api/function1', 502, 0.02)
+    tracker.record('/jobs', 200, 0.03)
+    tracker.record('/artifacts', 200, 0.04)
+
+    stats = tracker.get_stats()
+    assert set(stats['routes']['/api/function1']) == {'2xx', '5xx'}
+    assert '__other__' in stats['routes']
+    assert stats['overall']['1m']['count'] == 4
+    print("✓ 通过")
+
+
+if __name__ == "__main__":
+    test_sharded_counter_threads()
+    test_histogram_percentiles()
+    test_sliding_window()
+    test_tracker_routes()
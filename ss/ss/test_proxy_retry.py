@@ -0,0 +1,180 @@
+"""
+测试脚本 - 验证重试策略（幂等性、可重发的请求体）、重试预算的耗尽和补充，以及对冲请求的触发条件
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from proxy_retry import RetryBudget, RetryPolicy
+from proxy_server_enhanced import EnhancedProxyHTTPRequestHandler, ProxyError, UpstreamResponse
+
+
+def test_retry_rules():
+    """非幂等请求只在连接没有建立时重试；只有幂等请求在 502/503/504 后重试；不超过最大次数"""
+    print("="*60)
+    print("测试 重试条件")
+    print("="*60)
+
+    policy = RetryPolicy(max_retries=2, budget=RetryBudget(max_tokens=100))
+    assert policy.is_idempotent("GET", {})
+    assert not policy.is_idempotent("POST", {})
+    assert policy.is_idempotent("POST", {"idempotency-key": "abc"})
+    assert not policy.is_idempotent("POST", {"Idempotency-Key": ""})
+
+    assert policy.can_retry_error(0, idempotent=True, connect_failed=False)
+    assert policy.can_retry_error(0, idempotent=False, connect_failed=True)
+    assert not policy.can_retry_error(0, idempotent=False, connect_failed=False)
+    assert not policy.can_retry_error(2, idempotent=True, connect_failed=True)
+
+    assert policy.can_retry_status(0, idempotent=True, status_code=503)
+    assert not policy.can_retry_status(0, idempotent=False, status_code=503)
+    assert not policy.can_retry_status(0, idempotent=True, status_code=500)
+    assert policy.get_stats()['retries'] == 3
+
+    assert [policy.backoff(n) for n in (1, 2, 3)] == [0.5, 1.0, 2.0]
+    print("✓ 通过")
+
+
+def make_handler(policy, method, open_upstream):
+    """只带有重试策略和对冲线程池的处理器（不监听端口）"""
+    handler = EnhancedProxyHTTPRequestHandler.__new__(EnhancedProxyHTTPRequestHandler)
+    handler.worker_pool = SimpleNamespace(retry_policy=policy, hedge_executor=ThreadPoolExecutor(4))
+    handler.command = method
+    handler.headers = {}
+    handler._open_upstream = open_upstream
+    return handler
+
+
+def make_upstream(status_code=200):
+    return UpstreamResponse(status_code, [], iter(()), 0, lambda completed: None)
+
+
+def test_no_retry_for_unreplayable_or_post():
+    """POST 在连接建立后失败不重试；流式请求体（不能重发）即使是GET也不重试"""
+    print("="*60)
+    print("测试 不可重发的请求")
+    print("="*60)
+
+    policy = RetryPolicy(max_retries=3, backoff_factor=0, budget=RetryBudget(max_tokens=100),
+                         hedge_percentile=0)
+    calls = []
+
+    def failing(path, body):
+        calls.append(path)
+        raise ProxyError(504, "timeout", is_timeout=True)
+
+    for method, body in (("POST", b"{}"), ("GET", iter([b"chunk"]))):
+        calls.clear()
+        handler = make_handler(policy, method, failing)
+        try:
+            handler._call_upstream("/api/function1", body, allow_hedge=True)
+        except ProxyError:
+            pass
+        else:
+            raise AssertionError("the error should be raised without retrying")
+        assert len(calls) == 1, (method, calls)
+
+    # 可重发的GET请求按 max_retries 重试
+    calls.clear()
+    handler = make_handler(policy, "GET", failing)
+    try:
+        handler._call_upstream("/api/function1", None, allow_hedge=True)
+    except ProxyError:
+        pass
+    assert len(calls) == 4
+    print("✓ 通过")
+
+
+def test_budget_exhaust_and_refill():
+    """预算用完后拒绝重试，之后按 min_per_second 和每个请求的 ratio 补充"""
+    print("="*60)
+    print("测试 重试预算")
+    print("="*60)
+
+    budget = RetryBudget(ratio=0.5, min_per_second=20, max_tokens=2)
+    policy = RetryPolicy(max_retries=5, budget=budget)
+    assert policy.can_retry_error(0, idempotent=True, connect_failed=False)
+    assert policy.can_retry_error(0, idempotent=True, connect_failed=False)
+    assert not policy.can_retry_error(0, idempotent=True, connect_failed=False)
+    assert not policy.start_hedge()
+    assert (budget.spent, budget.denied) == (2, 2)
+
+    # 按时间补充：20个/秒，0.1秒后至少1个
+    time.sleep(0.1)
+    assert budget.tokens >= 1
+    assert policy.can_retry_error(0, idempotent=True, connect_failed=False)
+
+    # 按请求补充（不依赖时间）：两个请求存入1个令牌，不超过上限
+    budget.min_per_second = 0
+    while budget.tokens >= 1:
+        budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+    for _ in range(20):
+        budget.deposit()
+    assert budget.tokens == 2
+    print("✓ 通过")
+
+
+def test_hedge_delay_and_idempotency():
+    """对冲只在样本足够、等待超过对冲延迟且请求幂等时发出"""
+    print("="*60)
+    print("测试 对冲请求")
+    print("="*60)
+
+    policy = RetryPolicy(budget=RetryBudget(max_tokens=100), hedge_percentile=0.95,
+                         hedge_min_samples=5, hedge_min_delay=0.1)
+    route = "/api/function1"
+    policy.record_headers(route, 200, 0.001)
+    assert policy.hedge_delay(route) is None
+
+    policy = RetryPolicy(budget=RetryBudget(max_tokens=100), hedge_percentile=0.95,
+                         hedge_min_samples=5, hedge_min_delay=0.1)
+    for _ in range(10):
+        policy.record_headers(route, 200, 0.001)
+    delay = policy.hedge_delay(route)
+    assert delay == 0.1
+
+    lock = threading.Lock()
+
+    def run(method, first_latency):
+        """发送一个请求，返回每次发往目标服务器的时间（相对开始）"""
+        starts = []
+        begin = time.monotonic()
+
+        def open_upstream(path, body):
+            with lock:
+                starts.append(time.monotonic() - begin)
+                first = len(starts) == 1
+            time.sleep(first_latency if first else 0.01)
+            return make_upstream()
+
+        handler = make_handler(policy, method, open_upstream)
+        upstream = handler._call_upstream(route, None, allow_hedge=True)
+        assert upstream.status_code == 200
+        handler.worker_pool.hedge_executor.shutdown(wait=True)
+        return starts
+
+    # 慢的幂等请求：超过对冲延迟后才发出备份请求，备份先返回
+    starts = run("GET", 0.5)
+    assert len(starts) == 2
+    assert starts[1] >= delay
+    assert policy.get_stats()['hedges'] == 1
+    assert policy.get_stats()['hedge_wins'] == 1
+
+    # 在对冲延迟内返回的请求不对冲
+    assert len(run("GET", 0.01)) == 1
+
+    # 非幂等请求即使很慢也不对冲
+    assert len(run("POST", 0.3)) == 1
+    assert policy.get_stats()['hedges'] == 1
+    print("✓ 通过")
+
+
+if __name__ == "__main__":
+    test_retry_rules()
+    test_no_retry_for_unreplayable_or_post()
+    test_budget_exhaust_and_refill()
+    test_hedge_delay_and_idempotency()
@@ -0,0 +1,110 @@
+"""
+测试脚本 - 验证产物存储的去重写入、按字节数和年龄的清理，以及清理时保留仍被引用的产物
+"""
+import os
+import tempfile
+import time
+
+from artifact_store import ArtifactStore, collect_digests
+from session_store import SessionStore
+
+
+def age(path: str, seconds: float):
+    """把文件的修改时间改到 seconds 秒之前"""
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_put_dedup_and_touch():
+    """相同内容只保存一份，重复写入刷新修改时间"""
+    print("="*60)
+    print("测试 去重写入")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        info = store.put_bytes(b"hello")
+        age(info.path, 3600)
+        again = store.put_bytes(b"hello")
+        assert again.path == info.path
+        assert time.time() - os.path.getmtime(info.path) < 60
+        assert store.path(info.digest) == info.path
+        assert store.path("../etc/passwd") is None
+    print("✓ 通过")
+
+
+def test_sweep_byte_limit():
+    """超过字节上限时从最旧的产物开始删除，派生文件同样计入"""
+    print("="*60)
+    print("测试 按字节数清理")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        oldest = store.put_bytes(b"a" * 100)
+        middle = store.put_bytes(b"b" * 100)
+        newest = store.put_bytes(b"c" * 100)
+        thumb = store.put_derived(newest.digest, "thumb320.webp", b"t" * 50)
+        age(oldest.path, 4000)
+        age(middle.path, 3000)
+        age(thumb, 2000)
+        age(newest.path, 1000)
+
+        stats = store.sweep(max_bytes=200, min_age=0)
+        assert stats['removed'] == 2 and stats['bytes'] == 150
+        assert not store.exists(oldest.digest)
+        assert not store.exists(middle.digest)
+        assert store.derived_path(newest.digest, "thumb320.webp") == thumb
+        assert store.exists(newest.digest)
+        assert store.swept_bytes == 200
+    print("✓ 通过")
+
+
+def test_sweep_age_and_keep():
+    """超过最长保留时间的产物删除；被引用的产物和 min_age 内写入的文件保留；中断写入的临时文件删除"""
+    print("="*60)
+    print("测试 按年龄清理和保留引用")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ArtifactStore(root)
+        referenced = store.put_bytes(b"referenced")
+        expired = store.put_bytes(b"expired")
+        fresh = store.put_bytes(b"fresh")
+        derived = store.put_derived(referenced.digest, "thumb320.webp", b"thumb")
+        part = os.path.join(root, "abc.part")
+        with open(part, 'wb') as f:
+            f.write(b"partial")
+        for path in (referenced.path, expired.path, derived, part):
+            age(path, 7200)
+
+        sessions = SessionStore()
+        sessions["s1"] = {'files': [{'filename': 'a.csv', 'digest': referenced.digest}],
+                          'archive': {'digest': 'not-a-digest'}}
+        keep = set()
+        for value in sessions.values():
+            collect_digests(value, keep)
+        assert keep == {referenced.digest}
+
+        stats = store.sweep(max_age=3600, keep=keep, min_age=600)
+        assert stats['removed'] == 3
+        assert store.exists(referenced.digest)
+        assert store.exists(fresh.digest)
+        assert not store.exists(expired.digest)
+        assert store.derived_path(referenced.digest, "thumb320.webp") is None
+        assert not os.path.exists(part)
+
+        # 没有限制时只清理临时文件
+        assert store.sweep(min_age=0)['removed'] == 0
+    print("✓ 通过")
+
+
+def main():
+    test_put_dedup_and_touch()
+    test_sweep_byte_limit()
+    test_sweep_age_and_keep()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
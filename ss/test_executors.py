@@ -0,0 +1,86 @@
+"""
+测试脚本 - 验证执行器的并发限制、排队超时，以及超时或取消后执行槽位不会泄漏
+"""
+import asyncio
+
+from executors import EXECUTOR_INLINE, ExecutorBusyError, FunctionExecutor
+
+
+def test_queue_timeout():
+    """槽位被占满时排队超时返回 ExecutorBusyError，之后槽位数量不变"""
+    print("="*60)
+    print("测试 排队超时")
+    print("="*60)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        executor = FunctionExecutor(work, mode=EXECUTOR_INLINE, max_concurrency=1, queue_timeout=0.05)
+        running = asyncio.ensure_future(executor.run())
+        await asyncio.sleep(0.01)
+
+        for _ in range(3):
+            try:
+                await executor.run()
+            except ExecutorBusyError:
+                pass
+            else:
+                raise AssertionError("run should time out while the only slot is taken")
+
+        release.set()
+        assert await running == "done"
+        assert await executor.run() == "done"
+        stats = executor.get_stats()
+        assert (stats['rejected'], stats['active'], stats['waiting']) == (3, 0, 0)
+        assert executor._semaphore._value == 1
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_cancelled_waiter():
+    """排队中的调用被取消（客户端断开）时不占用槽位"""
+    print("="*60)
+    print("测试 取消排队")
+    print("="*60)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+
+        executor = FunctionExecutor(work, mode=EXECUTOR_INLINE, max_concurrency=1, queue_timeout=10)
+        running = asyncio.ensure_future(executor.run())
+        await asyncio.sleep(0.01)
+        waiting = asyncio.ensure_future(executor.run())
+        await asyncio.sleep(0.01)
+
+        # 槽位释放的同时取消排队的调用
+        release.set()
+        waiting.cancel()
+        await running
+        try:
+            await waiting
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.01)
+        assert executor._semaphore._value == 1
+        assert executor.get_stats()['waiting'] == 0
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def main():
+    test_queue_timeout()
+    test_cancelled_waiter()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+测试脚本 - 验证函数清单的类型解析（只接受白名单中的名称）、签名生成和延迟导入
+"""
+import importlib
+import inspect
+import json
+import os
+import pickle
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from function_manifest import (
+    INJECTED_PARAMS, LazyFunction, add_injected_params, format_type, load_manifest, parse_params, parse_type
+)
+
+
+def test_parse_type():
+    """基本类型和 typing 泛型"""
+    print("="*60)
+    print("测试 类型解析")
+    print("="*60)
+
+    cases = {
+        "str": str,
+        "int": int,
+        " float ": float,
+        "List[str]": List[str],
+        "Optional[float]": Optional[float],
+        "Dict[str, Any]": Dict[str, Any],
+        "Dict[str,List[int]]": Dict[str, List[int]],
+        "Union[int, str, None]": Optional[Union[int, str]],
+        "Tuple[int, ...]": Tuple[int, ...],
+        "Callable[[int, str], bool]": Callable[[int, str], bool],
+        "Callable[..., Any]": Callable[..., Any],
+        "Any": Any,
+    }
+    for name, expected in cases.items():
+        assert parse_type(name) == expected, name
+    print("✓ 通过")
+
+
+def test_format_type_round_trip():
+    """format_type 的输出（签名缓存中保存的内容）可以再解析为相同的类型"""
+    print("="*60)
+    print("测试 类型名称往返")
+    print("="*60)
+
+    for annotation in (str, int, bool, List[str], Optional[int], Dict[str, Any],
+                       Union[int, str, None], Tuple[int, ...], Callable[[int], str]):
+        assert parse_type(format_type(annotation)) == annotation, annotation
+    assert format_type(inspect.Parameter.empty) == "str"
+    print("✓ 通过")
+
+
+def test_parse_type_rejects_code():
+    """不在白名单中的名称和表达式一律拒绝（清单是配置，不执行代码）"""
+    print("="*60)
+    print("测试 拒绝非类型表达式")
+    print("="*60)
+
+    for name in (
+        "", "foo", "__import__('os').system('true')", "().__class__.__bases__[0].__subclasses__()",
+        "int.__class__", "str()", "List[str]]", "List[", "List[]", "int str", "int,",
+        "None[int]", "...", "lambda: 0", "List['x']", "Dict[str, 1]",
+    ):
+        try:
+            parse_type(name)
+        except ValueError:
+            continue
+        raise AssertionError(f"{name!r} should be rejected")
+    print("✓ 通过")
+
+
+def test_parse_params():
+    """参数定义生成只含关键字参数的签名，支持简写和默认值"""
+    print("="*60)
+    print("测试 参数签名")
+    print("="*60)
+
+    sig = parse_params({
+        "title": "str",
+        "count": {"type": "int", "default": 5},
+        "tags": {"type": "Optional[List[str]]", "default": None},
+        "note": {"default": "x"},
+    })
+    params = sig.parameters
+    assert list(params) == ["title", "count", "tags", "note"]
+    assert all(p.kind is inspect.Parameter.KEYWORD_ONLY for p in params.values())
+    assert params["title"].annotation is str
+    assert params["title"].default is inspect.Parameter.empty
+    assert params["count"].default == 5
+    assert params["tags"].annotation == Optional[List[str]]
+    assert params["tags"].default is None
+    assert params["note"].annotation is str
+
+    try:
+        parse_params({"x": "os.system"})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown type should be rejected")
+    print("✓ 通过")
+
+
+def test_lazy_function():
+    """第一次调用时才导入模块；pickle 只保存目标字符串"""
+    print("="*60)
+    print("测试 延迟导入")
+    print("="*60)
+
+    sys.modules.pop("colorsys", None)
+    sig = parse_params({"r": "float", "g": "float", "b": "float"})
+    func = LazyFunction("colorsys:rgb_to_hsv", sig, doc="RGB转HSV")
+    assert not func.loaded
+    assert "colorsys" not in sys.modules
+    assert inspect.signature(func) == sig
+    assert func.__name__ == "rgb_to_hsv"
+
+    restored = pickle.loads(pickle.dumps(func))
+    assert not restored.loaded
+    assert restored.target == func.target
+
+    assert func(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert func.loaded
+    assert "colorsys" in sys.modules
+
+    for target in ("colorsys", ":rgb_to_hsv", "colorsys:"):
+        try:
+            LazyFunction(target, sig)
+        except ValueError:
+            continue
+        raise AssertionError(f"{target!r} should be rejected")
+    print("✓ 通过")
+
+
+def test_injected_params():
+    """inject 中的参数加在签名末尾，默认值为None；只接受框架注入的参数名"""
+    print("="*60)
+    print("测试 注入参数")
+    print("="*60)
+
+    sig = add_injected_params(parse_params({"title": "str"}), ["workdir", "progress"])
+    assert list(sig.parameters) == ["title", "workdir", "progress"]
+    assert sig.parameters["workdir"].default is None
+
+    # 签名中已有的参数跳过（如从签名缓存读取的签名）
+    sig = add_injected_params(parse_params({"workdir": {"type": "str", "default": "outputs"}}), ["workdir"])
+    assert sig.parameters["workdir"].default == "outputs"
+
+    try:
+        add_injected_params(parse_params({}), ["title"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("only framework parameters can be injected")
+    print("✓ 通过")
+
+
+def test_manifest_matches_functions():
+    """functions.json 中每个函数的 params 和 inject 与实现函数的真实签名一致"""
+    print("="*60)
+    print("测试 清单与函数签名一致")
+    print("="*60)
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "functions.json")
+    with open(path, encoding='utf-8') as f:
+        for item in json.load(f)["functions"]:
+            # 注入参数不是请求参数，只在 inject 中声明
+            assert not set(item.get("params", {})) & set(INJECTED_PARAMS), item["name"]
+
+    entries = load_manifest(path)
+    assert entries
+    for entry in entries:
+        lazy = entry["function"]
+        module_name, _, attr = lazy.target.partition(":")
+        real = inspect.signature(getattr(importlib.import_module(module_name), attr)).parameters
+        declared = inspect.signature(lazy).parameters
+        assert list(declared) == list(real), (lazy.target, list(declared), list(real))
+
+        for name, param in declared.items():
+            if name in INJECTED_PARAMS:
+                continue
+            actual = real[name]
+            if actual.annotation is not inspect.Parameter.empty:
+                assert param.annotation == actual.annotation, (lazy.target, name)
+            assert param.default == actual.default, (lazy.target, name)
+    print("✓ 通过")
+
+
+def main():
+    test_parse_type()
+    test_format_type_round_trip()
+    test_parse_type_rejects_code()
+    test_parse_params()
+    test_lazy_function()
+    test_injected_params()
+    test_manifest_matches_functions()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
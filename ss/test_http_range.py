@@ -0,0 +1,148 @@
+"""
+测试脚本 - 验证Range请求头解析、ETag比较和范围响应（206 / 304 / 416）
+"""
+import asyncio
+import os
+import tempfile
+
+from http_range import (
+    RangeNotSatisfiable, etag_matches, if_range_matches, iter_file_range, make_etag,
+    parse_range, ranged_file_response
+)
+
+
+def read_body(response) -> bytes:
+    """读取流式响应的完整内容"""
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+
+def test_parse_range():
+    """单个范围、开放范围、后缀范围和多个范围的合并"""
+    print("="*60)
+    print("测试 Range 解析")
+    print("="*60)
+
+    assert parse_range("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range("bytes=-100", 1000) == [(900, 999)]
+    # 后缀超过文件大小时返回整个文件
+    assert parse_range("bytes=-5000", 1000) == [(0, 999)]
+    # 结束位置超出文件时截断
+    assert parse_range("bytes=500-5000", 1000) == [(500, 999)]
+    # 重叠和相邻的范围合并
+    assert parse_range("bytes=0-9, 5-19,20-29, 100-109", 1000) == [(0, 29), (100, 109)]
+    # 超出文件的范围被忽略，只要还有一个有效范围
+    assert parse_range("bytes=0-9,2000-2100", 1000) == [(0, 9)]
+    print("✓ 通过")
+
+
+def test_parse_range_ignored():
+    """无法识别的Range返回None（应返回完整内容）"""
+    print("="*60)
+    print("测试 无效 Range 被忽略")
+    print("="*60)
+
+    for header in (None, "", "items=0-9", "bytes=", "bytes=abc", "bytes=9-0", "bytes=5", "bytes=-"):
+        assert parse_range(header, 1000) is None, header
+    # 范围过多
+    assert parse_range("bytes=" + ",".join(f"{i}-{i}" for i in range(0, 100, 2)), 1000) is None
+    print("✓ 通过")
+
+
+def test_range_not_satisfiable():
+    """所有范围都超出文件时抛出RangeNotSatisfiable"""
+    print("="*60)
+    print("测试 无法满足的范围")
+    print("="*60)
+
+    for header, size in (("bytes=1000-", 1000), ("bytes=2000-3000,1500-", 1000), ("bytes=-0", 1000),
+                         ("bytes=0-", 0)):
+        try:
+            parse_range(header, size)
+        except RangeNotSatisfiable:
+            continue
+        raise AssertionError(f"{header} should not be satisfiable for size {size}")
+    print("✓ 通过")
+
+
+def test_etag_comparison():
+    """If-None-Match 弱比较，If-Range 强比较"""
+    print("="*60)
+    print("测试 ETag 比较")
+    print("="*60)
+
+    etag = make_etag("abc")
+    assert etag == '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"abcd"', etag)
+
+    assert if_range_matches(None, etag)
+    assert if_range_matches('"abc"', etag)
+    assert not if_range_matches('W/"abc"', etag)
+    assert not if_range_matches('Wed, 21 Oct 2026 07:28:00 GMT', etag)
+    print("✓ 通过")
+
+
+def test_ranged_file_response():
+    """按请求头返回 200 / 206 / 304 / 416"""
+    print("="*60)
+    print("测试 范围响应")
+    print("="*60)
+
+    content = bytes(range(256)) * 40
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "data.bin")
+        with open(path, 'wb') as f:
+            f.write(content)
+        etag = make_etag("digest")
+
+        response = ranged_file_response({}, path, etag)
+        assert response.status_code == 200
+        assert response.headers["accept-ranges"] == "bytes"
+
+        response = ranged_file_response({"if-none-match": etag}, path, etag)
+        assert response.status_code == 304
+
+        response = ranged_file_response({"range": "bytes=100-199"}, path, etag)
+        assert response.status_code == 206
+        assert response.headers["content-range"] == f"bytes 100-199/{len(content)}"
+        assert response.headers["content-length"] == "100"
+        assert read_body(response) == content[100:200]
+        assert b"".join(iter_file_range(path, 100, 199, chunk_size=7)) == content[100:200]
+
+        # 多个范围：multipart/byteranges，声明的长度与实际发送的字节数一致
+        response = ranged_file_response({"range": "bytes=0-9,100-109,-5"}, path, etag)
+        assert response.status_code == 206
+        assert response.media_type.startswith("multipart/byteranges")
+        body = read_body(response)
+        assert len(body) == int(response.headers["content-length"])
+        assert content[100:110] in body and content[-5:] in body
+
+        # 断点续传的起始位置已到文件末尾
+        response = ranged_file_response({"range": f"bytes={len(content)}-"}, path, etag)
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{len(content)}"
+
+        # If-Range 与当前ETag不同（文件已变化）时忽略Range，返回完整内容
+        response = ranged_file_response({"range": "bytes=0-9", "if-range": '"old"'}, path, etag)
+        assert response.status_code == 200
+    print("✓ 通过")
+
+
+def main():
+    test_parse_range()
+    test_parse_range_ignored()
+    test_range_not_satisfiable()
+    test_etag_comparison()
+    test_ranged_file_response()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+测试脚本 - 验证异步任务的排队和状态变化，以及共享SQLite存储时其他服务进程能查询到未结束的任务
+"""
+import asyncio
+import os
+import tempfile
+
+from jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobManager, JobQueueFullError
+from session_store import SessionStore, SqliteSessionStore
+
+
+def test_status_transitions():
+    """任务依次经过 queued → running → succeeded，超过 max_pending 时拒绝"""
+    print("="*60)
+    print("测试 任务状态变化")
+    print("="*60)
+
+    async def run():
+        manager = JobManager(workers=1, max_pending=2, result_store=SessionStore())
+        release = asyncio.Event()
+
+        async def work(job_id):
+            await release.wait()
+            return 200, {'success': True, 'message': 'ok'}
+
+        first = await manager.submit("f", work, {'delivery': 'url'})
+        second = await manager.submit("f", work)
+        try:
+            await manager.submit("f", work)
+        except JobQueueFullError:
+            pass
+        else:
+            raise AssertionError("submit should be rejected once max_pending is reached")
+
+        await asyncio.sleep(0.01)
+        assert (await manager.get(first['job_id']))['status'] == JOB_RUNNING
+        assert (await manager.get(first['job_id']))['delivery'] == 'url'
+        assert (await manager.get(second['job_id']))['status'] == JOB_QUEUED
+
+        release.set()
+        await asyncio.sleep(0.05)
+        job = await manager.get(first['job_id'])
+        assert job['status'] == JOB_SUCCEEDED
+        assert job['response'] == {'success': True, 'message': 'ok'}
+        stats = await manager.get_stats()
+        assert (stats['succeeded'], stats['rejected'], stats['queued'], stats['running']) == (2, 1, 0, 0)
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_failure_and_cancel():
+    """函数异常和服务关闭时取消的任务都记为失败"""
+    print("="*60)
+    print("测试 失败和取消")
+    print("="*60)
+
+    async def run():
+        manager = JobManager(workers=2, max_pending=10, result_store=SessionStore())
+
+        async def failing(job_id):
+            raise ValueError("boom")
+
+        async def forever(job_id):
+            await asyncio.sleep(3600)
+
+        failed = await manager.submit("f", failing)
+        cancelled = await manager.submit("f", forever)
+        await asyncio.sleep(0.01)
+        await manager.shutdown()
+
+        job = await manager.get(failed['job_id'])
+        assert job['status'] == JOB_FAILED
+        assert job['status_code'] == 500 and job['response']['error'] == "boom"
+        assert (await manager.get(cancelled['job_id']))['status'] == JOB_FAILED
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_in_flight_visible_across_processes():
+    """共享SQLite存储的两个任务管理器（两个服务进程）：另一个进程能查询到排队和执行中的任务"""
+    print("="*60)
+    print("测试 跨进程查询未结束的任务")
+    print("="*60)
+
+    async def run(path):
+        submitter = JobManager(workers=1, max_pending=10, result_store=SqliteSessionStore(path))
+        other = JobManager(workers=1, max_pending=10, result_store=SqliteSessionStore(path))
+        release = asyncio.Event()
+
+        async def work(job_id):
+            await release.wait()
+            return 200, {'success': True, 'message': 'done'}
+
+        running = await submitter.submit("f", work)
+        queued = await submitter.submit("f", work)
+        await asyncio.sleep(0.05)
+
+        job = await other.get(running['job_id'])
+        assert job is not None and job['status'] == JOB_RUNNING
+        assert job['started_at'] is not None
+        job = await other.get(queued['job_id'])
+        assert job is not None and job['status'] == JOB_QUEUED
+
+        release.set()
+        await asyncio.sleep(0.1)
+        job = await other.get(running['job_id'])
+        assert job['status'] == JOB_SUCCEEDED
+        assert job['response']['message'] == 'done'
+        assert await other.get("missing") is None
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        asyncio.run(run(os.path.join(db_dir, "jobs.db")))
+    print("✓ 通过")
+
+
+def main():
+    test_status_transitions()
+    test_failure_and_cancel()
+    test_in_flight_visible_across_processes()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
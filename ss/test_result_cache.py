@@ -0,0 +1,109 @@
+"""
+测试脚本 - 验证结果缓存的TTL过期、按条目数和字节数的LRU淘汰以及命中统计
+"""
+import time
+
+from result_cache import ResultCache, make_cache_key
+
+
+def test_cache_key():
+    """缓存键由函数名和请求参数决定"""
+    print("="*60)
+    print("测试 缓存键")
+    print("="*60)
+
+    key = make_cache_key("function_1", '{"a":1}')
+    assert key == make_cache_key("function_1", '{"a":1}')
+    assert key != make_cache_key("function_2", '{"a":1}')
+    assert key != make_cache_key("function_1", '{"a":2}')
+    print("✓ 通过")
+
+
+def test_ttl_expiry():
+    """过期条目不再命中，并从缓存中删除"""
+    print("="*60)
+    print("测试 TTL 过期")
+    print("="*60)
+
+    cache = ResultCache(ttl=0.05)
+    cache.put("k", {'message': 'ok'})
+    assert cache.get("k") == {'message': 'ok'}
+
+    time.sleep(0.1)
+    assert cache.get("k") is None
+    stats = cache.get_stats()
+    assert stats['entries'] == 0
+    assert stats['bytes'] == 0
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    print("✓ 通过")
+
+
+def test_lru_entries():
+    """超过最大条目数时淘汰最久未访问的条目"""
+    print("="*60)
+    print("测试 按条目数 LRU 淘汰")
+    print("="*60)
+
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # 访问a，使b成为最久未访问
+    cache.put("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.get_stats()['evicted'] == 1
+    print("✓ 通过")
+
+
+def test_byte_limit():
+    """超过字节上限时按LRU淘汰，单个过大的条目不缓存，覆盖写入不重复计算字节数"""
+    print("="*60)
+    print("测试 字节限制")
+    print("="*60)
+
+    cache = ResultCache(ttl=60, max_bytes=1000)
+    cache.put("a", {'raw_data': 'x' * 400})
+    cache.put("b", {'raw_data': 'x' * 400})
+    assert cache.get_stats()['bytes'] <= 1000
+
+    # 写入c后超过上限，淘汰最久未访问的a
+    cache.put("c", {'raw_data': 'x' * 400})
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.get("c") is not None
+    stats = cache.get_stats()
+    assert stats['bytes'] <= 1000
+    assert stats['evicted'] == 1
+
+    # 覆盖已有条目
+    before = cache.get_stats()['bytes']
+    cache.put("c", {'raw_data': 'x' * 400})
+    assert cache.get_stats()['bytes'] == before
+
+    # 超过上限的单个条目不缓存，也不挤掉已有条目
+    cache.put("huge", {'raw_data': 'x' * 5000})
+    assert cache.get("huge") is None
+    assert cache.get("b") is not None
+    stats = cache.get_stats()
+    assert stats['oversized'] == 1
+    assert stats['entries'] == 2
+
+    # 删除后字节数同步减少
+    cache.invalidate("b")
+    cache.invalidate("c")
+    assert cache.get_stats()['bytes'] == 0
+    print("✓ 通过")
+
+
+def main():
+    test_cache_key()
+    test_ttl_expiry()
+    test_lru_entries()
+    test_byte_limit()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+测试脚本 - 验证样例函数6的进度上报与实际工作交替进行（不是在工作开始前一次报完）
+"""
+import os
+import tempfile
+
+import sample_functions
+
+
+def test_function_6_progress_interleaved():
+    """每个epoch、CSV写出和每张图片完成后各上报一次进度，CSV写出前进度未到达该步骤"""
+    print("="*60)
+    print("测试 函数6进度上报")
+    print("="*60)
+
+    events = []
+    original_csv = sample_functions.create_sample_csv
+    original_image = sample_functions.create_sample_image
+
+    def record_csv(*args, **kwargs):
+        events.append("csv")
+        return original_csv(*args, **kwargs)
+
+    def record_image(*args, **kwargs):
+        events.append("image")
+        return original_image(*args, **kwargs)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "function6_mnist.csv")
+
+        def progress(current, total, message):
+            events.append((current, total, os.path.exists(csv_path)))
+
+        sample_functions.create_sample_csv = record_csv
+        sample_functions.create_sample_image = record_image
+        try:
+            result = sample_functions.function_6(
+                "mnist", "cnn", 3, 32, 1, "adam", progress=progress, workdir=workdir
+            )
+        finally:
+            sample_functions.create_sample_csv = original_csv
+            sample_functions.create_sample_image = original_image
+
+    assert events == [
+        (1, 7, False), (2, 7, False), (3, 7, False),
+        "csv", (4, 7, True),
+        "image", (5, 7, True),
+        "image", (6, 7, True),
+        "image", (7, 7, True),
+    ], events
+    assert len(result["result"]["images"]) == 3
+    print("✓ 通过")
+
+
+def main():
+    test_function_6_progress_interleaved()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
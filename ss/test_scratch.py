@@ -0,0 +1,131 @@
+"""
+测试脚本 - 验证临时工作目录的创建、后台删除、配额拒绝和遗留目录清理
+"""
+import os
+import tempfile
+import time
+
+from scratch import ScratchQuotaError, ScratchSpace
+
+
+def test_create_and_release():
+    """每次调用独立的目录，释放后在后台删除"""
+    print("="*60)
+    print("测试 创建和释放")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        space = ScratchSpace(root=root, min_free_bytes=0)
+        first = space.create("function_1")
+        second = space.create("function_1")
+        assert first != second
+        assert os.path.dirname(first) == root
+        assert os.path.basename(first).startswith("function_1_")
+
+        with open(os.path.join(first, "result.csv"), 'w') as f:
+            f.write("a,b\n")
+        space.release(first)
+        space.release(first)  # 重复释放被忽略
+        space.shutdown()
+
+        assert not os.path.exists(first)
+        assert os.path.isdir(second)
+        stats = space.get_stats()
+        assert (stats['created'], stats['released'], stats['active']) == (2, 1, 1)
+    print("✓ 通过")
+
+
+def test_quota_rejection():
+    """总占用达到上限或剩余空间不足时拒绝创建"""
+    print("="*60)
+    print("测试 配额拒绝")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        space = ScratchSpace(root=root, max_bytes=1000, min_free_bytes=0, usage_ttl=0)
+        workdir = space.create()
+        with open(os.path.join(workdir, "big.bin"), 'wb') as f:
+            f.write(b"x" * 1000)
+
+        try:
+            space.create()
+        except ScratchQuotaError:
+            pass
+        else:
+            raise AssertionError("create should be rejected once max_bytes is used")
+
+        # 释放后占用下降，可以再次创建
+        space.release(workdir)
+        space.shutdown()
+        space = ScratchSpace(root=root, max_bytes=1000, min_free_bytes=0, usage_ttl=0)
+        space.create()
+
+        # 剩余空间低于下限
+        space = ScratchSpace(root=root, min_free_bytes=1 << 62, usage_ttl=0)
+        try:
+            space.create()
+        except ScratchQuotaError:
+            pass
+        else:
+            raise AssertionError("create should be rejected when free space is low")
+        assert space.get_stats()['rejected'] == 1
+    print("✓ 通过")
+
+
+def test_usage_cached():
+    """占用统计在 usage_ttl 内复用，不在每次创建时遍历目录"""
+    print("="*60)
+    print("测试 占用统计缓存")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        space = ScratchSpace(root=root, max_bytes=1000, min_free_bytes=0, usage_ttl=0.2)
+        workdir = space.create()
+        with open(os.path.join(workdir, "big.bin"), 'wb') as f:
+            f.write(b"x" * 1000)
+
+        # 缓存的统计还是写入前的结果
+        space.create()
+
+        time.sleep(0.25)
+        try:
+            space.create()
+        except ScratchQuotaError:
+            pass
+        else:
+            raise AssertionError("create should be rejected after the usage cache expires")
+    print("✓ 通过")
+
+
+def test_purge_stale():
+    """只删除足够旧且不在使用中的遗留目录"""
+    print("="*60)
+    print("测试 清理遗留目录")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as root:
+        stale = os.path.join(root, "call_stale")
+        os.makedirs(stale)
+        old = time.time() - 7200
+        os.utime(stale, (old, old))
+
+        space = ScratchSpace(root=root, min_free_bytes=0)
+        active = space.create()
+        os.utime(active, (old, old))
+
+        assert space.purge_stale(3600) == 1
+        assert not os.path.exists(stale)
+        assert os.path.isdir(active)
+    print("✓ 通过")
+
+
+def main():
+    test_create_and_release()
+    test_quota_rejection()
+    test_usage_cached()
+    test_purge_stale()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
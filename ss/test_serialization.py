@@ -0,0 +1,116 @@
+"""
+测试脚本 - 验证 Accept 内容协商、JSON直接序列化和 multipart/mixed 响应体
+"""
+import json
+import os
+import tempfile
+
+import serialization
+from serialization import (
+    FORMAT_JSON, FORMAT_MSGPACK, FORMAT_MULTIPART, dump_json, iter_multipart, negotiate_format
+)
+
+
+def test_negotiate_defaults():
+    """没有 Accept 或没有可识别的类型时使用JSON"""
+    print("="*60)
+    print("测试 默认格式")
+    print("="*60)
+
+    for accept in (None, "", "   ", "text/html", "text/html,application/xhtml+xml", "*/*", "application/*"):
+        assert negotiate_format(accept) == FORMAT_JSON, accept
+    print("✓ 通过")
+
+
+def test_negotiate_quality():
+    """按q值选择，q值相同时按出现顺序，大小写不敏感"""
+    print("="*60)
+    print("测试 q值排序")
+    print("="*60)
+
+    assert negotiate_format("multipart/mixed") == FORMAT_MULTIPART
+    assert negotiate_format("Multipart/Mixed") == FORMAT_MULTIPART
+    assert negotiate_format("multipart/*") == FORMAT_MULTIPART
+    assert negotiate_format("multipart/mixed;q=0.5, application/json;q=0.9") == FORMAT_JSON
+    assert negotiate_format("application/json;q=0.5, multipart/mixed") == FORMAT_MULTIPART
+    assert negotiate_format("multipart/mixed, application/json") == FORMAT_MULTIPART
+    assert negotiate_format("application/*;q=0.1, multipart/*") == FORMAT_MULTIPART
+    # 无法识别的q值忽略该项
+    assert negotiate_format("multipart/mixed;q=abc") == FORMAT_JSON
+    assert negotiate_format("application/json;q=abc, multipart/mixed") == FORMAT_MULTIPART
+    print("✓ 通过")
+
+
+def test_negotiate_rejected():
+    """q=0 明确拒绝的格式不会被选中，没有其他可用格式时返回None（406）"""
+    print("="*60)
+    print("测试 q=0 拒绝")
+    print("="*60)
+
+    assert negotiate_format("application/json;q=0") is None
+    assert negotiate_format("application/json;q=0, text/html") is None
+    assert negotiate_format("application/json;q=0, */*") == FORMAT_MULTIPART
+    assert negotiate_format("application/json;q=0, multipart/mixed;q=0.1") == FORMAT_MULTIPART
+    # 通配符的 q=0 不排除具体类型
+    assert negotiate_format("*/*;q=0, multipart/mixed") == FORMAT_MULTIPART
+    print("✓ 通过")
+
+
+def test_negotiate_msgpack_optional():
+    """msgpack 只在安装时参与协商；只请求msgpack而未安装时返回None（406）"""
+    print("="*60)
+    print("测试 MessagePack 可选依赖")
+    print("="*60)
+
+    installed = serialization.msgpack
+    try:
+        serialization.msgpack = None
+        assert negotiate_format("application/msgpack") is None
+        assert negotiate_format("application/msgpack, application/json;q=0.5") == FORMAT_JSON
+        assert FORMAT_MSGPACK not in serialization.available_formats()
+
+        if installed is not None:
+            serialization.msgpack = installed
+            for accept in ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack"):
+                assert negotiate_format(accept) == FORMAT_MSGPACK
+            assert negotiate_format("application/msgpack;q=0.1, multipart/mixed") == FORMAT_MULTIPART
+    finally:
+        serialization.msgpack = installed
+    print("✓ 通过")
+
+
+def test_dump_json_and_multipart():
+    """普通对象直接序列化为UTF-8 JSON；multipart 第一部分是元数据，之后是文件内容"""
+    print("="*60)
+    print("测试 JSON序列化和multipart响应体")
+    print("="*60)
+
+    content = {'message': '完成', 'values': [1, 2.5, None]}
+    assert json.loads(dump_json(content)) == content
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "chart.png")
+        data = os.urandom(1000)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        body = b"".join(iter_multipart(
+            "b1", b'{"success":true}', [({"Content-Type": "image/png"}, path)], chunk_size=64
+        ))
+        assert body.startswith(b"--b1\r\nContent-Type: application/json\r\n\r\n{\"success\":true}\r\n")
+        assert b"--b1\r\nContent-Type: image/png\r\n\r\n" + data + b"\r\n" in body
+        assert body.endswith(b"--b1--\r\n")
+    print("✓ 通过")
+
+
+def main():
+    test_negotiate_defaults()
+    test_negotiate_quality()
+    test_negotiate_rejected()
+    test_negotiate_msgpack_optional()
+    test_dump_json_and_multipart()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
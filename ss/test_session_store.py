@@ -0,0 +1,124 @@
+"""
+测试脚本 - 验证会话存储的容量限制、TTL过期、LRU淘汰和磁盘溢出，以及SQLite后端的跨进程共享
+"""
+import os
+import tempfile
+import time
+
+from session_store import SessionStore, SqliteSessionStore
+
+
+def test_lru_eviction():
+    """超过最大条目数时淘汰最久未访问的会话"""
+    print("="*60)
+    print("测试 LRU 淘汰")
+    print("="*60)
+
+    store = SessionStore(max_entries=2)
+    store['a'] = {'n': 1}
+    store['b'] = {'n': 2}
+    store.get('a')  # 访问a，使b成为最久未访问
+    store['c'] = {'n': 3}
+
+    assert 'a' in store
+    assert 'b' not in store
+    assert 'c' in store
+    assert store.get_stats()['evicted'] == 1
+    print("✓ 通过")
+
+
+def test_ttl_expiry():
+    """过期会话不可再访问"""
+    print("="*60)
+    print("测试 TTL 过期")
+    print("="*60)
+
+    store = SessionStore(ttl=0.05)
+    store['a'] = {'n': 1}
+    assert store.get('a') == {'n': 1}
+
+    time.sleep(0.1)
+    assert store.get('a') is None
+    assert 'a' not in store
+    print("✓ 通过")
+
+
+def test_byte_limit_and_spill():
+    """大会话溢出到磁盘，内存字节数受限"""
+    print("="*60)
+    print("测试 字节限制和磁盘溢出")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        store = SessionStore(max_bytes=100, spill_dir=spill_dir, spill_threshold=50)
+        store['small'] = {'x': 'y' * 10}
+        store['large'] = {'x': 'y' * 500}
+
+        stats = store.get_stats()
+        assert stats['memory_bytes'] <= 100
+        assert stats['spill_bytes'] > 0
+        assert len(os.listdir(spill_dir)) == 1
+        assert store['large'] == {'x': 'y' * 500}
+
+        # 删除后溢出文件同时被清理
+        del store['large']
+        assert os.listdir(spill_dir) == []
+    print("✓ 通过")
+
+
+def test_sqlite_shared_between_instances():
+    """SQLite后端：一个实例写入的会话，打开同一数据库的另一个实例（另一个服务进程）可以读到"""
+    print("="*60)
+    print("测试 SQLite后端跨实例共享")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        path = os.path.join(db_dir, "sessions.db")
+        writer = SqliteSessionStore(path)
+        reader = SqliteSessionStore(path)
+
+        writer['a'] = {'files': [{'filename': '结果.csv', 'digest': 'abc'}]}
+        assert reader.get('a') == {'files': [{'filename': '结果.csv', 'digest': 'abc'}]}
+        assert 'b' not in reader
+
+        del reader['a']
+        assert writer.get('a') is None
+    print("✓ 通过")
+
+
+def test_sqlite_limits():
+    """SQLite后端：按最后访问时间淘汰，过期会话不可再访问"""
+    print("="*60)
+    print("测试 SQLite后端淘汰和过期")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        store = SqliteSessionStore(os.path.join(db_dir, "sessions.db"), max_entries=2)
+        store['a'] = {'n': 1}
+        time.sleep(0.01)
+        store['b'] = {'n': 2}
+        time.sleep(0.01)
+        store['c'] = {'n': 3}
+        assert 'a' not in store
+        assert len(store) == 2
+        assert store.get_stats()['evicted'] == 1
+
+        store = SqliteSessionStore(os.path.join(db_dir, "expiring.db"), ttl=0.05)
+        store['a'] = {'n': 1}
+        assert store.get('a') == {'n': 1}
+        time.sleep(0.1)
+        assert store.get('a') is None
+    print("✓ 通过")
+
+
+def main():
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_byte_limit_and_spill()
+    test_sqlite_shared_between_instances()
+    test_sqlite_limits()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
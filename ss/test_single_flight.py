@@ -0,0 +1,151 @@
+"""
+测试脚本 - 验证请求合并：相同请求只执行一次，leader失败时follower收到同样的异常，
+leader被取消时由follower接手重新执行
+"""
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def test_coalesce_identical_calls():
+    """执行期间到达的相同请求共享leader的结果，不同的键分别执行"""
+    print("="*60)
+    print("测试 相同请求合并")
+    print("="*60)
+
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            return f"result-{key}"
+
+        results = await asyncio.gather(
+            *(flight.do("a", lambda: work("a")) for _ in range(5)),
+            flight.do("b", lambda: work("b"))
+        )
+        assert calls == ["a", "b"]
+        assert [r for r, _ in results] == ["result-a"] * 5 + ["result-b"]
+        assert sum(coalesced for _, coalesced in results) == 4
+
+        stats = flight.get_stats()
+        assert stats['leaders'] == 2
+        assert stats['coalesced'] == 4
+        assert stats['max_waiters'] == 4
+        assert stats['in_flight'] == 0
+
+        # leader结束后条目已移除，之后的请求重新执行
+        result, coalesced = await flight.do("a", lambda: work("a"))
+        assert result == "result-a" and not coalesced
+        assert calls == ["a", "b", "a"]
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_leader_error_shared():
+    """leader抛出异常时所有follower收到同一个异常，之后的请求重新执行"""
+    print("="*60)
+    print("测试 leader异常传递")
+    print("="*60)
+
+    async def run():
+        flight = SingleFlight()
+        attempts = 0
+
+        async def failing():
+            nonlocal attempts
+            attempts += 1
+            await asyncio.sleep(0.05)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            *(flight.do("k", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert attempts == 1
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.get_stats()['in_flight'] == 0
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_takeover_when_leader_cancelled():
+    """leader被取消（客户端断开）时，等待中的一个follower接手执行，其余follower等待新的leader"""
+    print("="*60)
+    print("测试 leader取消后由follower接手")
+    print("="*60)
+
+    async def run():
+        flight = SingleFlight()
+        started = []
+
+        async def work():
+            started.append(asyncio.current_task())
+            await asyncio.sleep(0.1)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+
+        # 原leader执行一次（被取消），接手的follower再执行一次
+        assert len(started) == 2
+        assert all(result == "done" for result, _ in results)
+        # 接手的follower自己执行，不算合并；另外两个等待了新的leader
+        assert sorted(coalesced for _, coalesced in results) == [False, True, True]
+        assert leader.cancelled()
+        assert flight.get_stats()['in_flight'] == 0
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def test_follower_cancel_keeps_leader():
+    """follower自身被取消时不影响leader和其他follower"""
+    print("="*60)
+    print("测试 follower取消不影响leader")
+    print("="*60)
+
+    async def run():
+        flight = SingleFlight()
+        runs = 0
+
+        async def work():
+            nonlocal runs
+            runs += 1
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.do("k", work))
+        other = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+
+        assert await leader == ("done", False)
+        assert await other == ("done", True)
+        assert follower.cancelled()
+        assert runs == 1
+
+    asyncio.run(run())
+    print("✓ 通过")
+
+
+def main():
+    test_coalesce_identical_calls()
+    test_leader_error_shared()
+    test_takeover_when_leader_cancelled()
+    test_follower_cancel_keeps_leader()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+测试脚本 - 验证流式ZIP打包的内容、重名处理、压缩方式选择和固定时间下的逐字节一致
+"""
+import io
+import os
+import tempfile
+import zipfile
+
+from zip_stream import iter_zip_stream, unique_arcnames, zip_compress_type
+
+
+def write_file(directory: str, name: str, data: bytes) -> str:
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_stream_matches_input():
+    """解压后的内容与原文件相同，缺失的文件被跳过"""
+    print("="*60)
+    print("测试 流式打包内容")
+    print("="*60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_data = b"a,b\n" + b"1,2\n" * 50000
+        png_data = os.urandom(300 * 1024)
+        entries = [
+            ("result.csv", write_file(tmp_dir, "result.csv", csv_data)),
+            ("chart.png", write_file(tmp_dir, "chart.png", png_data)),
+            ("missing.txt", os.path.join(tmp_dir, "missing.txt")),
+            ("empty.txt", write_file(tmp_dir, "empty.txt", b"")),
+        ]
+
+        chunks = list(iter_zip_stream(entries, chunk_size=64 * 1024))
+        # 边压缩边输出：大文件产生多个数据块，每块不会远超过块大小
+        assert len(chunks) > 1
+        assert all(chunks)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+            assert zipf.testzip() is None
+            assert zipf.namelist() == ["result.csv", "chart.png", "empty.txt"]
+            assert zipf.read("result.csv") == csv_data
+            assert zipf.read("chart.png") == png_data
+            assert zipf.read("empty.txt") == b""
+            assert zipf.getinfo("result.csv").compress_type == zipfile.ZIP_DEFLATED
+            assert zipf.getinfo("chart.png").compress_type == zipfile.ZIP_STORED
+    print("✓ 通过")
+
+
+def test_duplicate_names():
+    """重名条目添加序号"""
+    print("="*60)
+    print("测试 重名条目")
+    print("="*60)
+
+    names = [name for name, _ in unique_arcnames([
+        ("a.csv", "1"), ("a.csv", "2"), ("a.csv", "3"), ("a (1).csv", "4"), ("b", "5"), ("b", "6")
+    ])]
+    assert names == ["a.csv", "a (1).csv", "a (2).csv", "a (1) (1).csv", "b", "b (1)"]
+    assert len(set(names)) == len(names)
+    print("✓ 通过")
+
+
+def test_compress_type():
+    """已压缩的格式直接存储，其余使用DEFLATE"""
+    print("="*60)
+    print("测试 压缩方式选择")
+    print("="*60)
+
+    assert zip_compress_type("image.PNG") == zipfile.ZIP_STORED
+    assert zip_compress_type("report.pptx") == zipfile.ZIP_STORED
+    assert zip_compress_type("data.csv") == zipfile.ZIP_DEFLATED
+    assert zip_compress_type("README") == zipfile.ZIP_DEFLATED
+    print("✓ 通过")
+
+
+def test_deterministic_with_date_time():
+    """指定 date_time 后，相同内容每次生成的压缩包逐字节相同（与文件的修改时间和块大小无关）"""
+    print("="*60)
+    print("测试 固定时间下逐字节一致")
+    print("="*60)
+
+    date_time = (2026, 1, 1, 0, 0, 0)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_file(tmp_dir, "data.csv", b"x,y\n" * 10000)
+        entries = [("data.csv", path)]
+        first = b"".join(iter_zip_stream(entries, date_time=date_time))
+
+        # 修改文件时间（早于ZIP能表示的1980年）、改变块大小后重新生成
+        os.utime(path, (0, 0))
+        second = b"".join(iter_zip_stream(entries, chunk_size=1024, date_time=date_time))
+        assert first == second
+
+        # 不指定时间时使用文件的修改时间，结果随之变化
+        third = b"".join(iter_zip_stream(entries))
+        assert third != first
+    print("✓ 通过")
+
+
+def main():
+    test_stream_matches_input()
+    test_duplicate_names()
+    test_compress_type()
+    test_deterministic_with_date_time()
+    print("\n所有测试通过!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+流式ZIP打包模块
+边压缩边输出ZIP数据块，内存占用只与块大小有关，与打包内容的总大小无关
+"""
+import os
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+
+# 每次输出的数据块大小
+CHUNK_SIZE = 256 * 1024
+
+# 本身已经压缩过的格式，再用DEFLATE压缩只会浪费CPU，直接存储
+COMPRESSED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+    '.pptx', '.docx', '.xlsx',
+    '.mp3', '.mp4', '.mov', '.avi',
+}
+
+
+def zip_compress_type(filename: str) -> int:
+    """根据文件扩展名选择压缩方式"""
+    ext = os.path.splitext(filename)[1].lower()
+    return zipfile.ZIP_STORED if ext in COMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def unique_arcnames(entries: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    为重名条目添加序号，避免压缩包内出现同名文件
+
+    Args:
+        entries: (压缩包内文件名, 磁盘路径) 列表
+    """
+    seen = set()
+    result = []
+    for arcname, path in entries:
+        name = arcname
+        stem, ext = os.path.splitext(arcname)
+        index = 1
+        while name in seen:
+            name = f"{stem} ({index}){ext}"
+            index += 1
+        seen.add(name)
+        result.append((name, path))
+    return result
+
+
+class _ChunkSink:
+    """只追加、不可回退的写入目标，zipfile检测到不可seek时会改用数据描述符格式"""
+
+    def __init__(self):
+        self._chunks = []
+        self._buffered = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._buffered += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    @property
+    def buffered(self) -> int:
+        return self._buffered
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self._buffered = 0
+        return data
+
+
+def iter_zip_stream(entries: Iterable[Tuple[str, str]], chunk_size: int = CHUNK_SIZE,
+                    date_time: Optional[Tuple[int, int, int, int, int, int]] = None) -> Iterator[bytes]:
+    """
+    流式生成ZIP压缩包
+
+    Args:
+        entries: (压缩包内文件名, 磁盘路径) 列表，路径不存在的条目会被跳过
+        chunk_size: 输出数据块大小
+        date_time: 所有条目使用的修改时间；指定后输出只由条目名称和内容决定，
+                   相同内容每次生成的压缩包逐字节相同（用于ETag和范围请求）
+
+    Yields:
+        ZIP数据块
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as zipf:
+        for arcname, path in unique_arcnames(entries):
+            if not path or not os.path.exists(path):
+                continue
+
+            # 修改时间早于1980年（ZIP无法表示）的文件按1980年记录，不中断整个压缩包
+            zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+            if date_time is not None:
+                zinfo.date_time = date_time
+                zinfo.external_attr = 0o644 << 16
+            zinfo.compress_type = zip_compress_type(arcname)
+            force_zip64 = zinfo.file_size > zipfile.ZIP64_LIMIT
+
+            with open(path, 'rb') as src, zipf.open(zinfo, 'w', force_zip64=force_zip64) as dst:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    if sink.buffered >= chunk_size:
+                        yield sink.drain()
+
+            if sink.buffered:
+                yield sink.drain()
+
+    # 关闭时写入的中央目录
+    tail = sink.drain()
+    if tail:
+        yield tail